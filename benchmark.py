@@ -0,0 +1,339 @@
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import importlib.util
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+
+import factionstats as fs
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Benchmark of the update pipeline on synthetic data
+#
+# A seeded generator creates EDDB dumps (systems_populated.json, factions.json) at galaxy scale and a history store for
+# every target in a scratch directory, the pipeline stages are then timed on that data. Nothing is fetched from the
+# web and nothing is published, the same parameters and seed give the same data on every run.
+#
+# usage: python benchmark.py [--systems 20000] [--days 90] [--targets 2] [--repeat 3] [--output results.json]
+# python benchmark.py --help lists all parameters
+
+# faction states as found in the EDDB dumps, 'None' is the most frequent one
+STATES = ['None', 'None', 'None', 'None', 'Boom', 'Bust', 'Civil War', 'War', 'Election', 'Expansion', 'Lockdown',
+          'Outbreak', 'Investment', 'Retreat', 'Famine', 'Civil Unrest']
+STATE_IDS = dict((state, i) for i, state in enumerate(sorted(set(STATES))))
+
+ALLEGIANCES = ['Independent', 'Federation', 'Empire', 'Alliance']
+GOVERNMENTS = ['Corporate', 'Democracy', 'Dictatorship', 'Cooperative', 'Confederacy', 'Patronage', 'Anarchy']
+
+
+def fn_target_names(count):
+    # the real targets first, so that runs with one or two targets look like the production setup
+    names = ['Canonn', 'Canonn Deep Space Research']
+    return (names + ['Synthetic Target ' + str(i) for i in range(len(names), count)])[:count]
+
+
+def fn_synthetic_galaxy(rng, systems, factions, factions_per_system, targetlist, target_systems):
+    # state of the galaxy as {system index: {'factions': [faction ids], 'influence': array, 'states': [states],
+    # 'updated_at': epoch}}, faction ids start at 1 with the targets
+    galaxy = []
+    for system in range(systems):
+        count = rng.randint(max(1, factions_per_system - 2), factions_per_system + 3)
+        ids = rng.permutation(np.unique(rng.randint(len(targetlist) + 1, factions + 1, count)))[:count].tolist()
+        count = len(ids)
+        galaxy.append({'factions': ids, 'influence': fn_normalize(rng.gamma(2.0, 1.0, count)),
+                       'states': [STATES[i] for i in rng.randint(0, len(STATES), count)], 'updated_at': 0})
+
+    # every target is present in target_systems systems
+    for target_id in range(1, len(targetlist) + 1):
+        for system in rng.choice(systems, min(target_systems, systems), replace=False).tolist():
+            entry = galaxy[system]
+            entry['factions'].append(target_id)
+            entry['influence'] = fn_normalize(np.append(entry['influence'], rng.gamma(2.0, 1.0)))
+            entry['states'].append(STATES[rng.randint(0, len(STATES))])
+
+    return galaxy
+
+
+def fn_normalize(influence):
+    # influence in percent with at least 1 % per faction, rounded like in the dumps
+    influence = np.maximum(influence / influence.sum() * 100, 1.0)
+    return np.round(influence / influence.sum() * 100, 4)
+
+
+def fn_evolve(rng, galaxy, systems, timestamp, change_rate):
+    # one day of background simulation for the given systems, a fraction of change_rate of them gets updated
+    for system in systems:
+        if rng.random_sample() >= change_rate:
+            continue
+        entry = galaxy[system]
+        entry['influence'] = fn_normalize(entry['influence'] + rng.normal(0, 2, len(entry['factions'])))
+        for i in range(len(entry['states'])):
+            if rng.random_sample() < 0.2:
+                entry['states'][i] = STATES[rng.randint(0, len(STATES))]
+        entry['updated_at'] = timestamp - rng.randint(0, 24*60*60)
+
+
+def fn_system_record(galaxy, system):
+    # EDDB record of a populated system
+    entry = galaxy[system]
+    presences = [{'minor_faction_id': id, 'influence': float(influence), 'state': state,
+                  'state_id': STATE_IDS[state]}
+                 for id, influence, state in zip(entry['factions'], entry['influence'], entry['states'])]
+    controlling = entry['factions'][int(np.argmax(entry['influence']))]
+    return {'id': system + 1, 'edsm_id': system + 100000, 'name': 'Synthetic System ' + str(system),
+            'x': float(system % 997), 'y': float(system % 89), 'z': float(system % 7919),
+            'population': 1000 * (system + 1), 'is_populated': True, 'government': GOVERNMENTS[system % 7],
+            'government_id': system % 7, 'allegiance': ALLEGIANCES[system % 4], 'allegiance_id': system % 4,
+            'state': 'None', 'state_id': 80, 'security': 'Medium', 'security_id': 32, 'primary_economy': 'Industrial',
+            'primary_economy_id': 4, 'power': None, 'power_state': None, 'power_state_id': None,
+            'needs_permit': False, 'updated_at': entry['updated_at'], 'simbad_ref': '', 'controlling_minor_faction_id':
+            controlling, 'controlling_minor_faction': 'Synthetic Faction ' + str(controlling), 'reserve_type_id': None,
+            'reserve_type': None, 'minor_faction_presences': presences}
+
+
+def fn_faction_records(factions, targetlist, timestamp):
+    # EDDB records of all factions, the targets have the ids 1 to len(targetlist)
+    records = []
+    for id in range(1, factions + 1):
+        name = targetlist[id - 1] if id <= len(targetlist) else 'Synthetic Faction ' + str(id)
+        records.append({'id': id, 'name': name, 'updated_at': timestamp, 'government_id': id % 7,
+                        'government': GOVERNMENTS[id % 7], 'allegiance_id': id % 4, 'allegiance': ALLEGIANCES[id % 4],
+                        'state_id': 80, 'state': 'None', 'home_system_id': id, 'is_player_faction': id % 10 == 0})
+    return records
+
+
+def fn_write_json_array(path, records):
+    # the dumps are written as arrays of records with one record per line as provided by EDDB
+    with open(path, 'w') as handle:
+        handle.write('[\n')
+        for i, record in enumerate(records):
+            if i:
+                handle.write(',\n')
+            handle.write(json.dumps(record))
+        handle.write('\n]\n')
+
+
+def fn_generate(args, workdir):
+    # writes the synthetic dumps to <workdir>/jsondata and the history of every target to the history store in
+    # <workdir>/statdata, the history ends one day before the dump
+    rng = np.random.RandomState(args.seed)
+    targetlist = fn_target_names(args.targets)
+    galaxy = fn_synthetic_galaxy(rng, args.systems, args.factions, args.factions_per_system, targetlist,
+                                 args.target_systems)
+    target_systems = [system for system, entry in enumerate(galaxy)
+                      if any(id <= len(targetlist) for id in entry['factions'])]
+    factions = fn_faction_records(args.factions, targetlist, 0)
+
+    # the history covers the target systems only, which is all the store keeps
+    # it ends at midnight UTC, so the data of all runs of a day are identical
+    now = int(time.time()) // (24*60*60) * (24*60*60)
+    entries = dict((target_name, []) for target_name in targetlist)
+    for day in range(args.days, 0, -1):
+        timestamp = now - day * 24*60*60
+        fn_evolve(rng, galaxy, target_systems, timestamp, args.change_rate)
+        system_records = [fn_system_record(galaxy, system) for system in target_systems]
+        wanted = set(id for record in system_records for id in
+                     [presence['minor_faction_id'] for presence in record['minor_faction_presences']])
+        extracted = fs.fn_extract_targets_from_frames(
+            targetlist, fs.fn_convert_eddb_dates(pd.DataFrame(system_records)),
+            pd.DataFrame([record for record in factions if record['id'] in wanted]))
+        for target_name, (systems_target, factions_target) in extracted.items():
+            entries[target_name].append([fs.fn_epoch_to_asctime(timestamp), systems_target, factions_target, True])
+
+    for target_name in targetlist:
+        fs.fn_store_append(target_name, entries[target_name])
+
+    # the dump of today holds all systems
+    fn_evolve(rng, galaxy, range(args.systems), now, args.change_rate)
+    fn_write_json_array(os.path.join(workdir, 'jsondata', 'systems_populated.json'),
+                        (fn_system_record(galaxy, system) for system in range(args.systems)))
+    fn_write_json_array(os.path.join(workdir, 'jsondata', 'factions.json'), factions)
+
+    return targetlist
+
+
+def fn_synthetic_faction_page(rng, systems, factions_per_system):
+    # EDDB faction page with the faction table of a target present in the given number of systems, the table is
+    # preceded by the page navigation, which the tokenizer skips
+    html = ['<!DOCTYPE html>\n<html>\n<head><title>Canonn - Minor Faction - EDDB</title></head>\n<body>\n<nav>']
+    for i in range(200):
+        html.append('<li class="nav-item"><a href="/page/%d">Page &amp; Section %d</a></li>\n' % (i, i))
+    html.append('</nav>\n<table class="table">\n<tbody>\n')
+    for system in range(systems):
+        name = 'Synthetic System ' + str(system)
+        html.append('<tr class="systemRow">\n<td><a href="/system/%d">%s</a></td>\n<td>\n'
+                    '<strong>Security:</strong> <span>Medium</span><br>\n<strong>State:</strong> <span>%s</span><br>\n'
+                    '<strong>Population:</strong> <span>%s</span><br>\n<strong>Power:</strong> <span>None</span>\n'
+                    '</td>\n<td>%.2f<br>ly from Sol</td>\n<td>Update: %d hours</td>\n</tr>\n'
+                    % (system, name, STATES[rng.randint(0, len(STATES))], format(1000 * (system + 1), ','),
+                       rng.uniform(0, 500), rng.randint(1, 24)))
+        influence = fn_normalize(rng.gamma(2.0, 1.0, factions_per_system))
+        controlling = int(np.argmax(influence))
+        for i in range(factions_per_system):
+            faction = 'Canonn' if i == 0 else 'Synthetic Faction &#38; Partners ' + str(rng.randint(1, 70000))
+            html.append('<tr class="systemFactionRow">\n<td>%.1f%%</td>\n<td><a href="/faction/%d">%s</a></td>\n'
+                        '<td>%s</td>\n<td>%s</td>\n<td>%s</td>\n<td>%s</td>\n<td>%s</td>\n</tr>\n'
+                        % (influence[i], i, faction, ALLEGIANCES[i % 4], GOVERNMENTS[i % 7],
+                           STATES[rng.randint(0, len(STATES))], name, 'Controlling' if i == controlling else ''))
+    html.append('</tbody>\n</table>\n<footer>EDDB</footer>\n</body>\n</html>\n')
+    return ''.join(html)
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Timing
+
+
+def fn_time(results, label, run, repeat, setup=None):
+    # runs setup() and run() repeat times, only run() is timed, the durations are collected in results[label]
+    # returns the result of the last run
+    durations = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.time()
+        result = run()
+        durations.append(time.time() - start)
+    results[label] = durations
+    print ('%-24s %10.3f s' % (label, min(durations)))
+    return result
+
+
+def fn_remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.isfile(path):
+        os.remove(path)
+
+
+def fn_benchmark(args, targetlist):
+    # times the pipeline stages on the synthetic data in the current directory, the stages run for all targets
+    results = {}
+    repeat = args.repeat
+
+    fn_time(results, 'dump_parse_stream', lambda: fs.fn_extract_targets_from_json(targetlist, cache=False), repeat)
+    fn_time(results, 'dump_cache_build', lambda: fs.fn_extract_targets_from_json(targetlist), repeat,
+            setup=lambda: fn_remove('./jsondata/dumpcache'))
+    extracted = fn_time(results, 'dump_parse_cache', lambda: fs.fn_extract_targets_from_json(targetlist), repeat)
+
+    def load():
+        return dict((target_name, fs.FactionStats(target_name)) for target_name in targetlist)
+
+    fn_time(results, 'load_factionstat', load, repeat)
+
+    # every pull starts from freshly loaded data
+    loaded = {}
+
+    def pull():
+        for target_name in targetlist:
+            loaded[target_name].fn_pull_data_from_json(target_name, extracted=extracted)
+
+    fn_time(results, 'pull_data_from_json', pull, repeat, setup=lambda: loaded.update(load()))
+
+    def history():
+        for target_name in targetlist:
+            loaded[target_name].fn_get_system_history()
+
+    fn_time(results, 'system_history', history, repeat, setup=fs.HISTORY_CACHE.clear)
+    fn_time(results, 'system_history_cached', history, repeat)
+
+    def plot():
+        for target_name in targetlist:
+            loaded[target_name].fn_plot_system_history(target_name, webpublishing=False, workers=args.plot_workers,
+                                                       offline=args.render)
+
+    # every run renders all figures
+    fn_time(results, 'plot_system_history', plot, repeat, setup=lambda: fn_remove('./plots'))
+
+    def analytics():
+        for target_name in targetlist:
+            loaded[target_name].fn_influence_changes(target_name, reuse_history=True)
+
+    fn_time(results, 'influence_analytics', analytics, repeat)
+
+    fn_benchmark_page_parse(args, results)
+
+    return results
+
+
+def fn_benchmark_page_parse(args, results):
+    # times both backends of the faction page parser on a saved page or a synthetic one, the backends have to extract
+    # the same rows
+    if args.page:
+        with open(args.page, 'rb') as handle:
+            html = handle.read().decode('utf-8')
+    else:
+        html = fn_synthetic_faction_page(np.random.RandomState(args.seed), args.target_systems,
+                                         args.factions_per_system)
+
+    rows = fn_time(results, 'page_parse_tokenizer', lambda: fs.fn_extract_faction_rows(html), args.repeat)
+    if importlib.util.find_spec('bs4') is None:
+        print ('bs4 is not installed, the page_parse_bs4 stage is skipped')
+        return
+    rows_bs4 = fn_time(results, 'page_parse_bs4', lambda: fs.fn_extract_faction_rows(html, backend='bs4'),
+                       args.repeat)
+    if rows != rows_bs4:
+        raise AssertionError('the backends of the faction page parser extracted different rows')
+
+
+def fnBenchmark(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='factionstats_benchmark_')
+    for directory in ['jsondata', 'statdata', 'plots', 'plotdata']:
+        if not os.path.isdir(os.path.join(workdir, directory)):
+            os.makedirs(os.path.join(workdir, directory))
+
+    # the pipeline works relative to the current directory, the metrics of the stages end up in the workdir too
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print ('generating synthetic data in ' + workdir)
+        start = time.time()
+        targetlist = fn_generate(args, workdir)
+        print ('%-24s %10.3f s' % ('generate', time.time() - start))
+        results = fn_benchmark(args, targetlist)
+    finally:
+        os.chdir(cwd)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir)
+
+    if args.output:
+        parameters = dict((key, value) for key, value in vars(args).items() if key not in ['output', 'workdir', 'keep'])
+        report = {'parameters': parameters, 'time': time.asctime(),
+                  'versions': {'python': platform.python_version(), 'numpy': np.__version__,
+                               'pandas': pd.__version__},
+                  'results': dict((label, {'min': min(durations), 'median': float(np.median(durations)),
+                                           'durations': durations}) for label, durations in results.items())}
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=1, sort_keys=True)
+
+    return results
+
+
+def fn_arguments(argv):
+    parser = argparse.ArgumentParser(description='Benchmark of the faction stat pipeline on synthetic EDDB data')
+    parser.add_argument('--systems', type=int, default=20000, help='populated systems in the dump')
+    parser.add_argument('--factions', type=int, default=70000, help='factions in the dump')
+    parser.add_argument('--factions-per-system', type=int, default=5, help='average faction presences per system')
+    parser.add_argument('--targets', type=int, default=2, help='number of target factions')
+    parser.add_argument('--target-systems', type=int, default=100, help='systems with presence of every target')
+    parser.add_argument('--days', type=int, default=90, help='days of history in the store')
+    parser.add_argument('--change-rate', type=float, default=0.3, help='fraction of systems updated per day')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the data generator')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the minimum is reported')
+    parser.add_argument('--plot-workers', type=int, default=1, help='worker processes building the plots')
+    parser.add_argument('--render', action='store_true',
+                        help='write the html and json files of the figures')
+    parser.add_argument('--page', help='saved EDDB faction page for the page parser stages, default is a synthetic '
+                                       'page with target-systems systems')
+    parser.add_argument('--output', help='json file receiving parameters, versions and all durations')
+    parser.add_argument('--workdir', help='directory for the synthetic data, kept after the run')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary directory of the synthetic data')
+    return parser.parse_args(argv)
+
+
+# main program from command line
+if __name__ == '__main__':
+    fnBenchmark(fn_arguments(sys.argv[1:]))
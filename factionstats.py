@@ -1,26 +1,99 @@
 import csv
 import os
+import numpy as np
 import pandas as pd
 import datetime
 import time
-import plotly.plotly as py
-import plotly.graph_objs as go
-import plotly
 import io
-import glob
-from sys import argv
-
-# Beautiful Soup requirements
-from bs4 import BeautifulSoup
-import requests
-
-# gspread requirements
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import json
+import sched
+import traceback
+import calendar
+import collections
+import contextlib
+import cProfile
+import hashlib
+import numbers
+import multiprocessing
+import random
+import threading
+import argparse
+import sys
+from multiprocessing.pool import ThreadPool
+
+# web page requirements
+try:
+    from HTMLParser import HTMLParser
+    fn_html_unescape = HTMLParser().unescape
+except ImportError:
+    from html.parser import HTMLParser
+    from html import unescape as fn_html_unescape
+
+# file locks between processes, not available on windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# plotly, requests, gspread and oauth2client are imported by the functions using them, so that runs which do not
+# fetch, plot, publish or upload do not pay for loading them
+
+# in-process cache of system snapshots shared by all FactionStats objects
+# structure is HISTORY_CACHE[target_name][str(time)] = {'snapshot': {system: dataframe}, 'stale': set of systems}
+HISTORY_CACHE = {}
+
+# validators (ETag, Last-Modified) of fetched web pages for conditional requests
+# validators of a fetched page are pending until its content was processed, see fn_confirm_page
+# confirmed validators are kept in PAGE_VALIDATORS_PATH, so that separate runs send conditional requests as well
+PAGE_VALIDATORS = {}
+PAGE_VALIDATORS_PENDING = {}
+PAGE_VALIDATORS_PATH = './statdata/page_validators.json'
+PAGE_VALIDATORS_LOADED = []
+PAGE_VALIDATORS_LOCK = threading.Lock()
+HTTP_SESSIONS = {}
+
+# authorized google sheets clients by key file, worksheets by (sheet, worksheet) and the cells last written to them
+# structure is SHEET_CELLS[(sheet, worksheet)] = {(row, column): value}
+# the client is shared by the targets, SHEET_LOCK serializes its use
+SHEET_CLIENTS = {}
+SHEET_WORKSHEETS = {}
+SHEET_CELLS = {}
+SHEET_LOCK = threading.Lock()
+
+# location of the EDDB dumps
+EDDB_ARCHIVE = 'https://eddb.io/archive/v5/'
+
+# background queue publishing figures to plotly, created on first use by fn_publish_queue
+# the plot manifests are updated by plotting and by the publishing threads, PLOT_MANIFEST_LOCK serializes that
+# one-shot runs wait at most PUBLISH_DRAIN_TIMEOUT seconds for the queue before exiting, see fn_drain_publish_queue
+# figures not published yet are kept in PUBLISH_BACKLOG, which overlapping runs share under a file lock
+PUBLISH_QUEUE = []
+PUBLISH_QUEUE_LOCK = threading.Lock()
+PUBLISH_DRAIN_TIMEOUT = 30*60
+PUBLISH_BACKLOG = './plots/publish_backlog.json'
+PLOT_MANIFEST_LOCK = threading.Lock()
+
+# number of worker processes building the plots of the individual systems and parsing stat files of older versions
+PLOT_WORKERS = multiprocessing.cpu_count()
+LOAD_WORKERS = multiprocessing.cpu_count()
+
+# target factions of the command line and number of targets processed concurrently, see fn_run_targets
+TARGETLIST = ['Canonn', 'Canonn Deep Space Research']
+TARGET_WORKERS = 2
+
+# duration, rows and bytes of every pipeline stage are appended as json lines to METRICS_PATH (None disables it)
+# stages named in PROFILE_STAGES are run under cProfile, their statistics are saved next to the metrics, see fn_stage
+METRICS_PATH = './metrics/stages.jsonl'
+PROFILE_STAGES = set()
+METRICS_LOCK = threading.Lock()
+
+# the daily tick of the BGS occurs at 22:50 UTC
+TICK_HOUR = 22
+TICK_MINUTE = 50
 
 
 class FactionStats:
-    def __init__(self, target_name, mode=""):
+    def __init__(self, target_name, mode="", timing=None):
 
         # load list with stat data from file
         #
@@ -28,47 +101,108 @@ class FactionStats:
         # the dataframes are pandas frames converted from the EDDB json dumps after elimination of all entries
         # not relevant to the faction
         #
-        # factionstat is expanded daily from the EDDB dump, saved in the standard file
+        # factionstat is expanded daily from the EDDB dump, saved in the history store
         # more frequently, the EDDB webpage is being checked for changes, but those changes are only stored
-        # in a temporary file _update until the next dump is available
+        # in a temporary store _update until the next dump is available
 
+        # stat index of older versions, which gets migrated into the history store on first load
+        # timing(path, seconds) is called with the load time of every file read, see fn_load_factionstat
         filename = './statdata/factionstat_'+target_name+'.csv'
-        filename_update = './statdata/factionstat_'+target_name+'_update.csv'
         self.target_name = target_name
 
+        # dates of the temporary entries which are only kept until the next dump is available
+        self.update_dates = set()
+
+        # systems changed by the last integrated dump, see fn_pull_data_from_json
+        self.changed_systems = None
+
+        # faction page applied by fn_update, which is confirmed once the update was saved
+        self.unconfirmed_page = None
+
         if mode == "update":
-            if os.path.isfile(filename_update):
-                self.factionstat = self.fn_load_factionstat(target_name, mode=mode)
+            if fn_store_exists(target_name, '_update'):
+                self.factionstat = self.fn_load_factionstat(target_name, mode=mode, timing=timing)
+                self.update_dates = set(fn_epoch_to_asctime(timestamp) for timestamp in
+                                        set(fn_store_read_rows(target_name, '_update')['timestamp'].tolist()))
                 return
         else:
-            #remove all update files
-            for path in glob.glob('./statdata/*update*'):
-                os.remove(path)
+            # remove the temporary update store of the target and the update files of older versions
+            fn_store_remove(target_name, '_update')
+            fn_remove_legacy_updates(target_name)
 
 
         # even if mode=="update" but no updated file was found, load the standard file
-        if os.path.isfile(filename):
+        if fn_store_exists(target_name) or os.path.isfile(filename):
             # self.factionstat = self.fn_load_object('./statdata/factionstat_'+target_name+'.dat')
-            self.factionstat = self.fn_load_factionstat(target_name)
+            self.factionstat = self.fn_load_factionstat(target_name, timing=timing)
 
             if mode == "update":
                 # duplicate last entry in factionstats when starting temporary file from standard
-                self.factionstat.append(self.factionstat[-1][:])
-                self.factionstat[-1][0] = time.asctime()
+                self.fn_begin_update()
             else:
                 # if temporary update exist but standard was loaded, then delete temporary file
-                if os.path.isfile(filename_update):
-                    os.remove(filename_update)
+                fn_store_remove(target_name, '_update')
         else:
             print ('Did not find stat file for '+target_name)
             self.factionstat = []
 
+    def fn_begin_update(self):
+        # point updates are applied to a copy of the last dump entry, which is created once and kept until the next
+        # dump is integrated
+        if self.factionstat and self.factionstat[-1][0] not in self.update_dates:
+            self.factionstat.append(fn_duplicate_entry(self.factionstat[-1], time.asctime()))
+            self.update_dates.add(self.factionstat[-1][0])
+
+    def fn_discard_updates(self):
+        # drops the temporary update entries before a new dump is integrated
+        self.factionstat = [entry for entry in self.factionstat if entry[0] not in self.update_dates]
+        for date in self.update_dates:
+            fn_history_cache_invalidate(self.target_name, date)
+        self.update_dates = set()
+        self.unconfirmed_page = None
+        fn_store_remove(self.target_name, '_update')
+
+    def fn_apply_retention(self, max_age=90*24*60*60+1):
+        # drops entries older than max_age seconds from memory, the last entry is always kept for comparison
+        self.factionstat = [entry for i, entry in enumerate(self.factionstat)
+                            if i == len(self.factionstat) - 1 or time.time() - fn_asctime_to_epoch(entry[0]) < max_age]
+
+    def fn_last_dump_date(self):
+        # date of the last entry taken from an EDDB dump, None if there is none
+        for entry in reversed(self.factionstat):
+            if entry[0] not in self.update_dates:
+                return entry[0]
+        return None
+
     def fn_get_system_history(self):
 
+        # snapshots are taken from the history cache, only new entries and systems marked as stale by
+        # fn_history_cache_invalidate are rebuilt
+        cache = HISTORY_CACHE.setdefault(self.target_name, {})
+        window = set()
+
         history = []
-        for entry in self.factionstat:
-            if (time.time()-time.mktime(time.strptime(entry[0]))) < (90*24*60*60+1):
-                history.append(self.fn_get_system_snapshots(systems=entry[1], factions=entry[2]))
+        with fn_stage('history_build', self.target_name) as record:
+            for entry in self.factionstat:
+                if (time.time()-time.mktime(time.strptime(entry[0]))) < (90*24*60*60+1):
+                    window.add(entry[0])
+                    cached = cache.get(entry[0])
+                    if cached is None:
+                        cached = {'snapshot': self.fn_get_system_snapshots(systems=entry[1], factions=entry[2]),
+                                  'stale': set()}
+                        cache[entry[0]] = cached
+                    elif cached['stale']:
+                        stale = [system for system in entry[1].index if system in cached['stale']]
+                        cached['snapshot'].update(self.fn_get_system_snapshots(systems=entry[1].loc[stale],
+                                                                               factions=entry[2]))
+                        cached['stale'] = set()
+                    history.append(cached['snapshot'])
+            record['rows'] = len(history)
+
+        # evict entries which dropped out of the 90 day window
+        for date in list(cache.keys()):
+            if date not in window:
+                del cache[date]
 
         # Get a list of all occupied systems
         systemlist = []
@@ -86,28 +220,51 @@ class FactionStats:
         # Faction Influence FactionState LastTimeUpdated
         # ...     ...       ...           ...
         # ...     ...       ...           ...
+        #
+        # the presences of all systems are flattened into one long frame, the faction names are joined in with a
+        # single merge and the frames of the individual systems are split off by a groupby
+
+        columns = ['Faction', 'Influence', 'Faction State', 'Last Time Updated']
+
+        rows = []
+        for system, factions_present, updated in zip(systems.index, systems['minor_faction_presences'],
+                                                     systems['updated_at']):
+            for faction in factions_present:
+                if isinstance(faction, dict):
+                    rows.append((system, faction['minor_faction_id'], faction['influence'], faction['state'],
+                                 updated))
+        presences = pd.DataFrame(rows, columns=['System', 'id', 'Influence', 'Faction State', 'Last Time Updated'])
+        # influence missing in the dump (None, NaN after the history store) is shown as 0 like in the plots before
+        presences['Influence'] = presences['Influence'].fillna(0.0)
+
+        names = pd.DataFrame({'id': factions.index.tolist(), 'Faction': factions['name'].tolist()})
+        presences = presences.merge(names.drop_duplicates('id'), on='id', how='left')
 
         snapshot = {}
+        for system, data in presences.groupby('System', sort=False):
+            snapshot[system] = data[columns].reset_index(drop=True)
 
+        # systems without any valid faction presence
         for system in systems.index:
-            data = pd.DataFrame(columns=['Faction', 'Influence', 'Faction State', 'Last Time Updated'])
-            factions_present = systems.loc[system, 'minor_faction_presences']
-            for faction in factions_present:
-                influence = faction['influence']
-                state = faction['state']
-                updated = systems.loc[system, 'updated_at']
-                factionname = factions.loc[faction['minor_faction_id'], 'name']
-                data.loc[data.shape[0]] = [factionname, influence, state, updated]
-            snapshot[system] = data
+            if system not in snapshot:
+                snapshot[system] = pd.DataFrame(columns=columns)
 
         return snapshot
 
-    def fn_plot_system_history(self, target_name, webpublishing=False, updatelist=[]):
+    def fn_plot_system_history(self, target_name, webpublishing=False, updatelist=None, workers=1, offline=True):
         # Plots the influence history of a given system saves data and plots
         # Format:
         # Time Faction1 Faction2 ...
         # ...  ...      ...      ...
         # ...  ...      ...      ...
+        #
+        # The plots of the individual systems are built by fn_build_system_plots, with workers > 1 in a pool of
+        # worker processes. Results are collected in the order of systemlist, so the output does not depend on the
+        # number of workers.
+        #
+        # With offline=True, figures are written as json and html files to ./plots/<target>, publishing to plotly
+        # is done only with webpublishing=True. With an updatelist, only the plots of the systems in it are
+        # published.
 
         # Create a list of snapshots over the last 90 days
         history, systemlist = self.fn_get_system_history()
@@ -117,527 +274,266 @@ class FactionStats:
         self.systemlist = systemlist
 
         # Create data and plots for all systems
-        py.sign_in('criosix','3jLviaVFikQOH1BZRcew')
-        published_plots = []
-        target_faction_overview_traces = []
-        for system in systemlist:
-
-            # Get list of all factions, ever in history
-            factionlist = []
-            for entry in history:
-                if system in entry.keys():
-                    for faction in entry[system]['Faction'].tolist():
-                        if faction not in factionlist:
-                            factionlist.append(faction)
-
-            # Create Data
-            factionlist.sort()
-            headerline = ['Date']+factionlist
-            data = pd.DataFrame(columns=headerline)
-            markers = pd.DataFrame(columns=headerline)
-
-            last_date = ''
+        # influence and state marker tables of all systems are built at once, the pie chart uses the last snapshot
+        # with target faction present
+        with fn_stage('plot_build', target_name) as record:
+            pivots = fn_pivot_history(history)
+            snapshots = {}
             for entry in history:
-                if system in entry.keys():
-
-                    # keep last history entry with target faction present as snapshot
-                    snapshot = entry
-
-                    nextline_influence = []
-                    nextline_markers = []
-                    for faction in factionlist:
-                        if faction in entry[system]['Faction'].tolist():
-                            i = entry[system]['Faction'].tolist().index(faction)
-                            nextline_influence.append(entry[system]['Influence'].tolist()[i])
-                            nextline_markers.append(entry[system]['Faction State'].tolist()[i])
-                            date = entry[system]['Last Time Updated'].tolist()[0]
-                        else:
-                            nextline_influence.append(0.0)
-                            nextline_markers.append('')
-
-                    if date != last_date:
-                        for i, element in enumerate(nextline_markers):
-                            if element == 'None':
-                                nextline_markers[i] = ''
-
-                        last_date = date
-
-                        data.loc[data.shape[0]] = [date]+nextline_influence
-                        markers.loc[markers.shape[0]] = [date]+nextline_markers
-
-            data.to_csv('./plotdata/' + system + '_history.dat', index=False)
-            markers.to_csv('./plotdata/' + system + '_markers.dat', index=False)
-
-            # Create Plots with Plotly
-            # Create current snapshot plot using last snapshot with target faction present as found above
-
-            snapshot[system].sort_index()
-            snapshot[system].to_csv('./plotdata/'+system+'_snapshot.dat', index=False)
-
-            labels = snapshot[system]['Faction'].tolist()
-            pull = []
-            color = []
-            for i, val in enumerate(labels):
-                if snapshot[system]['Faction State'].tolist()[i] != 'None':
-                    labels[i] = val + ' (' + snapshot[system]['Faction State'].tolist()[i] + ')'
-                if val == target_name:
-                    pull.append(0.05)
-                    color.append('cornflowerblue')
-                else:
-                    pull.append(0.0)
-                    color.append('')
-            if system == 'Mobia':
-                pass
-            values = snapshot[system]['Influence'].tolist()
-            values_round = []
-            for i,element in enumerate(values):
-                if isinstance(element, (int, long, float, complex)):
-                    values_round.append(round(element, 1))
-                else:
-                    values_round.append(0.0)
-            centertext = str(snapshot[system]['Last Time Updated'].tolist()[0]).split()[0]+'<br>' + \
-                         str(snapshot[system]['Last Time Updated'].tolist()[0]).split()[1]
-
-            # if snapshot is too old, change color of center text of pie chart
-            # centertextcolor = 'rgb(207,217,220)'
-            centertextcolor = 'lightgreen'
-            if (time.time() - time.mktime(time.strptime(str(snapshot[system]['Last Time Updated'].tolist()[0]),
-                                                       '%Y-%m-%d %H:%M:%S'))) > (1 * 24 * 60 * 60 + 1):
-                centertextcolor = 'yellow'
-            if (time.time() - time.mktime(time.strptime(str(snapshot[system]['Last Time Updated'].tolist()[0]),
-                                                       '%Y-%m-%d %H:%M:%S'))) > (2 * 24 * 60 * 60 + 1):
-                centertextcolor = 'red'
-
-            layout = {'annotations': [{"font": {'color': centertextcolor}, "showarrow": False, "text": centertext}],
-                      'paper_bgcolor': 'rgb(55,71,79)', 'plot_bgcolor': 'rgb(55,71,79)',
-                      'font': {'color': 'rgb(207,217,220)'}, 'legend': {'orientation': 'h'}, 'autosize': True}
-
-            pietrace = go.Pie(labels=labels, values=values_round, hoverinfo="label+percent", hole=.4, pull=pull,
-                              marker=dict(colors=color))
-            plotlyfig = go.Figure(data=[pietrace], layout=layout)
-
-            # py.image.save_as(plotlyfig, filename='./plots/' + system + '_snapshot.png')
-
-            if webpublishing and (updatelist == [] or (system in updatelist)):
-                trycounter = 1
-                while trycounter < 6:
-                    try:
-                        print ('Publishing '+system + '_snapshot, attempt #'+str(trycounter))
-                        url_name = py.plot(plotlyfig,filename=target_name+'/'+system + '_snapshot', auto_open=False)
-                        published_plots.append(system + '_snapshot:    ' + url_name + '\n')
-                        trycounter = 6
-                    except:
-                        print ('Failed to publish '+system+'_history')
-                        print ('Waiting for 30 s ...')
-                        time.sleep(30)
-                        trycounter += 1
-
-            # History
-            traces = []
-            for faction in factionlist:
-
-                ydata = data[faction].tolist()
-                ydata_round = []
-                for i, element in enumerate(ydata):
-                    if isinstance(element, (int, long, float, complex)):
-                        ydata_round.append(round(element, 1))
-                    else:
-                        ydata_round.append(0.0)
-
-                # faction state marker data can contain missing elements
-                # check for those and substitute '' for faction state
-                text_markers = markers[faction].tolist()
-                for i, element in enumerate(text_markers):
-                    if pd.isnull(element):
-                        text_markers[i]=''
-
-                # go through the faction state markers for the plot and mark only the start
-                # and end of a state
-
-                current_state = ''
-                for i, marker in enumerate(text_markers):
-                    if current_state == '' and marker != '':
-                        current_state = marker
-                        text_markers[i] = marker + ' start'
-                        if len(text_markers) > (i+1) and text_markers[i+1] != current_state:
-                            current_state = ''
-                            text_markers[i] = text_markers[i] + ' + end'
-                    elif current_state == '' and marker == '':
-                        pass
-                    elif current_state != marker:
-                        # sudden change in state without state ended
-                        current_state = marker
-                        text_markers[i] = marker + ' start'
-                        if len(text_markers) > (i+1) and text_markers[i+1] != current_state:
-                            current_state = ''
-                            text_markers[i] = text_markers[i] + ' + end'
-                    elif current_state == marker and len(text_markers) > (i+1):
-                        if text_markers[i+1] != current_state:
-                            text_markers[i] = current_state + ' end'
-                            current_state = ''
-                        else:
-                            text_markers[i] = ''
-
-                # visually mark beginning and end of faction states using different symbol sizes
-                size = []
-                for element in text_markers:
-                    if (' start' not in element) and (' end' not in element):
-                        size.append(5)
-                    else:
-                        size.append(9)
-
-                if faction == target_name:
-                    width = 3
-                    color = 'cornflowerblue'
-                    trace = go.Scatter(x=data['Date'], y=ydata_round, mode='lines+markers'
-                                       , name=faction, line=dict(shape='spline', width=width, color=color),
-                                       text=text_markers, marker=dict(size=size, line=dict(width=0), symbol='circle'))
-                    target_faction_overview_traces.append(go.Scatter(x=data['Date'], y=ydata_round,
-                                                                     mode='lines+markers', name=system,
-                                                                     line=dict(shape='spline', width=2),
-                                       text=text_markers, marker=dict(size=size, line=dict(width=0), symbol='circle')))
-                else:
-                    width = 2
-                    trace = go.Scatter(x=data['Date'], y=ydata_round, mode='lines+markers',
-                                       name=faction, line=dict(shape='spline', width=width),
-                                       text=text_markers, marker=dict(size=size, line=dict(width=0), symbol='circle'))
-
-                traces.append(trace)
-
-            layout = {'xaxis': {'title': 'Date', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)',
-                                'rangeselector': {'font': {'color': 'rgb(0,0,0)'}, 'x': 1.00, 'xanchor': 'right',
-                                                  'buttons': [{'count': 14, 'label': '14d', 'step': 'day',
-                                                               'stepmode': 'backward'},
-                                                              {'count': 1, 'label': '1m', 'step': 'month',
-                                                               'stepmode': 'backward'},
-                                                              {'step': 'all'}]}},
-                      'yaxis': {'title': 'Influence (%)', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)'},
-                      'paper_bgcolor': 'rgb(55,71,79)', 'plot_bgcolor': 'rgb(55,71,79)',
-                      'font': {'color': 'rgb(207,217,220)'}, 'legend': {'orientation': 'h', 'y': 1.05, 'yanchor': 'bottom'}}
-
-            plotlyfig = go.Figure(data=traces, layout=layout)
-            # py.image.save_as(plotlyfig, filename='./plots/' + system + '_history.png')
-
-            if webpublishing and (updatelist == [] or (system in updatelist)):
-                trycounter = 1
-                while trycounter < 6:
-                    try:
-                        print ('Publishing '+system +'_history, attempt #'+str(trycounter))
-                        url_name = py.plot(plotlyfig,filename=target_name+'/'+system + '_history', auto_open=False)
-                        published_plots.append(system + '_history:    '+url_name+'\n')
-                        trycounter = 6
-                    except:
-                        print ('Failed to publish '+system+'_history')
-                        print ('Waiting for 30 s ...')
-                        time.sleep(30)
-                        trycounter += 1
-
-            # plotly.offline.plot(plotlyfig, filename='./plots/'+ system + '_history.html', auto_open=False)
-
-        layout = {'xaxis': {'title': 'Date', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)',
-                            'rangeselector': {'font': {'color': 'rgb(0,0,0)'}, 'x': 1.00, 'xanchor': 'right',
-                                              'buttons': [{'count': 14, 'label': '14d', 'step': 'day',
-                                                           'stepmode': 'backward'},
-                                                          {'count': 1, 'label': '1m', 'step': 'month',
-                                                           'stepmode': 'backward'},
-                                                          {'step': 'all'}]}},
-                  'yaxis': {'title': 'Influence (%)', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)'},
-                  'paper_bgcolor': 'rgb(55,71,79)', 'plot_bgcolor': 'rgb(55,71,79)',
-                  'font': {'color': 'rgb(207,217,220)'}, 'legend': {'orientation': 'h', 'y': 1.05, 'yanchor': 'bottom'}}
-
-        plotlyfig = go.Figure(data=target_faction_overview_traces, layout=layout)
-
-        if webpublishing:
-            trycounter = 1
-            while trycounter < 6:
+                snapshots.update(entry)
+            tasks = [(system, pivots[system][0], pivots[system][1], snapshots[system], target_name)
+                     for system in systemlist]
+            if workers > 1 and len(tasks) > 1:
+                pool = fn_process_pool(min(workers, len(tasks)))
                 try:
-                    print ('Publishing ' + target_name + '_influence_overview, attempt #' + str(trycounter))
-                    url_name = py.plot(plotlyfig, filename=target_name + '/influence_overview', auto_open=False)
-                    published_plots.append(target_name + '_influence_overview:    ' + url_name + '\n')
-                    trycounter = 6
-                except:
-                    print ('Failed to publish ' + target_name + '_influence_overview')
-                    print ('Waiting for 30 s ...')
-                    time.sleep(30)
-                    trycounter += 1
-
-        # plotly.offline.plot(plotlyfig, filename='./plots/'+ target_name + '_influence_overview.html', auto_open=False)
-
-        fi = open('./plots/published_plots'+target_name+'.dat', 'w')
-        fi.writelines(published_plots)
-        fi.close()
-
-        return published_plots
-
-    def fn_pull_data_from_json(self, target_name):
-
-        systems_populated = pd.read_json('./jsondata/systems_populated.json')
-        factions = pd.read_json('./jsondata/factions.json')
-
-        # setup dataframes for extracting systems in which the target faction is present and
-        # reduce the faction dataframe to entries only for factions that are in target faction's space
-        systems_populated.set_index("name", inplace=True)
-        factions.set_index('id', inplace=True)
-
-        # find the target name in the factions data frame and retrieve ID
-        found_id = False
-        for id in factions.index.tolist():
-            if target_name == factions.loc[id, 'name']:
-                target_id = id
-                found_id = True
-                break
+                    results = pool.map(fn_build_system_plots, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                results = [fn_build_system_plots(task) for task in tasks]
+            record['rows'] = len(tasks)
 
-        if not found_id:
+        # Collect all figures of the target, the influence overview merges the target faction traces of all systems
+        figures = []
+        target_faction_overview_traces = []
+        intervals = []
+        for system, (snapshotfig, historyfig, overview_traces, system_intervals) in zip(systemlist, results):
+            intervals.append(system_intervals)
+            target_faction_overview_traces.extend(overview_traces)
+            publish = updatelist is None or (system in updatelist)
+            figures.append((system + '_snapshot', snapshotfig, publish))
+            figures.append((system + '_history', historyfig, publish))
+        figures.append(('influence_overview', {'data': target_faction_overview_traces, 'layout': fn_history_layout()},
+                        True))
+
+        # keep the faction state periods of all systems as queryable state timeline
+        # System Faction State Start End First Last
+        if intervals:
+            self.state_timeline = pd.concat(intervals, ignore_index=True)
+        else:
+            self.state_timeline = pd.DataFrame(columns=['System', 'Faction', 'State', 'Start', 'End', 'First', 'Last'])
+
+        # Figures are rendered to ./plots/<target> and published only if their content changed, the fingerprints
+        # of the last rendered and published version of every figure are kept in the plot manifest
+        # Publishing is done in the background by the publish queue, the names of the queued figures are returned
+        manifest = fn_load_plot_manifest(target_name)
+        rendered = {}
+        published = []
+        with fn_stage('plot_render', target_name) as record:
+            for name, figure, publish in figures:
+                fingerprint = fn_figure_fingerprint(figure)
+                entry = manifest.get(name, {})
+                path = './plots/' + target_name + '/' + name
+
+                if offline and (entry.get('rendered') != fingerprint or not os.path.isfile(path + '.json')):
+                    fn_render_figure(figure, path)
+                    rendered[name] = {'rendered': fingerprint}
+                    record['bytes_written'] += os.path.getsize(path + '.json') + os.path.getsize(path + '.html')
+
+                if webpublishing and publish and entry.get('published') != fingerprint:
+                    published.append((name, figure, fingerprint))
+            record['rows'] = len(rendered)
+
+        fn_update_plot_manifest(target_name, rendered)
+        if published:
+            fn_publish_queue().fn_enqueue(target_name, published)
+
+        return [name for name, figure, fingerprint in published]
+
+    def fn_pull_data_from_json(self, target_name, streaming=True, extracted=None):
+
+        # extracted can hold the result of fn_extract_targets_from_json, which allows to share a single pass over
+        # the EDDB dumps between all targets
+        if extracted is None:
+            extracted = fn_extract_targets_from_json([target_name], streaming=streaming)
+
+        if target_name not in extracted:
             print('Did not find target faction in EDDB dump')
             return False
 
-        system_names_target = []
-        faction_names_target = [target_id]
-
-        for system in systems_populated.index:
-
-            # factions presence is list of dictionaries
-            factions_present = systems_populated.loc[system, 'minor_faction_presences']
-            for faction in factions_present:
-
-                # in some systems, the minor_factions_presences entries is not a directory but a list of directories
-                # with possible invalid entries
-                # TODO: follow up on those instances and see if the different format is intentional
-
-                if isinstance(faction, dict):
-                    if faction['minor_faction_id'] == target_id:
-                        system_names_target.append(system)
-                        for otherfaction in factions_present:
-                            if isinstance(otherfaction, dict):
-                                if otherfaction['minor_faction_id'] not in faction_names_target:
-                                    faction_names_target.append(otherfaction['minor_faction_id'])
-                    # else:
-                        # print 'Cannot read data for: ', system
-
-        # filter initial json files by identified systems and faction names
-        systems_target = systems_populated.loc[system_names_target]
-        factions_target = factions.loc[faction_names_target]
+        systems_target, factions_target = extracted[target_name]
 
         # add systems and factions Pandas frame as long as it is new
 
-        if self.factionstat == [] or not (self.factionstat[-1][1].equals(systems_target)
-                                          and self.factionstat[-1][2].equals(factions_target)):
+        # only the content kept in the history store is compared, system by system using content hashes
+        # the changed systems are kept in changed_systems, e.g. as updatelist for plotting
+        hashes = fn_system_hashes(systems_target, factions_target)
+        if self.factionstat == []:
+            self.changed_systems = list(hashes)
+        else:
+            self.changed_systems = fn_changed_systems(self.fn_entry_hashes(target_name, self.factionstat[-1]), hashes)
+
+        if self.changed_systems:
             # Flag new item for saving
             bModified = True
             self.factionstat.append([time.asctime(), systems_target, factions_target, bModified])
 
         return True
 
-    def fn_save_factionstat(self, target_name, mode=''):
-        modestr = ''
-        if mode == 'update':
-            modestr = '_update'
+    def fn_entry_hashes(self, target_name, entry):
+        # system hashes of a factionstat entry, taken from the history store for unmodified dump entries
+        hashes = None
+        if not entry[3] and entry[0] not in self.update_dates:
+            hashes = fn_store_system_hashes(target_name, fn_asctime_to_epoch(entry[0]))
+        if hashes is None:
+            hashes = fn_system_hashes(entry[1], entry[2])
+        return hashes
 
-        with open('./statdata/factionstat_' + target_name + modestr + '.csv', 'w') as handle:
-            writer = csv.writer(handle, lineterminator='\n')
-            for entry in self.factionstat:
-                writer.writerow([entry[0]])
+    def fn_save_factionstat(self, target_name, mode=''):
+        # modified entries are appended to the history store
+        # in update mode, the temporary store holding the entries modified since the last dump is rewritten
+        with fn_stage('save', target_name) as record:
+            if mode == 'update':
+                stored = set(fn_store_read_rows(target_name, '_update')['timestamp'].tolist())
+                record['rows'] = fn_store_write(target_name, [entry for entry in self.factionstat
+                                                              if entry[3] or fn_asctime_to_epoch(entry[0]) in stored],
+                                                '_update')
+                record['bytes_written'] = fn_store_bytes(target_name, '_update')
+            else:
+                size = fn_store_bytes(target_name)
+                record['rows'] = fn_store_append(target_name, [entry for entry in self.factionstat if entry[3]])
+                record['bytes_written'] = fn_store_bytes(target_name) - size
 
         for entry in self.factionstat:
-            #check if modified, otherwise do not save
-            if entry[3]:
-                entry[1].to_json('./statdata/systems_'+target_name+'_'+entry[0]+ modestr + '.json')
-                entry[2].to_json('./statdata/factions_'+target_name+'_'+entry[0]+ modestr + '.json')
+            entry[3] = False
+
+        # the faction page applied to the saved entries does not need to be fetched again until it changes
+        if self.unconfirmed_page is not None:
+            fn_confirm_page(self.unconfirmed_page)
+            self.unconfirmed_page = None
+
+    def fn_load_factionstat(self, target_name, mode='', timing=None):
+        # timing(path, seconds) is called with the load time of every file read
+        if not fn_store_exists(target_name) and os.path.isfile('./statdata/factionstat_' + target_name + '.csv'):
+            print ('Migrating stat files of ' + target_name + ' into history store')
+            fn_migrate_statdata_to_store(target_name, workers=LOAD_WORKERS, timing=timing)
+
+        # entries older than 90 days are not loaded
+        with fn_stage('snapshot_load', target_name) as record:
+            start = time.time()
+            result = fn_store_load(target_name, max_age=90 * 24 * 60 * 60 + 1)
+            if timing is not None:
+                timing(fn_store_paths(target_name)[1], time.time() - start)
+            record['rows'] = len(result)
+            record['bytes_read'] = fn_store_bytes(target_name)
 
-    def fn_load_factionstat(self, target_name, mode=''):
-        result = []
         if mode == 'update':
-            modestr = '_update'
-        else:
-            modestr = ''
-
-        doc = []
-        with open('./statdata/factionstat_' + target_name + modestr + '.csv', 'rb') as handle:
-            reader = csv.reader(handle)
-            for row in reader:
-                doc.append(row)
-
-        for row in doc:
-            date = row[0]
-            #print('./statdata/systems_'+target_name+'_'+date + modestr + '.json')
-            # if _update file does not exist, load regular file
-            if mode == 'update' and not os.path.isfile('./statdata/systems_'+target_name+'_'+date + modestr + '.json'):
-                systems = pd.read_json('./statdata/systems_' + target_name + '_' + date + '.json')
-                factions = pd.read_json('./statdata/factions_' + target_name + '_' + date + '.json')
-                # During further processing individual entries can be modified
-                # This flag is set to detect those modifications and avoid saving the entire list of states everytime
-                bModified = False
-                result.append([date, systems, factions, bModified])
-
-            elif os.path.isfile('./statdata/systems_'+target_name+'_'+date + '.json'):
-                systems = pd.read_json('./statdata/systems_'+target_name+'_'+date + modestr + '.json')
-                factions = pd.read_json('./statdata/factions_'+target_name+'_'+date + modestr + '.json')
-
-                if mode == '':
-                    if (time.time() - time.mktime(time.strptime(date))) < (90 * 24 * 60 * 60 + 1):
-                        result.append([date, systems, factions, False])
-                    else:
-                        # remove files older than 90 days and do not load them into self.factionstats
-                        # they will not appear in the factionstat file after saving of self.factionstats
-                        os.remove('./statdata/systems_'+target_name+'_'+date + modestr + '.json')
-                        os.remove('./statdata/factions_'+target_name+'_'+date + modestr + '.json')
-
-                else:
-                    result.append([date, systems, factions, False])
+            # entries of the temporary update store replace those of the standard store
+            with fn_stage('snapshot_load_update', target_name) as record:
+                start = time.time()
+                updates = fn_store_load(target_name, modestr='_update')
+                if timing is not None:
+                    timing(fn_store_paths(target_name, '_update')[1], time.time() - start)
+                record['rows'] = len(updates)
+                record['bytes_read'] = fn_store_bytes(target_name, '_update')
+            dates = [entry[0] for entry in updates]
+            result = [entry for entry in result if entry[0] not in dates] + updates
+            result.sort(key=lambda entry: fn_asctime_to_epoch(entry[0]))
 
         return result
 
-    def fn_update(self, target_name):
+    def fn_faction_url(self, target_name):
+        # EDDB webpage of the target faction, None if the faction is not in the saved data
+        if not self.factionstat:
+            return None
+        factions = self.factionstat[-1][2]
+        searchresult = factions.loc[factions['name'] == target_name]
+        if searchresult.empty:
+            return None
+        return 'https://eddb.io/faction/' + str(searchresult.index[0])
 
-        def isfloat(value):
-            try:
-                float(value)
-                return True
-            except:
-                return False
+    def fn_update(self, target_name, pages=None):
+        # pages can hold the result of fn_fetch_pages for all targets, otherwise the faction page is fetched here
 
         updatelist = []
 
         # in place modification of last entry in factionstat, if necessary
-        # create only pointers, not independent copies
-        systems = self.factionstat[-1][1].copy(deep=False)
-        factions = self.factionstat[-1][2].copy(deep=False)
+        systems = self.factionstat[-1][1]
+        factions = self.factionstat[-1][2]
 
-        searchresult = factions.loc[factions['name'] == target_name]
-        if searchresult.empty:
+        url = self.fn_faction_url(target_name)
+        if url is None:
             print('Did not find target faction in saved data. Cannot update.')
             return False
-        else:
-            target_id = searchresult.index[0]
 
-        url = 'https://eddb.io/faction/'+ str(target_id)
-        htmlContent = requests.get(url, verify=False)
-        soup = BeautifulSoup(htmlContent.text, 'html.parser')
-        entries = soup.find_all("tr", ["systemRow", "systemFactionRow"])
+        if pages is None:
+            pages = fn_fetch_pages([url])
+        if url not in pages:
+            print('Could not fetch ' + url + '. Cannot update.')
+            return updatelist
+        if pages[url] is None:
+            # page did not change since it was processed last time
+            return updatelist
 
-        # The entries are currently in the following format when using .stripped_strings
-        #
-        # systemFactionRow:                     systemRow:
-        #
-        # u'92.7%'                              u'Chacobog'
-        # u'Canonn'                             u'Security:'
-        # u'Independent'                        u'Medium'
-        # u'Cooperative'                        u'State:'
-        # u'Expansion'                          u'Boom'
-        # u'Chacobog'                           u'Population:'
-        # u'Controlling'                        u'2,298,725'
-        #                                       u'Power:'
-        #                                       u'None'
-        #                                       u'178.92'
-        #                                       u'ly from Sol'
-        #                                       u'Update: 10 hours'
-
-        system = ''
-        factions_present = []
-        recentupdate = False
-        influenceupdate = False
-        unknownsystem = False
-        # parse web page line by line
-        for entry in entries:
-
-            # parse current web page line into list of strings
-            elementlist = []
-            for element in entry.stripped_strings:
-                elementlist.append(element)
-            # look for next system line
-            if elementlist[0] in systems.index:
-                system = elementlist[0]
-                delta_t = 0
-                resolution = ''
-                recentupdate = True
+        names = factions['name'].to_dict()
+
+        # parse web page faction by faction
+        system = None
+        for row in fn_extract_faction_rows(pages[url]):
+
+            # skip factions of unknown systems in which the faction is present - possibly due to recent expansion
+            if row.system not in systems.index:
+                continue
+
+            # first faction line of the next system
+            if row.system != system:
+                system = row.system
+                recentupdate = row.update_resolution != 'd'
                 influenceupdate = False
-                unknownsystem = False
-                updated = elementlist[-1].replace("Update:","")
-                if 'hours' in updated:
-                    delta_t = datetime.timedelta(hours = int(updated.replace("hours","")))
-                    resolution = 'h'
-                elif 'hour' in updated:
-                    delta_t = datetime.timedelta(hours = int(updated.replace("hour","")))
-                    resolution = 'h'
-                elif 'mins' in updated:
-                    delta_t = datetime.timedelta(minutes = int(updated.replace("mins","")))
-                    resolution = 'min'
-                elif 'min' in updated:
-                    delta_t = datetime.timedelta(minutes = int(updated.replace("min","")))
-                    resolution = 'min'
-                else:
-                    recentupdate = False
-                    influenceupdate = False
-                    resolution = 'd'
 
-                if resolution != 'd':
+                if recentupdate:
                     update_estimate = datetime.datetime.fromtimestamp(time.time()+time.timezone).replace(microsecond=0) \
-                                  - delta_t
+                                  - row.update_age
                     last_update = systems.loc[system,'updated_at']
                     dif = update_estimate - last_update
-                    if resolution == 'min':
+                    if row.update_resolution == 'min':
                         if dif.total_seconds() < 1*60:
                             recentupdate = False
-                    if resolution == 'h':
+                    if row.update_resolution == 'h':
                         if dif.total_seconds() < 60*60:
                             recentupdate = False
 
                 factions_present = systems.loc[system, 'minor_faction_presences']
 
-            # otherwise check if it is a faction line for the same system avoiding a 'runover' into the faction
-            # lines of an unknown system
-            elif isfloat(elementlist[0].replace("%","")) and not unknownsystem:
-                #first entry should be faction influence, check for number
-                first = elementlist[0].replace("%","")
-                influence = round(float(first),1)
-                name = elementlist[1]
-                state = elementlist[4]
-
-                for faction in factions_present:
-                    factionname = factions.loc[faction['minor_faction_id'], 'name']
-                    if factionname == name:
-                        if (round(float(faction['influence']), 1) != influence) or (faction['state'] != state) or recentupdate:
-                            faction['influence'] = influence
-                            faction['state'] = state
-                            influenceupdate = True
-                        if recentupdate:
-                            systems.loc[system,'updated_at'] = update_estimate
-                        break
-
-                if (recentupdate or influenceupdate) and (system not in updatelist):
-                    updatelist.append(system)
-                    # mark entry as updated for saving
-                    self.factionstat[-1][3] = True
-
-            # unknown system in which the faction is present - possibly due to recent expansion
-            else:
-                unknownsystem = True
+            for faction in factions_present:
+                if names.get(faction['minor_faction_id']) == row.faction:
+                    if (round(float(faction['influence']), 1) != row.influence) or (faction['state'] != row.state) \
+                            or recentupdate:
+                        faction['influence'] = row.influence
+                        faction['state'] = row.state
+                        influenceupdate = True
+                    if recentupdate:
+                        systems.loc[system,'updated_at'] = update_estimate
+                    break
 
-        return updatelist
+            if (recentupdate or influenceupdate) and (system not in updatelist):
+                updatelist.append(system)
+                # mark entry as updated for saving
+                self.factionstat[-1][3] = True
 
+        fn_history_cache_invalidate(target_name, self.factionstat[-1][0], updatelist)
 
-    def fn_update_google_sheet(self, target_name, reuse_history=False):
+        # a page with updates is confirmed when they are saved, see fn_save_factionstat
+        if updatelist:
+            self.unconfirmed_page = url
+        else:
+            fn_confirm_page(url)
 
-        def fn_tick_time(dt):
-            # imports a datetime object and assuming that the tick occurs at 22:50 PM (UTC) every day
-            # times before are set to 12 PM and times after that time are set to 12 PM the following day
-            if dt.hour < 22:
-                before = True
-            elif dt.hour > 22:
-                before = False
-            elif dt.minute < 50:
-                before = True
-            else:
-                before = False
+        return updatelist
 
-            if not before:
-                dt += datetime.timedelta(days=1)
 
-            dt = dt.replace(hour=12, minute=0, second=0)
+    def fn_influence_changes(self, target_name, reuse_history=False):
+        # influence and influence change tables of the target faction, see fn_influence_analytics
+        if reuse_history:
+            history = self.history
+            systemlist = self.systemlist
+        else:
+            history, systemlist = self.fn_get_system_history()
 
-            return dt
+        return fn_influence_analytics(history, systemlist, target_name)
 
-        currenttime = fn_tick_time(datetime.datetime.fromtimestamp(time.time() + time.timezone).replace(microsecond=0))
+    def fn_update_google_sheet(self, target_name, reuse_history=False):
 
         if reuse_history:
             history = self.history
@@ -645,188 +541,1873 @@ class FactionStats:
         else:
             history, systemlist = self.fn_get_system_history()
 
-        results = pd.DataFrame(columns=['System', 'Influence', 'Influence Change 1 Day', 'Influence Change 5 Days',
-                                        'Updated'])
-
-        # results for single maximum change in influence (absolute, positive, negative)
-        single_ichange_ranges = [1, 3, 5, 7, 14, 28]
-        single_ichange_labels = ['1 Day','3 Days','5 Days','7 Days', '14 Days', '28 Days']
-        results_single = pd.DataFrame(columns=single_ichange_labels)
-        results_single_pos = pd.DataFrame(columns=single_ichange_labels)
-        results_single_neg = pd.DataFrame(columns=single_ichange_labels)
-
         # minimum history length is 6 mostly for change in influence calculation
         if len(history) < 1:
             return
 
         # Obtain momentary influence and influence change for every system
-        for system in systemlist:
+        with fn_stage('analytics', target_name) as record:
+            results, results_single, results_single_pos, results_single_neg = \
+                fn_influence_analytics(history, systemlist, target_name)
+            record['rows'] = len(systemlist)
 
-            # check if system is still occupied by target faction
-            if system not in history[-1].keys():
-                continue
+        # write data out to worksheet, only the cells that changed since the last update are sent
+        with fn_stage('sheet_sync', target_name) as record:
+            record['rows'] = fn_sheet_sync('Canonn Faction Data', "Influence " + target_name,
+                                           fn_influence_grid(results, results_single, results_single_pos,
+                                                             results_single_neg))
 
-            if system == 'Ix Chodharr':
-                pass
+        return
 
-            faction_row = history[-1][system].loc[(history[-1][system]['Faction'] == target_name)]
-            historypos = 1
-            influencedelta1 = 0
-            influencedelta5 = 0
-            single_ichange_values = [0, 0, 0, 0, 0, 0]
-            single_ichange_values_pos = single_ichange_values[:]
-            single_ichange_values_neg = single_ichange_values[:]
-            previous_influence = faction_row['Influence'].iloc[0]
-            previous_timedelta = datetime.timedelta(hours=0)
 
-            while True:
+def fn_is_json_array(path):
+    # checks whether a json file holds a top level array by looking at its first non-whitespace character
+    with io.open(path, 'r', encoding='utf-8') as handle:
+        while True:
+            char = handle.read(1)
+            if char == '':
+                return False
+            if not char.isspace():
+                return char == '['
+
+
+def fn_iter_json_array(path, chunk_size=1024*1024):
+    # generator returning the records of a json file holding a single top level array one by one
+    # the file is read in chunks and decoded incrementally, so only the current chunk and record are held in memory
+    separators = ' \t\n\r,'
+    decoder = json.JSONDecoder()
+
+    with io.open(path, 'r', encoding='utf-8') as handle:
+        # the whitespace in front of the array can span several chunks
+        buf = handle.read(chunk_size).lstrip()
+        while buf == '':
+            chunk = handle.read(chunk_size)
+            if chunk == '':
+                break
+            buf = chunk.lstrip()
+        if buf[:1] != '[':
+            raise ValueError(path + ' does not contain a json array')
+        pos = 1
 
-                historypos = historypos + 1
+        while True:
+            while pos < len(buf) and buf[pos] in separators:
+                pos += 1
 
-                # make sure that history extends sufficiently long for next time point
-                if len(history) < historypos:
-                    break
+            if pos < len(buf) and buf[pos] == ']':
+                return
 
-                # evaluate next time point back in history and check whether system is in history
-                if system in history[-1*historypos].keys():
-                    faction_row_m = history[-1*historypos][system].loc[(history[-1*historypos][system]['Faction']
-                                                                    == target_name)]
-                else:
-                    break
+            record = None
+            if pos < len(buf):
+                try:
+                    record, pos_next = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # record is cut off at the end of the buffer
+                    record = None
+
+            if record is None:
+                chunk = handle.read(chunk_size)
+                if chunk == '':
+                    raise ValueError('Unexpected end of json array in ' + path)
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
 
-                # check if system is occupied by target faction at this time, if not stop evaluating history
-                if faction_row_m.shape[0] != 1:
-                    break
+            pos = pos_next
+            yield record
 
-                # time and influence change since last reported entry
-                # the tick occurs only once a day, if a influence change is observed, this means they are one day apart
-                timedelta = fn_tick_time(faction_row['Last Time Updated'].iloc[0]) - \
-                            fn_tick_time(faction_row_m['Last Time Updated'].iloc[0])
-                influence = faction_row_m['Influence'].iloc[0]
-                influencedelta = faction_row['Influence'].iloc[0] - influence
-                if previous_timedelta.total_seconds() < 24 * 60 * 60:
-                    influencedelta1 = influencedelta
-                    # for the case that no data exist until more than 5 days, at least log this one day change
-                    influencedelta5 = influencedelta
-                elif previous_timedelta.total_seconds() < 5 * 24 * 60 * 60:
-                    influencedelta5 = influencedelta
-
-                # update single influence change values (absolute, positive, negative)
-                for i, days in enumerate(single_ichange_ranges):
-                    if (previous_timedelta).total_seconds() < days * 24 * 60 * 60:
-                        influencedelta_single = previous_influence - influence
-                        if abs(influencedelta_single) > abs(single_ichange_values[i]):
-                            single_ichange_values[i] = round(influencedelta_single, 1)
-                        if influencedelta_single > single_ichange_values_pos[i]:
-                            single_ichange_values_pos[i] = round(influencedelta_single, 1)
-                        if influencedelta_single < single_ichange_values_neg[i]:
-                            single_ichange_values_neg[i] = round(influencedelta_single, 1)
-
-                # check for break out of while loop because the maximum time range has been sampled
-                if (timedelta).total_seconds() > single_ichange_ranges[-1] * 24 * 60 * 60:
-                    break
 
-                previous_influence = influence
-                previous_timedelta = timedelta
+def fn_convert_eddb_dates(frame):
+    # frames built directly from records do not pass the date conversion of pd.read_json
+    # EDDB timestamps are seconds since epoch, timestamps written by pandas are milliseconds
+    for column in frame.columns:
+        if str(column).endswith('_at'):
+            try:
+                frame[column] = pd.to_datetime(frame[column], unit='s')
+            except (ValueError, OverflowError):
+                frame[column] = pd.to_datetime(frame[column], unit='ms')
+    return frame
+
+
+def fn_frame_from_records(records, index, order=None):
+    # creates a pandas dataframe from a list of EDDB records indexed the same way as the frames from pd.read_json
+    if not records:
+        return pd.DataFrame(columns=[index]).set_index(index)
+
+    frame = fn_convert_eddb_dates(pd.DataFrame(records))
+    frame = frame[sorted(frame.columns)]
+    frame.set_index(index, inplace=True)
+    if order is not None:
+        frame = frame.loc[order]
+    return frame
+
+
+def fn_present_faction_ids(factions_present):
+    # in some systems, the minor_factions_presences entries is not a directory but a list of directories
+    # with possible invalid entries
+    # TODO: follow up on those instances and see if the different format is intentional
+    return [faction['minor_faction_id'] for faction in factions_present if isinstance(faction, dict)]
+
+
+def fn_new_target_selection(target_ids):
+    # for every target faction id, collects the systems with target presence and the ids of all factions present
+    # in those systems, starting with the target itself
+    return dict((target_id, {'systems': [], 'factions': [target_id]}) for target_id in target_ids)
+
+
+def fn_select_target_system(selection, system, factions_present):
+    # adds a system to the selection of every target faction present in it
+    # the lookup goes from the factions of the system into the selection, so the cost per system does not grow
+    # with the number of targets
+    ids_present = fn_present_faction_ids(factions_present)
+    for target_id in set(ids_present):
+        if target_id not in selection:
+            continue
+        entry = selection[target_id]
+        entry['systems'].append(system)
+        for id in ids_present:
+            if id not in entry['factions']:
+                entry['factions'].append(id)
+
+
+def fn_extract_targets_from_frames(targetlist, systems_populated, factions):
+    # reduces fully loaded EDDB dumps to the systems with target faction presence and the factions in those systems
+    # returns a dictionary target name -> [systems, factions], targets not part of the dump are left out
+
+    # setup dataframes for extracting systems in which the target factions are present and
+    # reduce the faction dataframe to entries only for factions that are in target faction's space
+    systems_populated.set_index("name", inplace=True)
+    factions.set_index('id', inplace=True)
+
+    # name -> id hash index to find the target names in the factions data frame
+    name_index = dict(zip(factions['name'].tolist(), factions.index.tolist()))
+    target_ids = dict((name_index[target_name], target_name) for target_name in targetlist
+                      if target_name in name_index)
+
+    selection = fn_new_target_selection(target_ids)
+    for system, factions_present in zip(systems_populated.index, systems_populated['minor_faction_presences']):
+        fn_select_target_system(selection, system, factions_present)
+
+    # filter initial json files by identified systems and faction names
+    result = {}
+    for target_id, target_name in target_ids.items():
+        result[target_name] = [systems_populated.loc[selection[target_id]['systems']],
+                               factions.loc[selection[target_id]['factions']]]
+    return result
+
+
+def fn_stream_targets_from_json(targetlist, systems_path, factions_path):
+    # same as fn_extract_targets_from_frames, but the dumps are streamed record by record from disk
+    # only systems with target faction presence and factions present in those systems are kept in memory
+
+    # name -> id hash index, restricted to the target names
+    target_names = set(targetlist)
+    name_index = {}
+    for record in fn_iter_json_array(factions_path):
+        if record.get('name') in target_names:
+            name_index[record['name']] = record['id']
+            if len(name_index) == len(target_names):
+                break
+    target_ids = dict((id, target_name) for target_name, id in name_index.items())
+
+    if not target_ids:
+        return {}
+
+    selection = fn_new_target_selection(target_ids)
+    for record in fn_iter_json_array(systems_path):
+        fn_select_target_system(selection, record, record.get('minor_faction_presences') or [])
+
+    wanted = set()
+    for entry in selection.values():
+        wanted.update(entry['factions'])
+    faction_records = {}
+    for record in fn_iter_json_array(factions_path):
+        if record.get('id') in wanted:
+            faction_records[record['id']] = record
+            if len(faction_records) == len(wanted):
+                break
+
+    result = {}
+    for target_id, target_name in target_ids.items():
+        order = [id for id in selection[target_id]['factions'] if id in faction_records]
+        result[target_name] = [fn_frame_from_records(selection[target_id]['systems'], 'name'),
+                               fn_frame_from_records([faction_records[id] for id in order], 'id', order=order)]
+    return result
+
 
-            timedelta = currenttime -fn_tick_time(faction_row['Last Time Updated'].iloc[0])
-            if timedelta.total_seconds() < 24 * 60 * 60:
-                tstring = 'current'
-            elif timedelta.total_seconds() < 2 * 24 * 60 * 60:
-                tstring = ' 1 tick ago'
+# ----------------------------------------------------------------------------------------------------------------------
+# Dump cache
+#
+# The first parse of the EDDB dumps writes the parts used for evaluation into binary arrays in jsondata/dumpcache.
+# Later runs and other processes memory-map these arrays instead of parsing the json again. Names are kept in one
+# utf-8 byte array with start and end offsets per system and faction, states as codes into the list of states of the
+# metadata file. The cache is rebuilt whenever size or modification time of one of the dumps changed.
+
+DUMP_SYSTEM_DTYPE = np.dtype([('id', '<i8'), ('name_start', '<i8'), ('name_end', '<i8'), ('updated_at', '<i8')])
+DUMP_FACTION_DTYPE = np.dtype([('id', '<i8'), ('name_start', '<i8'), ('name_end', '<i8')])
+DUMP_PRESENCE_DTYPE = np.dtype([('system', '<i4'), ('faction', '<i8'), ('influence', '<f8'), ('state', '<i4')])
+DUMP_CACHE_ARRAYS = ['systems', 'system_names', 'factions', 'faction_names', 'presences']
+
+
+def fn_dump_cache_dir(systems_path):
+    return os.path.join(os.path.dirname(systems_path), 'dumpcache')
+
+
+def fn_dump_signature(systems_path, factions_path):
+    # size, inode and modification time of the dumps, a download replaces a dump by a new file
+    # the modification time is taken in nanoseconds, so that a dump rewritten within the same second is told apart,
+    # python 2 only provides the float modification time
+    signature = []
+    for path in [systems_path, factions_path]:
+        stat = os.stat(path)
+        signature.append([stat.st_size, stat.st_ino, getattr(stat, 'st_mtime_ns', stat.st_mtime)])
+    return signature
+
+
+def fn_names_to_arrays(names):
+    # utf-8 byte array of all names with the start and end offset of every name
+    encoded = [name.encode('utf-8') for name in names]
+    ends = np.cumsum([len(name) for name in encoded], dtype='<i8')
+    starts = ends - np.array([len(name) for name in encoded], dtype='<i8')
+    return np.array(bytearray(b''.join(encoded)), dtype=np.uint8), starts, ends
+
+
+def fn_cached_name(names, start, end):
+    return names[start:end].tobytes().decode('utf-8')
+
+
+def fn_build_dump_cache(systems_path, factions_path):
+    # parses the dumps once and writes the cache arrays, the metadata file is written last and marks the cache valid
+    cachedir = fn_dump_cache_dir(systems_path)
+    if not os.path.isdir(cachedir):
+        os.makedirs(cachedir)
+    metapath = os.path.join(cachedir, 'meta.json')
+    if os.path.isfile(metapath):
+        os.remove(metapath)
+    signature = fn_dump_signature(systems_path, factions_path)
+
+    states = []
+    state_codes = {}
+    systems = []
+    system_names = []
+    presences = []
+    for record in fn_iter_json_array(systems_path):
+        for faction in record.get('minor_faction_presences') or []:
+            if not isinstance(faction, dict):
+                continue
+            if faction['state'] not in state_codes:
+                state_codes[faction['state']] = len(states)
+                states.append(faction['state'])
+            influence = faction['influence']
+            presences.append((len(systems), faction['minor_faction_id'],
+                              float('nan') if influence is None else influence, state_codes[faction['state']]))
+        systems.append((record['id'], record['updated_at']))
+        system_names.append(record['name'])
+
+    factions = []
+    faction_names = []
+    for record in fn_iter_json_array(factions_path):
+        factions.append(record['id'])
+        faction_names.append(record['name'] or u'')
+
+    arrays = {'presences': np.array(presences, dtype=DUMP_PRESENCE_DTYPE)}
+    arrays['system_names'], starts, ends = fn_names_to_arrays(system_names)
+    arrays['systems'] = np.zeros(len(systems), dtype=DUMP_SYSTEM_DTYPE)
+    arrays['systems']['id'] = [id for id, updated in systems]
+    arrays['systems']['updated_at'] = [updated for id, updated in systems]
+    arrays['systems']['name_start'] = starts
+    arrays['systems']['name_end'] = ends
+    arrays['faction_names'], starts, ends = fn_names_to_arrays(faction_names)
+    arrays['factions'] = np.zeros(len(factions), dtype=DUMP_FACTION_DTYPE)
+    arrays['factions']['id'] = factions
+    arrays['factions']['name_start'] = starts
+    arrays['factions']['name_end'] = ends
+
+    for name in DUMP_CACHE_ARRAYS:
+        path = os.path.join(cachedir, name + '.npy')
+        with open(path + '.part', 'wb') as handle:
+            np.save(handle, arrays[name])
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(path + '.part', path)
+
+    with open(metapath, 'w') as handle:
+        json.dump({'signature': signature, 'states': states}, handle)
+
+    arrays['states'] = states
+    return arrays
+
+
+def fn_load_dump_cache(systems_path, factions_path):
+    # memory-maps the cache arrays of the dumps, the cache is built first if it is missing or outdated
+    # returns a dictionary with the arrays of DUMP_CACHE_ARRAYS and the list of states
+    cachedir = fn_dump_cache_dir(systems_path)
+    metapath = os.path.join(cachedir, 'meta.json')
+    if os.path.isfile(metapath):
+        with open(metapath, 'r') as handle:
+            meta = json.load(handle)
+        if meta['signature'] == fn_dump_signature(systems_path, factions_path):
+            cache = dict((name, np.load(os.path.join(cachedir, name + '.npy'), mmap_mode='r'))
+                         for name in DUMP_CACHE_ARRAYS)
+            cache['states'] = meta['states']
+            return cache
+
+    print ('Building cache of EDDB dumps')
+    return fn_build_dump_cache(systems_path, factions_path)
+
+
+def fn_extract_targets_from_cache(targetlist, cache):
+    # same as fn_extract_targets_from_frames, but based on the dump cache
+    # the frames only hold the columns used for evaluation, with the systems and factions in the order of the dumps
+    factions = cache['factions']
+    presences = cache['presences']
+
+    # name -> id lookup restricted to the names of the same length as the target names
+    lengths = factions['name_end'] - factions['name_start']
+    target_ids = {}
+    for target_name in targetlist:
+        encoded = target_name.encode('utf-8')
+        for row in np.nonzero(lengths == len(encoded))[0]:
+            if cache['faction_names'][factions['name_start'][row]:factions['name_end'][row]].tobytes() == encoded:
+                target_ids[int(factions['id'][row])] = target_name
+                break
+
+    faction_rows = dict((id, row) for row, id in enumerate(factions['id'].tolist()))
+    result = {}
+    for target_id, target_name in target_ids.items():
+        rows = np.unique(presences['system'][presences['faction'] == target_id])
+        selected = np.zeros(len(cache['systems']), dtype=bool)
+        selected[rows] = True
+        present = presences[selected[presences['system']]]
+
+        # the target first, followed by all other factions in the order of their first presence
+        ids = present['faction']
+        first = np.sort(np.unique(ids, return_index=True)[1])
+        order = [target_id] + [id for id in ids[first].tolist() if id != target_id and id in faction_rows]
+
+        factions_present = dict((row, []) for row in rows.tolist())
+        for row, faction, influence, state in zip(present['system'].tolist(), present['faction'].tolist(),
+                                                  present['influence'].tolist(), present['state'].tolist()):
+            factions_present[row].append({'minor_faction_id': faction,
+                                          'influence': None if influence != influence else influence,
+                                          'state': cache['states'][state]})
+
+        systems = cache['systems'][rows]
+        names = [fn_cached_name(cache['system_names'], start, end)
+                 for start, end in zip(systems['name_start'].tolist(), systems['name_end'].tolist())]
+        systems_target = pd.DataFrame({'minor_faction_presences': [factions_present[row] for row in rows.tolist()],
+                                       'updated_at': systems['updated_at']}, index=pd.Index(names, name='name'),
+                                      columns=['minor_faction_presences', 'updated_at'])
+
+        names = [fn_cached_name(cache['faction_names'], factions['name_start'][faction_rows[id]],
+                                factions['name_end'][faction_rows[id]]) for id in order]
+        factions_target = pd.DataFrame({'name': names}, index=pd.Index(order, name='id'))
+
+        result[target_name] = [fn_convert_eddb_dates(systems_target), factions_target]
+    return result
+
+
+def fn_extract_targets_from_json(targetlist, streaming=True, systems_path='./jsondata/systems_populated.json',
+                                 factions_path='./jsondata/factions.json', cache=True):
+    # extracts the data of all target factions with a single pass over the EDDB dumps
+
+    # the streaming parser requires the dumps in their original EDDB format (a single array of records), older
+    # dumps written column by column by pandas are read the traditional way
+    # with cache, the dumps are only parsed once and the dump cache is used afterwards
+    with fn_stage('dump_parse') as record:
+        if streaming and fn_is_json_array(systems_path) and fn_is_json_array(factions_path):
+            if cache:
+                extracted = fn_extract_targets_from_cache(targetlist, fn_load_dump_cache(systems_path, factions_path))
             else:
-                tstring = str(int(round(timedelta.total_seconds()/(24 * 60 * 60), 0))) + ' ticks ago'
+                extracted = fn_stream_targets_from_json(targetlist, systems_path, factions_path)
+        else:
+            extracted = fn_extract_targets_from_frames(targetlist, pd.read_json(systems_path),
+                                                       pd.read_json(factions_path))
+        record['rows'] = sum(len(systems) for systems, factions in extracted.values())
+        record['bytes_read'] = os.path.getsize(systems_path) + os.path.getsize(factions_path)
+
+    return extracted
+
+
+def fn_tick_time(dt):
+    # imports a datetime object and assuming that the tick occurs at 22:50 PM (UTC) every day
+    # times before are set to 12 PM and times after that time are set to 12 PM the following day
+    if dt.hour < TICK_HOUR:
+        before = True
+    elif dt.hour > TICK_HOUR:
+        before = False
+    elif dt.minute < TICK_MINUTE:
+        before = True
+    else:
+        before = False
+
+    if not before:
+        dt += datetime.timedelta(days=1)
+
+    dt = dt.replace(hour=12, minute=0, second=0)
+
+    return dt
+
+
+def fn_next_tick(dt):
+    # first tick after a given UTC datetime
+    tick = dt.replace(hour=TICK_HOUR, minute=TICK_MINUTE, second=0, microsecond=0)
+    if tick <= dt:
+        tick += datetime.timedelta(days=1)
+    return tick
+
+
+def fn_duplicate_entry(entry, date):
+    # copies a factionstat entry under a new date
+    # the faction presences are copied as well, as they get modified in place by fn_update
+    systems = entry[1].copy()
+    systems['minor_faction_presences'] = pd.Series([[dict(faction) if isinstance(faction, dict) else faction
+                                                     for faction in factions_present]
+                                                    for factions_present in systems['minor_faction_presences']],
+                                                   index=systems.index)
+    return [date, systems, entry[2].copy(), entry[3]]
+
+
+def fn_history_cache_invalidate(target_name, date, systems=None):
+    # marks systems of a cached snapshot for rebuilding, or drops the whole snapshot if no systems are given
+    cache = HISTORY_CACHE.get(target_name, {})
+    if date in cache:
+        if systems is None:
+            del cache[date]
+        else:
+            cache[date]['stale'].update(systems)
+
+def fn_http_session(max_workers):
+    # sessions are kept for the lifetime of the process, so connections to EDDB are reused between cycles
+    if max_workers not in HTTP_SESSIONS:
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        HTTP_SESSIONS[max_workers] = session
+    return HTTP_SESSIONS[max_workers]
+
+
+def fn_fetch_page(session, url, timeout, verify):
+    # conditional request using the validators of the last processed version of the page
+    # returns None if the page did not change
+    response = session.get(url, headers=fn_page_validators().get(url, {}), timeout=timeout, verify=verify)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+
+    validators = {}
+    if 'ETag' in response.headers:
+        validators['If-None-Match'] = response.headers['ETag']
+    if 'Last-Modified' in response.headers:
+        validators['If-Modified-Since'] = response.headers['Last-Modified']
+    PAGE_VALIDATORS_PENDING[url] = validators
+
+    return response.text
+
+
+def fn_fetch_pages(urls, max_workers=4, timeout=30, verify=False):
+    # fetches web pages concurrently over a pooled session with at most max_workers requests at a time
+    # returns a dictionary url -> page content, the content is None if the page did not change since it was
+    # processed last time, pages that could not be fetched are left out
+
+    session = fn_http_session(max_workers)
+
+    def fetch(url):
+        try:
+            return url, fn_fetch_page(session, url, timeout, verify)
+        except Exception as e:
+            print ('Failed to fetch ' + url + ': ' + str(e))
+            return url, False
 
-            results.loc[results.shape[0]] = [system, round(faction_row['Influence'].iloc[0], 1),
-                                             round(influencedelta1, 1), round(influencedelta5, 1), tstring]
-            results_single.loc[results_single.shape[0]] = single_ichange_values
-            results_single_pos.loc[results_single_pos.shape[0]] = single_ichange_values_pos
-            results_single_neg.loc[results_single_neg.shape[0]] = single_ichange_values_neg
+    if not urls:
+        return {}
 
-        # write data out to worksheet
-        # sign in to google sheets using gspread
-        # following directions given on the GitHub page
+    with fn_stage('page_fetch') as record:
+        pool = ThreadPool(min(max_workers, len(urls)))
+        try:
+            results = pool.map(fetch, urls)
+        finally:
+            pool.close()
+            pool.join()
+        pages = dict((url, page) for url, page in results if page is not False)
+        record['rows'] = len([page for page in pages.values() if page is not None])
+        record['bytes_read'] = sum(len(page) for page in pages.values() if page is not None)
+
+    return pages
+
+
+# typed row of the faction table of an EDDB faction page
+# update_age is a datetime.timedelta with update_resolution 'min' or 'h', for older updates it is None with
+# update_resolution 'd'
+FactionPageRow = collections.namedtuple('FactionPageRow', ['system', 'influence', 'faction', 'state', 'update_age',
+                                                           'update_resolution'])
+
+
+class FactionPageParser(HTMLParser):
+    # streaming tokenizer for EDDB faction pages, which collects the stripped strings of the systemRow and
+    # systemFactionRow table rows without building a document tree
+    #
+    # The rows are currently in the following format:
+    #
+    # systemFactionRow:                     systemRow:
+    #
+    # u'92.7%'                              u'Chacobog'
+    # u'Canonn'                             u'Security:'
+    # u'Independent'                        u'Medium'
+    # u'Cooperative'                        u'State:'
+    # u'Expansion'                          u'Boom'
+    # u'Chacobog'                           u'Population:'
+    # u'Controlling'                        u'2,298,725'
+    #                                       u'Power:'
+    #                                       u'None'
+    #                                       u'178.92'
+    #                                       u'ly from Sol'
+    #                                       u'Update: 10 hours'
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        # list of [row class, list of strings]
+        self.rows = []
+        self.row = None
+        self.text = []
+
+    def fn_flush(self):
+        # text between two tags forms one string
+        if self.row is not None:
+            text = ''.join(self.text).strip()
+            if text:
+                self.row[1].append(text)
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        self.fn_flush()
+        if tag == 'tr':
+            classes = (dict(attrs).get('class') or '').split()
+            self.row = None
+            for rowclass in ['systemRow', 'systemFactionRow']:
+                if rowclass in classes:
+                    self.row = [rowclass, []]
+
+    def handle_endtag(self, tag):
+        self.fn_flush()
+        if tag == 'tr' and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.row is not None:
+            self.text.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(fn_html_unescape('&' + name + ';'))
+
+    def handle_charref(self, name):
+        self.handle_data(fn_html_unescape('&#' + name + ';'))
+
+
+def fn_parse_update_age(text):
+    # converts the 'Update: 10 hours' field of a system row into (timedelta, resolution)
+    updated = text.replace("Update:", "")
+    try:
+        if 'hours' in updated:
+            return datetime.timedelta(hours=int(updated.replace("hours", ""))), 'h'
+        elif 'hour' in updated:
+            return datetime.timedelta(hours=int(updated.replace("hour", ""))), 'h'
+        elif 'mins' in updated:
+            return datetime.timedelta(minutes=int(updated.replace("mins", ""))), 'min'
+        elif 'min' in updated:
+            return datetime.timedelta(minutes=int(updated.replace("min", ""))), 'min'
+    except ValueError:
+        pass
+    return None, 'd'
+
+
+def fn_extract_faction_rows(html, backend='tokenizer'):
+    # extracts the faction table of an EDDB faction page as a list of FactionPageRow
+    # backend 'tokenizer' uses FactionPageParser, 'bs4' the slower BeautifulSoup document tree
+    if backend == 'bs4':
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        rows = []
+        for entry in soup.find_all("tr", ["systemRow", "systemFactionRow"]):
+            rows.append([' '.join(entry['class']), list(entry.stripped_strings)])
+    else:
+        # only the part of the page from the first system row to the last table row is tokenized
+        start = html.rfind('<tr', 0, max(html.find('systemRow'), 0))
+        end = html.rfind('</tr>')
+        if 0 <= start < end:
+            html = html[start:end + len('</tr>')]
+        parser = FactionPageParser()
+        parser.feed(html)
+        parser.close()
+        rows = parser.rows
+
+    result = []
+    system = None
+    update_age, update_resolution = None, 'd'
+    for rowclass, strings in rows:
+        if not strings:
+            continue
+        if 'systemFactionRow' not in rowclass.split():
+            system = strings[0]
+            update_age, update_resolution = fn_parse_update_age(strings[-1])
+        elif system is not None and len(strings) > 4:
+            # first entry should be faction influence, check for number
+            try:
+                influence = round(float(strings[0].replace("%", "")), 1)
+            except ValueError:
+                continue
+            result.append(FactionPageRow(system, influence, strings[1], strings[4], update_age, update_resolution))
 
-        scope = ['https://spreadsheets.google.com/feeds']
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            'Canonn Sheet.json', scope)
-        gc = gspread.authorize(credentials)
-        gs = gc.open('Canonn Faction Data')
-        ws = gs.worksheet("Influence " + target_name)
-
-        # Influence and Cumulative Influence table
-        rowd0 = results.shape[0]
-        cold0 = results.shape[1]
-        cell_list = ws.range(1, 1, rowd0+2, cold0)
-        # Header
-        cell_list[0].value = 'System'
-        cell_list[1].value = 'Last Reported Influence (%)'
-        cell_list[2].value = 'Change 1 Day (%)'
-        cell_list[3].value = 'Change 5 Days (%)'
-        cell_list[4].value = 'Last Update'
-        # Body
-        idx = 5
-        for row in range(0, rowd0):
-            for column in range(0, cold0):
-                cell_list[idx].value = results.iloc[row, column]
-                idx += 1
-        # Delete one row after the last in case a retreat of the faction occured
-        for column in range(0, cold0):
-            cell_list[idx].value = ''
-            idx += 1
-
-        ws.update_cells(cell_list)
-
-        # write out maximum single influence change data (average, positive, negative)
-        rowd = results_single.shape[0]
-        cold = results_single.shape[1]
-        cell_list_abs = ws.range(1, cold0+2,            rowd+2, cold0+2+cold-1)
-        cell_list_pos = ws.range(1, cold0+2+(cold+1),   rowd+2, cold0+2+(cold+1)+cold-1)
-        cell_list_neg = ws.range(1, cold0+2+2*(cold+1), rowd+2, cold0+2+2*(cold+1)+cold-1)
-        # Header
-        idx = 0
-        for i, day in enumerate(single_ichange_ranges):
-            cell_list_abs[idx].value = single_ichange_labels[i]
-            cell_list_pos[idx].value = single_ichange_labels[i]
-            cell_list_neg[idx].value = single_ichange_labels[i]
-            idx += 1
-        # Body
-        for row in range(0, rowd):
-            for column in range(0, cold):
-                cell_list_abs[idx].value = results_single.iloc[row, column]
-                cell_list_pos[idx].value = results_single_pos.iloc[row, column]
-                cell_list_neg[idx].value = results_single_neg.iloc[row, column]
-                idx += 1
-        # Delete one row after the last in case a retreat of the faction occured
-        for column in range(0, results_single.shape[1]):
-            cell_list_abs[idx].value = ''
-            cell_list_pos[idx].value = ''
-            cell_list_neg[idx].value = ''
-            idx += 1
-
-        ws.update_cells(cell_list_abs)
-        ws.update_cells(cell_list_pos)
-        ws.update_cells(cell_list_neg)
+    return result
+
+
+def fn_page_validators():
+    # validators of the processed pages, the ones saved by earlier runs are loaded on first use
+    with PAGE_VALIDATORS_LOCK:
+        if not PAGE_VALIDATORS_LOADED:
+            if os.path.isfile(PAGE_VALIDATORS_PATH):
+                with open(PAGE_VALIDATORS_PATH, 'r') as handle:
+                    PAGE_VALIDATORS.update(json.load(handle))
+            PAGE_VALIDATORS_LOADED.append(True)
+    return PAGE_VALIDATORS
+
+
+def fn_confirm_page(url):
+    # marks the last fetched version of a page as processed, later fetches only download it again after a change
+    validators = fn_page_validators()
+    with PAGE_VALIDATORS_LOCK:
+        if url in PAGE_VALIDATORS_PENDING:
+            validators[url] = PAGE_VALIDATORS_PENDING.pop(url)
+            directory = os.path.dirname(PAGE_VALIDATORS_PATH)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            fn_atomic_write(PAGE_VALIDATORS_PATH, json.dumps(validators, sort_keys=True).encode('utf-8'))
 
+# ----------------------------------------------------------------------------------------------------------------------
+# History store
+#
+# The snapshots of a target are kept in an append-only binary file history_<target>.bin with one fixed width row per
+# (timestamp, system, faction) and a json file history_<target>.json with the tables to decode system names,
+# faction names and states. The binary file is memory-mapped and sliced by time without any parsing.
+# history_<target>.hash holds the content hash of every system of every stored snapshot, see fn_system_hashes.
+#
+# Snapshots are delta encoded. A keyframe holds the rows of all systems, the following snapshots only the rows of the
+# systems that changed since the previous snapshot and a row with faction -1 for every system that was dropped. A
+# snapshot without any change is marked by a single row with system -1. Every STORE_KEYFRAME_INTERVAL snapshots a new
+# keyframe is written, so that any snapshot is rebuilt from its keyframe and at most that many deltas. The timestamps
+# of the delta snapshots are listed in the json file, all other snapshots (including all snapshots of stores written
+# before delta encoding) are keyframes.
+#
+# Writes are crash-safe. The json file is the manifest of the store, besides the tables it holds the generation of
+# the data files and the number of committed rows in each of them. An append writes and flushes the rows of all its
+# entries to the data files at once and commits them by atomically replacing the manifest. Rows beyond the committed
+# ones are ignored when reading and dropped by the next append. Rewriting a store (fn_store_write, fn_store_compact)
+# writes a new generation of data files and switches to it with the manifest. Recovering from an interrupted write
+# therefore only requires reading the manifest. Dropping old snapshots is a separate compaction step.
+
+STORE_DTYPE = np.dtype([('timestamp', '<i8'), ('system', '<i4'), ('faction', '<i8'), ('influence', '<f8'),
+                        ('state', '<i4'), ('updated_at', '<i8')])
+# the sha1 digests are kept as raw 20 bytes, the layout is the same as that of the string field used before
+STORE_HASH_DTYPE = np.dtype([('timestamp', '<i8'), ('system', '<i4'), ('hash', 'V20')])
+STORE_KEYFRAME_INTERVAL = 14
+
+
+def fn_store_paths(target_name, modestr='', generation=0):
+    # rows file and manifest of a store, the data files of generation 0 carry no generation number
+    base = './statdata/history_' + target_name + modestr
+    if generation:
+        return base + '.' + str(generation) + '.bin', base + '.json'
+    return base + '.bin', base + '.json'
+
+
+def fn_store_hash_path(target_name, modestr='', generation=0):
+    base = './statdata/history_' + target_name + modestr
+    if generation:
+        return base + '.' + str(generation) + '.hash'
+    return base + '.hash'
+
+
+def fn_store_data_files(target_name, modestr=''):
+    # data files of all generations of a store, including temporary files of interrupted writes
+    directory, prefix = os.path.split('./statdata/history_' + target_name + modestr + '.')
+    paths = []
+    for name in os.listdir(directory):
+        parts = name[len(prefix):].split('.')
+        if name.startswith(prefix) and parts[-1] in ['bin', 'hash'] and all(part.isdigit() for part in parts[:-1]):
+            paths.append(os.path.join(directory, name))
+    return paths
+
+
+def fn_store_bytes(target_name, modestr=''):
+    # size of the manifest and the data files of a store
+    paths = fn_store_data_files(target_name, modestr) + [fn_store_paths(target_name, modestr)[1]]
+    return sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+
+
+def fn_store_exists(target_name, modestr=''):
+    return os.path.isfile(fn_store_paths(target_name, modestr)[1])
+
+
+def fn_store_remove(target_name, modestr=''):
+    # the manifest goes first, without it the data files do not belong to a store anymore
+    for path in [fn_store_paths(target_name, modestr)[1]] + fn_store_data_files(target_name, modestr):
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def fn_atomic_write(path, data):
+    # replaces the content of a file via a temporary file, after a crash the file holds either the old or the new data
+    temppath = path + '.tmp'
+    with open(temppath, 'wb') as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    if os.name == 'nt' and os.path.isfile(path):
+        # os.rename does not replace existing files on windows
+        os.remove(path)
+    os.rename(temppath, path)
+
+
+def fn_sync_append(path, committed, dtype, chunks):
+    # appends rows to a data file behind its first committed rows, the tail of an interrupted write is dropped
+    # all rows are flushed to disk with a single fsync, returns the new number of rows
+    with open(path, 'ab') as handle:
+        handle.truncate(committed * dtype.itemsize)
+        for rows in chunks:
+            handle.write(rows.tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+    return committed + sum(len(rows) for rows in chunks)
+
+
+def fn_asctime_to_epoch(date):
+    return int(time.mktime(time.strptime(date)))
+
+
+def fn_epoch_to_asctime(timestamp):
+    return time.asctime(time.localtime(timestamp))
+
+
+def fn_timestamp_to_epoch(value):
+    # seconds since epoch of a pandas timestamp or datetime object
+    return int(pd.Timestamp(value).value // 10**9)
+
+
+def fn_snapshot_records(systems, factions):
+    # flattens a snapshot into a list of (system, faction id, faction name, influence, state, updated_at) tuples
+    names = factions['name'].to_dict()
+    records = []
+    for system, factions_present, updated in zip(systems.index, systems['minor_faction_presences'],
+                                                 systems['updated_at']):
+        updated = fn_timestamp_to_epoch(updated)
+        for faction in factions_present:
+            if isinstance(faction, dict):
+                influence = faction['influence']
+                if influence is None:
+                    influence = float('nan')
+                records.append((system, faction['minor_faction_id'], names.get(faction['minor_faction_id']),
+                                float(influence), faction['state'], updated))
+    return records
+
+
+def fn_system_hashes(systems, factions):
+    # sha1 content hash of every system of a snapshot over the records kept in the history store
+    # returns a dictionary system -> hash in the order of the systems frame
+    records = dict((system, []) for system in systems.index)
+    for record in fn_snapshot_records(systems, factions):
+        records[record[0]].append(record)
+    return collections.OrderedDict((system, hashlib.sha1(json.dumps(records[system]).encode('utf-8')).digest())
+                                   for system in systems.index)
+
+
+def fn_changed_systems(hashes, hashes_new):
+    # systems whose content differs between two snapshots given by their system hashes
+    # returns the new or changed systems in the order of hashes_new, followed by the systems that were dropped
+    changed = [system for system, digest in hashes_new.items() if hashes.get(system) != digest]
+    return changed + [system for system in hashes if system not in hashes_new]
+
+
+def fn_store_new_tables(generation=0):
+    # manifest of an empty store
+    # rows and hashes are the numbers of committed rows, None for stores written before they were recorded
+    tables = {'systems': [], 'states': [], 'factions': {}, 'deltas': [], 'generation': generation, 'rows': 0,
+              'hashes': 0}
+    tables['systems_codes'] = {}
+    tables['states_codes'] = {}
+    return tables
+
+
+def fn_store_load_tables(target_name, modestr=''):
+    tables = fn_store_new_tables()
+    path = fn_store_paths(target_name, modestr)[1]
+    if os.path.isfile(path):
+        with open(path, 'r') as handle:
+            saved = json.load(handle)
+        tables['systems'] = saved['systems']
+        tables['states'] = saved['states']
+        tables['factions'] = dict((id, name) for id, name in saved['factions'])
+        tables['deltas'] = saved.get('deltas', [])
+        tables['generation'] = saved.get('generation', 0)
+        tables['rows'] = saved.get('rows')
+        tables['hashes'] = saved.get('hashes')
+
+    # reverse lookups used when encoding
+    tables['systems_codes'] = dict((value, i) for i, value in enumerate(tables['systems']))
+    tables['states_codes'] = dict((value, i) for i, value in enumerate(tables['states']))
+    return tables
+
+
+def fn_store_save_tables(target_name, tables, modestr=''):
+    # commits the manifest
+    fn_atomic_write(fn_store_paths(target_name, modestr)[1],
+                    json.dumps({'systems': tables['systems'], 'states': tables['states'],
+                                'factions': sorted(tables['factions'].items()), 'deltas': tables['deltas'],
+                                'generation': tables['generation'], 'rows': tables['rows'],
+                                'hashes': tables['hashes']}).encode('utf-8'))
+
+
+def fn_store_code(tables, key, value):
+    codes = tables[key + '_codes']
+    if value not in codes:
+        codes[value] = len(tables[key])
+        tables[key].append(value)
+    return codes[value]
+
+
+def fn_snapshot_to_rows(timestamp, systems, factions, tables):
+    records = fn_snapshot_records(systems, factions)
+    rows = np.zeros(len(records), dtype=STORE_DTYPE)
+    for i, (system, faction, name, influence, state, updated) in enumerate(records):
+        tables['factions'][faction] = name
+        rows[i] = (timestamp, fn_store_code(tables, 'systems', system), faction, influence,
+                   fn_store_code(tables, 'states', state), updated)
+    return rows
+
+
+def fn_delta_to_rows(timestamp, systems, factions, changed, tables):
+    # rows of a delta snapshot holding the changed systems of a snapshot, see fn_changed_systems
+    present = [system for system in changed if system in systems.index]
+    rows = fn_snapshot_to_rows(timestamp, systems.loc[present], factions, tables)
+
+    # systems dropped or left without any faction presence are removed from the snapshot
+    written = set(rows['system'].tolist())
+    removed = [fn_store_code(tables, 'systems', system) for system in changed]
+    removed = [system for system in removed if system not in written]
+    if not removed and len(rows) == 0:
+        removed = [-1]
+    tombstones = np.zeros(len(removed), dtype=STORE_DTYPE)
+    tombstones['timestamp'] = timestamp
+    tombstones['system'] = removed
+    tombstones['faction'] = -1
+    tombstones['influence'] = float('nan')
+    tombstones['state'] = -1
+    return np.concatenate((rows, tombstones))
+
+
+def fn_store_iter_snapshots(rows, tables):
+    # generator rebuilding the snapshots of rows starting with a keyframe, returns (timestamp, systems, factions)
+    # with the systems and factions frames holding the columns used for evaluation
+    # the faction presences of systems not changed by a delta are shared with the previous snapshot
+    deltas = set(tables['deltas'])
+    state = collections.OrderedDict()
+    timestamps = np.asarray(rows['timestamp'])
+    bounds = np.concatenate(([0], np.flatnonzero(timestamps[1:] != timestamps[:-1]) + 1, [len(rows)]))
+
+    for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        timestamp = int(timestamps[start])
+        if timestamp not in deltas:
+            state = collections.OrderedDict()
+
+        # rows of one system are stored next to each other
+        current = None
+        for system, faction, influence, state_code, updated_at in zip(
+                rows['system'][start:stop].tolist(), rows['faction'][start:stop].tolist(),
+                rows['influence'][start:stop].tolist(), rows['state'][start:stop].tolist(),
+                rows['updated_at'][start:stop].tolist()):
+            if system == -1:
+                continue
+            if faction == -1:
+                state.pop(system, None)
+                continue
+            if system != current:
+                current = system
+                state[system] = ([], updated_at)
+            state[system][0].append({'minor_faction_id': faction, 'influence': influence,
+                                     'state': tables['states'][state_code]})
+
+        faction_ids = []
+        for presences, updated_at in state.values():
+            for faction in presences:
+                if faction['minor_faction_id'] not in faction_ids:
+                    faction_ids.append(faction['minor_faction_id'])
+
+        systems = pd.DataFrame({'minor_faction_presences': [presences for presences, updated_at in state.values()],
+                                'updated_at': pd.to_datetime([updated_at for presences, updated_at in state.values()],
+                                                             unit='s')},
+                               index=[tables['systems'][system] for system in state],
+                               columns=['minor_faction_presences', 'updated_at'])
+        factions = pd.DataFrame({'name': [tables['factions'].get(id) for id in faction_ids]}, index=faction_ids)
+        yield timestamp, systems, factions
+
+
+def fn_store_keyframe(rows, tables, position):
+    # position of the first row of the last keyframe up to row position
+    deltas = set(tables['deltas'])
+    for timestamp in reversed(np.unique(rows['timestamp'][:position + 1]).tolist()):
+        if timestamp not in deltas:
+            return int(np.searchsorted(rows['timestamp'], timestamp, side='left'))
+    return 0
+
+
+def fn_read_committed(path, dtype, committed):
+    # memory-maps the committed rows of a data file
+    # without a committed number of rows all complete rows are used, so a partially written row is ignored
+    count = 0
+    if os.path.isfile(path):
+        count = os.path.getsize(path) // dtype.itemsize
+    if committed is not None:
+        count = min(count, committed)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def fn_store_read_rows(target_name, modestr='', tables=None):
+    if tables is None:
+        tables = fn_store_load_tables(target_name, modestr)
+    return fn_read_committed(fn_store_paths(target_name, modestr, tables['generation'])[0], STORE_DTYPE,
+                             tables['rows'])
+
+
+def fn_store_read_hashes(target_name, modestr='', tables=None):
+    if tables is None:
+        tables = fn_store_load_tables(target_name, modestr)
+    return fn_read_committed(fn_store_hash_path(target_name, modestr, tables['generation']), STORE_HASH_DTYPE,
+                             tables['hashes'])
+
+
+def fn_store_system_hashes(target_name, timestamp, modestr='', tables=None):
+    # system hashes of a stored snapshot as returned by fn_system_hashes, None if they were not stored
+    if tables is None:
+        tables = fn_store_load_tables(target_name, modestr)
+    hashes = fn_store_read_hashes(target_name, modestr, tables)
+    start = np.searchsorted(hashes['timestamp'], timestamp, side='left')
+    stop = np.searchsorted(hashes['timestamp'], timestamp, side='right')
+    if start == stop:
+        return None
+    # the digests are raw bytes, which are read as they are, a string field would strip trailing zero bytes
+    systems = tables['systems']
+    size = STORE_HASH_DTYPE['hash'].itemsize
+    digests = hashes['hash'][start:stop].tobytes()
+    return collections.OrderedDict((systems[system], digests[i * size:(i + 1) * size]) for i, system in
+                                   enumerate(hashes['system'][start:stop].tolist()))
+
+
+def fn_store_append(target_name, entries, modestr='', tables=None):
+    # appends factionstat entries to the store, entries not newer than the last stored one are skipped
+    # entries are delta encoded against the previous snapshot using the system hashes
+    if tables is None:
+        tables = fn_store_load_tables(target_name, modestr)
+    stored = fn_store_read_rows(target_name, modestr, tables)
+    stored_rows = len(stored)
+    stored_hashes = len(fn_store_read_hashes(target_name, modestr, tables))
+    last = None
+    previous = None
+    if len(stored):
+        last = int(stored['timestamp'][-1])
+        previous = fn_store_system_hashes(target_name, last, modestr, tables)
+        keyframe = int(stored['timestamp'][fn_store_keyframe(stored, tables, len(stored) - 1)])
+        since_keyframe = len([timestamp for timestamp in tables['deltas'] if timestamp > keyframe])
+    del stored
+
+    chunks = []
+    hash_chunks = []
+    for entry in entries:
+        timestamp = fn_asctime_to_epoch(entry[0])
+        if last is not None and timestamp <= last:
+            continue
+        hashes = fn_system_hashes(entry[1], entry[2])
+        if previous is None or since_keyframe + 1 >= STORE_KEYFRAME_INTERVAL:
+            chunks.append(fn_snapshot_to_rows(timestamp, entry[1], entry[2], tables))
+            since_keyframe = 0
+        else:
+            chunks.append(fn_delta_to_rows(timestamp, entry[1], entry[2], fn_changed_systems(previous, hashes),
+                                           tables))
+            tables['deltas'].append(timestamp)
+            since_keyframe += 1
+        hash_chunks.append(np.array([(timestamp, fn_store_code(tables, 'systems', system), digest)
+                                     for system, digest in hashes.items()], dtype=STORE_HASH_DTYPE))
+        previous = hashes
+        last = timestamp
+
+    if not chunks:
+        return 0
+
+    # data first, the manifest commits it
+    tables['rows'] = fn_sync_append(fn_store_paths(target_name, modestr, tables['generation'])[0], stored_rows,
+                                    STORE_DTYPE, chunks)
+    tables['hashes'] = fn_sync_append(fn_store_hash_path(target_name, modestr, tables['generation']), stored_hashes,
+                                      STORE_HASH_DTYPE, hash_chunks)
+    fn_store_save_tables(target_name, tables, modestr)
+
+    return len(chunks)
+
+
+def fn_store_write(target_name, entries, modestr=''):
+    # replaces the content of a store with a new generation of data files
+    # the files of the old generation are only removed once the manifest refers to the new ones
+    if not entries:
+        fn_store_remove(target_name, modestr)
+        return 0
+
+    generation = 0
+    if fn_store_exists(target_name, modestr):
+        generation = fn_store_load_tables(target_name, modestr)['generation'] + 1
+    tables = fn_store_new_tables(generation)
+    count = fn_store_append(target_name, entries, modestr, tables)
+
+    current = [fn_store_paths(target_name, modestr, generation)[0],
+               fn_store_hash_path(target_name, modestr, generation)]
+    for path in fn_store_data_files(target_name, modestr):
+        if path not in current:
+            os.remove(path)
+    return count
+
+
+def fn_store_compact(target_name, max_age, modestr=''):
+    # retention step dropping the snapshots older than max_age seconds from the store, the last snapshot is kept
+    # returns the number of dropped snapshots
+    rows = fn_store_read_rows(target_name, modestr)
+    if len(rows) == 0 or rows['timestamp'][0] > time.time() - max_age:
+        return 0
+
+    count = len(np.unique(rows['timestamp']))
+    entries = fn_store_load(target_name, modestr, max_age)
+    if not entries:
+        entries = [fn_store_snapshot(target_name, fn_epoch_to_asctime(int(rows['timestamp'][-1])), modestr)]
+    del rows
+
+    fn_store_write(target_name, entries, modestr)
+    return count - len(entries)
+
+
+def fn_store_load(target_name, modestr='', max_age=None):
+    # returns the stored snapshots as factionstat entries [date, systems, factions, bModified]
+    # max_age in seconds restricts loading to recent entries, rebuilding starts at the keyframe before them
+    tables = fn_store_load_tables(target_name, modestr)
+    rows = fn_store_read_rows(target_name, modestr, tables)
+    first = 0
+    if max_age is not None:
+        first = np.searchsorted(rows['timestamp'], time.time() - max_age, side='right')
+    if first == len(rows):
+        return []
+
+    oldest = int(rows['timestamp'][first])
+    rows = rows[fn_store_keyframe(rows, tables, first):]
+
+    result = []
+    for timestamp, systems, factions in fn_store_iter_snapshots(rows, tables):
+        if timestamp >= oldest:
+            result.append([fn_epoch_to_asctime(timestamp), systems, factions, False])
+
+    return result
+
+
+def fn_store_snapshot(target_name, date, modestr=''):
+    # random access to the stored snapshot valid at a given date, i.e. the last one stored at or before it
+    # returns the factionstat entry [date, systems, factions, bModified], None if there is none
+    tables = fn_store_load_tables(target_name, modestr)
+    rows = fn_store_read_rows(target_name, modestr, tables)
+    stop = np.searchsorted(rows['timestamp'], fn_asctime_to_epoch(date), side='right')
+    if stop == 0:
+        return None
+
+    snapshot = None
+    for snapshot in fn_store_iter_snapshots(rows[fn_store_keyframe(rows, tables, stop - 1):stop], tables):
+        pass
+    timestamp, systems, factions = snapshot
+    return [fn_epoch_to_asctime(timestamp), systems, factions, False]
+
+
+def fn_read_snapshot_files(task):
+    # reads the systems and factions json files of a snapshot of older versions and the time spent on every file
+    date, paths = task
+    frames = []
+    timings = []
+    for path in paths:
+        start = time.time()
+        frames.append(pd.read_json(path))
+        timings.append((path, time.time() - start))
+    return date, frames[0], frames[1], timings
+
+
+def fn_process_pool(processes):
+    # pool of worker processes for the plots and the stat files of older versions
+    # the pools are created while target, publishing and page fetching threads run, a forked child could inherit a
+    # lock held by one of them and block on it forever, so the workers are spawned as fresh interpreters
+    # python 2 only knows fork
+    if hasattr(multiprocessing, 'get_context'):
+        return multiprocessing.get_context('spawn').Pool(processes)
+    return multiprocessing.Pool(processes)
+
+
+def fn_open_csv(path):
+    # the csv module reads bytes on python 2 and text without newline translation on python 3
+    if sys.version_info[0] < 3:
+        return open(path, 'rb')
+    return io.open(path, 'r', newline='')
+
+
+def fn_load_statdata(target_name, workers=1, timing=None):
+    # loads the snapshots of the factionstat_<target>.csv index and the systems_/factions_ json files of older versions
+    # the statdata directory is listed once, with workers > 1 the json files are parsed in a pool of worker processes
+    # returns the factionstat entries in timestamp order, timing(path, seconds) is called for every file read
+    present = set(os.listdir('./statdata'))
+    tasks = []
+    with fn_open_csv('./statdata/factionstat_' + target_name + '.csv') as handle:
+        for row in csv.reader(handle):
+            if not row:
+                continue
+            names = ['systems_' + target_name + '_' + row[0] + '.json',
+                     'factions_' + target_name + '_' + row[0] + '.json']
+            if all(name in present for name in names):
+                tasks.append((row[0], [os.path.join('./statdata', name) for name in names]))
+    tasks.sort(key=lambda task: fn_asctime_to_epoch(task[0]))
+
+    if workers > 1 and len(tasks) > 1:
+        pool = fn_process_pool(min(workers, len(tasks)))
+        try:
+            results = pool.map(fn_read_snapshot_files, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [fn_read_snapshot_files(task) for task in tasks]
+
+    entries = []
+    for date, systems, factions, timings in results:
+        if timing is not None:
+            for path, seconds in timings:
+                timing(path, seconds)
+        entries.append([date, systems, factions, True])
+    return entries
+
+
+def fn_remove_legacy_updates(target_name):
+    # removes the temporary update files of older versions of a target, factionstat_<target>_update.csv and the
+    # systems_/factions_ json files with the suffix _update, the other targets are running concurrently
+    if not os.path.isdir('./statdata'):
         return
+    for name in os.listdir('./statdata'):
+        if name == 'factionstat_' + target_name + '_update.csv' or \
+                (name.endswith('_update.json') and (name.startswith('systems_' + target_name + '_') or
+                                                    name.startswith('factions_' + target_name + '_'))):
+            os.remove(os.path.join('./statdata', name))
+
+
+def fn_migrate_statdata_to_store(target_name, workers=1, timing=None):
+    # one-shot conversion of the stat files of older versions into the history store, the old files are left in place
+    return fn_store_append(target_name, fn_load_statdata(target_name, workers, timing))
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Google sheet
+#
+# The influence tables are kept in one worksheet per target. The authorized client and the worksheets are reused
+# between updates and the last written cells are remembered, so that an update only sends the cells that changed in a
+# single batched request.
+
+def fn_sheet_client(keyfile='Canonn Sheet.json'):
+    # sign in to google sheets using gspread following directions given on the GitHub page
+    # the client is authorized once and only logs in again when its access token expired
+    client = SHEET_CLIENTS.get(keyfile)
+    if client is None:
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        scope = ['https://spreadsheets.google.com/feeds']
+        credentials = ServiceAccountCredentials.from_json_keyfile_name(keyfile, scope)
+        client = gspread.authorize(credentials)
+        SHEET_CLIENTS[keyfile] = client
+    elif client.auth.access_token_expired:
+        client.login()
+    return client
+
+
+def fn_sheet_worksheet(sheet, worksheet, keyfile='Canonn Sheet.json'):
+    client = fn_sheet_client(keyfile)
+    if (sheet, worksheet) not in SHEET_WORKSHEETS:
+        SHEET_WORKSHEETS[(sheet, worksheet)] = client.open(sheet).worksheet(worksheet)
+    return SHEET_WORKSHEETS[(sheet, worksheet)]
+
+
+def fn_cell_value(value):
+    # plain python values for the sheets api
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def fn_influence_grid(results, results_single, results_single_pos, results_single_neg):
+    # cells of the influence worksheet as {(row, column): value}, rows and columns start at 1
+    # the influence table is followed by the tables of the maximum single influence change (absolute, positive,
+    # negative), each separated by an empty column. One empty row after each table deletes the last row in case a
+    # retreat of the faction occured.
+    grid = {}
+    tables = [(['System', 'Last Reported Influence (%)', 'Change 1 Day (%)', 'Change 5 Days (%)', 'Last Update'],
+               results)]
+    tables += [(SINGLE_ICHANGE_LABELS, table) for table in [results_single, results_single_pos, results_single_neg]]
+    column0 = 1
+    for header, table in tables:
+        for column, label in enumerate(header):
+            grid[(1, column0 + column)] = label
+        for row, values in enumerate(table.itertuples(index=False)):
+            for column, value in enumerate(values):
+                grid[(row + 2, column0 + column)] = fn_cell_value(value)
+        for column in range(len(header)):
+            grid[(table.shape[0] + 2, column0 + column)] = ''
+        column0 += len(header) + 1
+    return grid
+
+
+def fn_sheet_sync(sheet, worksheet, grid, keyfile='Canonn Sheet.json'):
+    # writes the cells of grid that differ from the cells last written to the worksheet in one batched request
+    # cells written before that are no longer part of grid are cleared. The first sync of a worksheet writes all
+    # cells, after a failed request the next sync does so again.
+    # returns the number of cells written
+    import gspread
+    with SHEET_LOCK:
+        ws = fn_sheet_worksheet(sheet, worksheet, keyfile)
+        written = SHEET_CELLS.pop((sheet, worksheet), None)
+        if written is None:
+            changed = dict(grid)
+            written = {}
+        else:
+            changed = dict((cell, value) for cell, value in grid.items() if written.get(cell, '') != value)
+            changed.update((cell, '') for cell, value in written.items() if cell not in grid and value != '')
+
+        if changed:
+            try:
+                ws.update_cells([gspread.Cell(row, column, value)
+                                 for (row, column), value in sorted(changed.items())])
+            except Exception:
+                SHEET_WORKSHEETS.pop((sheet, worksheet), None)
+                raise
+
+        written.update(changed)
+        SHEET_CELLS[(sheet, worksheet)] = written
+        return len(changed)
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Influence analytics
+#
+# Influence and influence changes of the target faction in all systems of a history, computed for all systems at once
+# from the long form of the history. Independent of the google sheet upload, see fn_update_google_sheet.
+
+SINGLE_ICHANGE_RANGES = [1, 3, 5, 7, 14, 28]
+SINGLE_ICHANGE_LABELS = ['1 Day', '3 Days', '5 Days', '7 Days', '14 Days', '28 Days']
+
+
+def fn_tick_times(times):
+    # vectorized fn_tick_time for a series of datetimes
+    offset = datetime.timedelta(days=1) - datetime.timedelta(hours=TICK_HOUR, minutes=TICK_MINUTE)
+    return (times + offset).dt.normalize() + datetime.timedelta(hours=12)
+
+
+def fn_tick_series(history, systemlist, target_name):
+    # influence series of the target faction binned to tick days, newest first
+    # one row per (system, tick) going back from the last snapshot as long as the target faction is present in the
+    # system, the latest snapshot of a tick is kept. A series ends with the first tick more than the longest change
+    # range before the last update. Age is the time between the tick and the tick of the last update.
+    long = fn_history_long_frame(history)
+    long = long[(long['Faction'] == target_name) & long['System'].isin(systemlist)]
+    long = long[long.groupby(['System', 'Entry'])['Faction'].transform('size') == 1]
+    long = long.sort_values(['System', 'Entry'], ascending=[True, False])
+
+    # contiguous presence back from the last snapshot
+    long = long[long['Entry'] == len(history) - 1 - long.groupby('System').cumcount()]
+
+    long = long.assign(Tick=fn_tick_times(long['Last Time Updated']))
+    long = long.drop_duplicates(['System', 'Tick'])
+    long = long.assign(Age=long.groupby('System')['Tick'].transform('first') - long['Tick'])
+
+    # keep all ticks up to and including the first one beyond the longest range
+    beyond = (long['Age'] > datetime.timedelta(days=SINGLE_ICHANGE_RANGES[-1])).astype(int)
+    long = long[beyond.groupby(long['System']).cumsum() - beyond == 0]
+
+    return long[['System', 'Tick', 'Age', 'Influence']].reset_index(drop=True)
+
+
+def fn_influence_analytics(history, systemlist, target_name, currenttime=None):
+    # Influence of the target faction in all systems it is present in at the last snapshot, its change within the
+    # last 1 and 5 days and the largest single tick changes (absolute, positive, negative) within each range of
+    # SINGLE_ICHANGE_RANGES
+    # returns results, results_single, results_single_pos, results_single_neg as dataframes with one row per system
+    # in the order of systemlist
+    if currenttime is None:
+        currenttime = fn_tick_time(datetime.datetime.fromtimestamp(time.time() + time.timezone).replace(microsecond=0))
+
+    results = pd.DataFrame(columns=['System', 'Influence', 'Influence Change 1 Day', 'Influence Change 5 Days',
+                                    'Updated'])
+    results_single = pd.DataFrame(columns=SINGLE_ICHANGE_LABELS)
+    results_single_pos = pd.DataFrame(columns=SINGLE_ICHANGE_LABELS)
+    results_single_neg = pd.DataFrame(columns=SINGLE_ICHANGE_LABELS)
+
+    series = fn_tick_series(history, systemlist, target_name) if history else pd.DataFrame()
+    if series.empty:
+        return results, results_single, results_single_pos, results_single_neg
+
+    grouped = series.groupby('System')
+    current = grouped.first()
+    systems = [system for system in systemlist if system in current.index]
+    current = current.loc[systems]
+
+    # pairs of consecutive ticks, the change ranges refer to the age of the later tick of a pair
+    series['Change'] = grouped['Influence'].shift(1) - series['Influence']
+    series['Total'] = grouped['Influence'].transform('first') - series['Influence']
+    series['Age'] = grouped['Age'].shift(1)
+    pairs = series[series['Change'].notnull()]
+
+    def fn_within(days):
+        return pairs[pairs['Age'] < datetime.timedelta(days=days)]
+
+    results['System'] = systems
+    results['Influence'] = current['Influence'].round(1).values
+    results['Influence Change 1 Day'] = fn_within(1).groupby('System')['Total'].last().reindex(systems).fillna(0)\
+        .round(1).values
+    results['Influence Change 5 Days'] = fn_within(5).groupby('System')['Total'].last().reindex(systems).fillna(0)\
+        .round(1).values
+
+    age = (currenttime - current['Tick']).dt.total_seconds() / (24 * 60 * 60)
+    results['Updated'] = ['current' if days < 1 else ' 1 tick ago' if days < 2
+                          else str(int(round(days, 0))) + ' ticks ago' for days in age]
+
+    for label, days in zip(SINGLE_ICHANGE_LABELS, SINGLE_ICHANGE_RANGES):
+        window = fn_within(days)
+        changes = window.groupby('System')['Change']
+        largest = window.loc[window['Change'].abs().groupby(window['System']).idxmax()].set_index('System')['Change']
+        results_single[label] = largest.reindex(systems).fillna(0).round(1).values
+        results_single_pos[label] = changes.max().clip(lower=0).reindex(systems).fillna(0).round(1).values
+        results_single_neg[label] = changes.min().clip(upper=0).reindex(systems).fillna(0).round(1).values
+
+    return results, results_single, results_single_pos, results_single_neg
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def fn_history_layout():
+    # layout of the influence history plots
+    return {'xaxis': {'title': 'Date', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)',
+                      'rangeselector': {'font': {'color': 'rgb(0,0,0)'}, 'x': 1.00, 'xanchor': 'right',
+                                        'buttons': [{'count': 14, 'label': '14d', 'step': 'day',
+                                                     'stepmode': 'backward'},
+                                                    {'count': 1, 'label': '1m', 'step': 'month',
+                                                     'stepmode': 'backward'},
+                                                    {'step': 'all'}]}},
+            'yaxis': {'title': 'Influence (%)', 'mirror': True, 'showline': True, 'color': 'rgb(207,217,220)'},
+            'paper_bgcolor': 'rgb(55,71,79)', 'plot_bgcolor': 'rgb(55,71,79)',
+            'font': {'color': 'rgb(207,217,220)'}, 'legend': {'orientation': 'h', 'y': 1.05, 'yanchor': 'bottom'}}
+
+
+def fn_history_long_frame(history):
+    # long form of a history as returned by fn_get_system_history
+    # one row per (history entry, system, faction), Entry is the position of the snapshot in the history
+    positions = [position for position, entry in enumerate(history) if entry]
+    if not positions:
+        return pd.DataFrame(columns=['Entry', 'System', 'Faction', 'Influence', 'Faction State', 'Last Time Updated'])
+    return pd.concat([pd.concat(history[position]) for position in positions], keys=positions,
+                     names=['Entry', 'System', 'Row']).reset_index()
+
+
+def fn_pivot_history(history):
+    # Creates the influence and faction state marker tables of all systems of a history at once
+    # returns a dictionary system -> [data, markers], both dataframes in the format
+    #
+    # Date Faction1 Faction2 ...
+    # ...  ...      ...      ...
+    #
+    # with all factions ever present in the system in alphabetical order. Snapshots with the same update time as
+    # the previous snapshot of the system are dropped, absent factions get zero influence and an empty marker.
+    long = fn_history_long_frame(history)
+    if long.empty:
+        return {}
+    long = long.drop_duplicates(['System', 'Entry', 'Faction'])
+    factionlists = long.groupby('System')['Faction'].unique()
+
+    # keep the first snapshot of every run of equal update times of a system
+    dates = long.drop_duplicates(['System', 'Entry'])[['System', 'Entry', 'Last Time Updated']]
+    dates = dates.sort_values(['System', 'Entry'])
+    dates = dates[dates['Last Time Updated'] != dates.groupby('System')['Last Time Updated'].shift(1)]
+    long = long.merge(dates[['System', 'Entry']], on=['System', 'Entry'])
+    dates = dates.set_index(['System', 'Entry'])['Last Time Updated']
+
+    long = long.set_index(['System', 'Entry', 'Faction'])
+    present = pd.Series(True, index=long.index).unstack('Faction').notnull()
+    influence = long['Influence'].unstack('Faction').where(present, 0.0)
+    states = long['Faction State'].unstack('Faction')
+    states = states.where(states != 'None', '').fillna('')
+
+    result = {}
+    for system, factionlist in factionlists.items():
+        factionlist = sorted(factionlist)
+        data = influence.loc[system].reindex(columns=factionlist, fill_value=0.0)
+        markers = states.loc[system].reindex(columns=factionlist, fill_value='')
+        data.insert(0, 'Date', dates.loc[system])
+        markers.insert(0, 'Date', dates.loc[system])
+        data.columns.name = None
+        markers.columns.name = None
+        result[system] = [data.reset_index(drop=True), markers.reset_index(drop=True)]
+
+    return result
+
+
+def fn_state_intervals(markers):
+    # run-length segmentation of a marker table from fn_pivot_history into uninterrupted faction state periods
+    # returns a dataframe with one row per period, sorted by faction and time:
+    #
+    # Faction State Start End First Last
+    #
+    # with the dates (Start, End) and the row positions in the marker table (First, Last) of the first and the
+    # last snapshot of the period
+    columns = ['Faction', 'State', 'Start', 'End', 'First', 'Last']
+    states = markers.drop('Date', axis=1)
+    if states.shape[0] == 0 or states.shape[1] == 0:
+        return pd.DataFrame(columns=columns)
+
+    # a new run starts wherever the state differs from the previous snapshot
+    runs = (states != states.shift()).cumsum()
+
+    long = pd.DataFrame({'Faction': np.repeat(states.columns.values, states.shape[0]),
+                         'Position': np.tile(np.arange(states.shape[0]), states.shape[1]),
+                         'State': states.values.T.ravel(),
+                         'Run': runs.values.T.ravel()})
+    long = long[long['State'] != '']
+    if long.empty:
+        return pd.DataFrame(columns=columns)
+
+    grouped = long.groupby(['Faction', 'Run'])
+    intervals = pd.DataFrame({'State': grouped['State'].first(), 'First': grouped['Position'].min(),
+                              'Last': grouped['Position'].max()}).reset_index()
+    dates = markers['Date'].values
+    intervals['Start'] = dates[intervals['First'].values]
+    intervals['End'] = dates[intervals['Last'].values]
+
+    return intervals.sort_values(['Faction', 'First'])[columns].reset_index(drop=True)
+
+
+def fn_state_labels(markers, intervals):
+    # text labels and marker sizes of the history traces, derived from the state intervals
+    # returns two dictionaries faction -> list with one label and size per row of the marker table
+    #
+    # The first snapshot of a state is labeled 'X start', the last one 'X end' and a state lasting a single snapshot
+    # 'X start + end'. A state which still lasts at the last snapshot is not ended, a state lasting several snapshots
+    # keeps its plain name there. Starts and ends are marked with a larger symbol.
+    last = markers.shape[0] - 1
+    labels = dict((faction, [''] * markers.shape[0]) for faction in markers.columns[1:])
+    sizes = dict((faction, [5] * markers.shape[0]) for faction in markers.columns[1:])
+
+    for faction, state, first, end in zip(intervals['Faction'], intervals['State'], intervals['First'],
+                                          intervals['Last']):
+        labels[faction][first] = state + ' start'
+        sizes[faction][first] = 9
+        if first == end:
+            if end != last:
+                labels[faction][first] += ' + end'
+        elif end != last:
+            labels[faction][end] = state + ' end'
+            sizes[faction][end] = 9
+        else:
+            labels[faction][end] = state
+
+    return labels, sizes
+
+
+def fn_build_system_plots(task):
+    # Saves the plot data of one system to ./plotdata and builds the snapshot and history figures
+    # task is (system, influence table, marker table, last snapshot, target faction name) with the tables from
+    # fn_pivot_history and the snapshot from fn_get_system_snapshots
+    # returns the snapshot figure, the history figure, a list with the target faction trace for the influence
+    # overview and the faction state intervals, figures are plain dictionaries that can be passed between processes
+    system, data, markers, snapshot, target_name = task
+    factionlist = data.columns.tolist()[1:]
+
+    data.to_csv('./plotdata/' + system + '_history.dat', index=False)
+    markers.to_csv('./plotdata/' + system + '_markers.dat', index=False)
+
+    # Create Plots with Plotly
+    # Create current snapshot plot using last snapshot with target faction present
+    snapshot.sort_index()
+    snapshot.to_csv('./plotdata/'+system+'_snapshot.dat', index=False)
+
+    labels = snapshot['Faction'].tolist()
+    pull = []
+    color = []
+    for i, val in enumerate(labels):
+        if snapshot['Faction State'].tolist()[i] != 'None':
+            labels[i] = val + ' (' + snapshot['Faction State'].tolist()[i] + ')'
+        if val == target_name:
+            pull.append(0.05)
+            color.append('cornflowerblue')
+        else:
+            pull.append(0.0)
+            color.append('')
+    values = snapshot['Influence'].tolist()
+    values_round = []
+    for i,element in enumerate(values):
+        if isinstance(element, numbers.Real):
+            values_round.append(round(element, 1))
+        else:
+            values_round.append(0.0)
+    centertext = str(snapshot['Last Time Updated'].tolist()[0]).split()[0]+'<br>' + \
+                 str(snapshot['Last Time Updated'].tolist()[0]).split()[1]
+
+    # if snapshot is too old, change color of center text of pie chart
+    # centertextcolor = 'rgb(207,217,220)'
+    centertextcolor = 'lightgreen'
+    if (time.time() - time.mktime(time.strptime(str(snapshot['Last Time Updated'].tolist()[0]),
+                                               '%Y-%m-%d %H:%M:%S'))) > (1 * 24 * 60 * 60 + 1):
+        centertextcolor = 'yellow'
+    if (time.time() - time.mktime(time.strptime(str(snapshot['Last Time Updated'].tolist()[0]),
+                                               '%Y-%m-%d %H:%M:%S'))) > (2 * 24 * 60 * 60 + 1):
+        centertextcolor = 'red'
+
+    layout = {'annotations': [{"font": {'color': centertextcolor}, "showarrow": False, "text": centertext}],
+              'paper_bgcolor': 'rgb(55,71,79)', 'plot_bgcolor': 'rgb(55,71,79)',
+              'font': {'color': 'rgb(207,217,220)'}, 'legend': {'orientation': 'h'}, 'autosize': True}
+
+    pietrace = dict(type='pie', labels=labels, values=values_round, hoverinfo="label+percent", hole=.4, pull=pull,
+                    marker=dict(colors=color))
+    snapshotfig = {'data': [pietrace], 'layout': layout}
+
+    # py.image.save_as(plotlyfig, filename='./plots/' + system + '_snapshot.png')
+
+    # History
+    dates = data['Date'].tolist()
+    intervals = fn_state_intervals(markers)
+    labels, sizes = fn_state_labels(markers, intervals)
+    traces = []
+    overview_traces = []
+    for faction in factionlist:
+
+        ydata = data[faction].tolist()
+        ydata_round = []
+        for i, element in enumerate(ydata):
+            if isinstance(element, numbers.Real):
+                ydata_round.append(round(element, 1))
+            else:
+                ydata_round.append(0.0)
+
+        # mark only the start and end of a faction state, using different symbol sizes
+        text_markers = labels[faction]
+        size = sizes[faction]
+
+        if faction == target_name:
+            width = 3
+            color = 'cornflowerblue'
+            trace = dict(type='scatter', x=dates, y=ydata_round, mode='lines+markers',
+                         name=faction, line=dict(shape='spline', width=width, color=color),
+                         text=text_markers, marker=dict(size=size, line=dict(width=0), symbol='circle'))
+            overview_traces.append(dict(type='scatter', x=dates, y=ydata_round, mode='lines+markers', name=system,
+                                        line=dict(shape='spline', width=2),
+                                        text=text_markers, marker=dict(size=size, line=dict(width=0),
+                                                                       symbol='circle')))
+        else:
+            width = 2
+            trace = dict(type='scatter', x=dates, y=ydata_round, mode='lines+markers',
+                         name=faction, line=dict(shape='spline', width=width),
+                         text=text_markers, marker=dict(size=size, line=dict(width=0), symbol='circle'))
+
+        traces.append(trace)
+
+    historyfig = {'data': traces, 'layout': fn_history_layout()}
+    # py.image.save_as(plotlyfig, filename='./plots/' + system + '_history.png')
+
+    intervals.insert(0, 'System', system)
+
+    return snapshotfig, historyfig, overview_traces, intervals
+
+
+def fn_figure_fingerprint(figure):
+    # content hash of a figure dictionary
+    return hashlib.sha1(json.dumps(figure, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def fn_render_figure(figure, path):
+    # writes a figure as json and as html file, path is given without extension
+    # the html files load plotly.js from the plotly CDN instead of embedding the 3 MB bundle in every file
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path + '.json', 'w') as handle:
+        json.dump(figure, handle, sort_keys=True, default=str)
+    import plotly.offline
+    plotly.offline.plot(figure, filename=path + '.html', auto_open=False, include_plotlyjs='cdn')
+
+
+def fn_publish_figure(figure, filename):
+    # publishes a figure to plotly, returns the url
+    import plotly.plotly as py
+    import plotly.graph_objs as go
+    print ('Publishing ' + filename)
+    return py.plot(go.Figure(data=figure['data'], layout=figure['layout']), filename=filename, auto_open=False)
+
+
+class PublishQueue:
+    # Background publishing of figures
+    #
+    # Figures are identified by target and name. Enqueuing a figure replaces a pending older version of it, so only
+    # the newest version of every figure gets uploaded. Worker threads upload the figures with publisher(figure,
+    # filename), which returns the url or raises an exception. Failed uploads are retried with jittered exponential
+    # backoff. Pending figures are kept in a backlog file and survive restarts. Successful uploads are recorded in
+    # the plot manifest of the target.
+
+    def __init__(self, publisher=fn_publish_figure, workers=2, backlog=PUBLISH_BACKLOG,
+                 base_delay=30, max_delay=3600, max_attempts=20):
+        self.publisher = publisher
+        self.backlog = backlog
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+        # filename -> {'target', 'name', 'figure', 'fingerprint', 'attempts', 'due'}, uploads in progress are active
+        # known holds the filenames this queue has handled, the other figures in the backlog belong to other processes
+        self.pending = collections.OrderedDict()
+        self.active = {}
+        self.known = set()
+        self.condition = threading.Condition()
+        self.fn_load_backlog()
+
+        for i in range(workers):
+            thread = threading.Thread(target=self.fn_work)
+            thread.daemon = True
+            thread.start()
+
+    def fn_enqueue(self, target_name, figures):
+        # figures is a list of (name, figure, fingerprint)
+        with self.condition:
+            for name, figure, fingerprint in figures:
+                filename = target_name + '/' + name
+                self.known.add(filename)
+                self.pending.pop(filename, None)
+                self.pending[filename] = {'target': target_name, 'name': name, 'figure': figure,
+                                          'fingerprint': fingerprint, 'attempts': 0, 'due': 0}
+            self.fn_save_backlog()
+            self.condition.notify_all()
+
+    def fn_drain(self, timeout):
+        # waits until all figures are published or timeout seconds passed, returns the number of figures left
+        deadline = time.time() + timeout
+        with self.condition:
+            while (self.pending or self.active) and time.time() < deadline:
+                self.condition.wait(min(1.0, deadline - time.time()))
+            return len(self.pending) + len(self.active)
+
+    def fn_backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def fn_next(self):
+        # filename of the pending figure due first, None if none is due yet, a figure is uploaded by one thread only
+        # returns the filename and the time to wait for the next figure
+        ready = [(item['due'], filename) for filename, item in self.pending.items() if filename not in self.active]
+        if not ready:
+            return None, None
+        due, filename = min(ready)
+        if due > time.time():
+            return None, due - time.time()
+        return filename, None
+
+    def fn_work(self):
+        while True:
+            with self.condition:
+                filename, wait = self.fn_next()
+                while filename is None:
+                    self.condition.wait(wait)
+                    filename, wait = self.fn_next()
+                item = self.pending.pop(filename)
+                self.active[filename] = item
 
+            try:
+                with fn_stage('publish', item['target']) as record:
+                    record['rows'] = 1
+                    record['bytes_written'] = len(json.dumps(item['figure'], default=str))
+                    url = self.publisher(item['figure'], filename)
+            except Exception as e:
+                print ('Failed to publish ' + filename + ': ' + str(e))
+                url = None
+
+            with self.condition:
+                del self.active[filename]
+                if url is not None:
+                    fn_update_plot_manifest(item['target'], {item['name']: {'published': item['fingerprint'],
+                                                                            'url': url}})
+                elif filename not in self.pending:
+                    # retry, unless a newer version of the figure was enqueued meanwhile
+                    item['attempts'] += 1
+                    if item['attempts'] < self.max_attempts:
+                        item['due'] = time.time() + self.fn_backoff(item['attempts'])
+                        self.pending[filename] = item
+                    else:
+                        print ('Giving up publishing ' + filename)
+                self.fn_save_backlog()
+                self.condition.notify_all()
+
+    def fn_read_backlog(self):
+        if not os.path.isfile(self.backlog):
+            return []
+        with open(self.backlog, 'r') as handle:
+            return json.load(handle)
+
+    def fn_load_backlog(self):
+        directory = os.path.dirname(self.backlog)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with fn_file_lock(self.backlog):
+            for item in self.fn_read_backlog():
+                item['due'] = 0
+                filename = item['target'] + '/' + item['name']
+                self.known.add(filename)
+                self.pending[filename] = item
+
+    def fn_save_backlog(self):
+        # figures being uploaded stay in the backlog until the upload succeeded
+        # overlapping runs share the backlog, the figures other processes added since it was read are kept
+        items = list(self.active.values()) + [item for filename, item in self.pending.items()
+                                              if filename not in self.active]
+        with fn_file_lock(self.backlog):
+            others = [item for item in self.fn_read_backlog() if item['target'] + '/' + item['name'] not in self.known]
+            fn_atomic_write(self.backlog, json.dumps(others + items, default=str).encode('utf-8'))
+
+
+@contextlib.contextmanager
+def fn_file_lock(path):
+    # exclusive lock of path between processes, held on the file path.lock while the block runs
+    # without fcntl the block runs unlocked
+    with open(path + '.lock', 'a') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def fn_publish_queue():
+    # publish queue shared by all targets of the process, created on first use
+    # the targets run in threads, the lock makes sure that only one of them creates the queue
+    with PUBLISH_QUEUE_LOCK:
+        if not PUBLISH_QUEUE:
+            import plotly.plotly as py
+            py.sign_in('criosix','3jLviaVFikQOH1BZRcew')
+            PUBLISH_QUEUE.append(PublishQueue())
+        return PUBLISH_QUEUE[0]
+
+
+def fn_drain_publish_queue(timeout=PUBLISH_DRAIN_TIMEOUT):
+    # waits for the background uploads of a one-shot run, the backlog left by earlier runs is published as well
+    # figures not published in time stay in the backlog for the next run, returns their number
+    if not PUBLISH_QUEUE and not os.path.isfile(PUBLISH_BACKLOG):
+        return 0
+    return fn_publish_queue().fn_drain(timeout)
+
+
+def fn_load_plot_manifest(target_name):
+    # manifest of the rendered and published figures of a target, structure is
+    # {figure name: {'rendered': fingerprint, 'published': fingerprint, 'url': plotly url}}
+    path = './plots/manifest_' + target_name + '.json'
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as handle:
+        return json.load(handle)
+
+
+def fn_save_plot_manifest(target_name, manifest):
+    if not os.path.isdir('./plots'):
+        os.makedirs('./plots')
+    fn_atomic_write('./plots/manifest_' + target_name + '.json',
+                    json.dumps(manifest, sort_keys=True, indent=1).encode('utf-8'))
+
+
+def fn_update_plot_manifest(target_name, updates):
+    # merges {figure name: {key: value}} into the plot manifest of a target
+    with PLOT_MANIFEST_LOCK:
+        manifest = fn_load_plot_manifest(target_name)
+        for name, values in updates.items():
+            manifest.setdefault(name, {}).update(values)
+        fn_save_plot_manifest(target_name, manifest)
+
+
+def fn_load_dump_validators(jsondir):
+    path = os.path.join(jsondir, 'dump_validators.json')
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as handle:
+        return json.load(handle)
+
+
+def fn_save_dump_validators(jsondir, validators):
+    with open(os.path.join(jsondir, 'dump_validators.json'), 'w') as handle:
+        json.dump(validators, handle)
+
+
+def fn_download_dump(session, url, path, validators, timeout=600, chunk_size=1024*1024):
+    # streams an EDDB dump with gzip transfer encoding to disk as it is, without parsing it
+    # the request is conditional on the validators of the dump on disk, validators is updated in place
+    # returns False if the dump did not change
+    headers = {'Accept-Encoding': 'gzip, deflate'}
+    if os.path.isfile(path):
+        headers.update(validators.get(url, {}))
+
+    response = session.get(url, headers=headers, stream=True, timeout=timeout)
+    try:
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
 
-def fn_update_from_eddb():
-    def fn_download_from_ssl(url):
+        # the dump is only replaced once it was downloaded completely
+        partpath = path + '.part'
+        try:
+            with open(partpath, 'wb') as handle:
+                for chunk in response.iter_content(chunk_size):
+                    handle.write(chunk)
+        except Exception:
+            os.remove(partpath)
+            raise
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(partpath, path)
+    finally:
+        response.close()
+
+    validators[url] = {}
+    if 'ETag' in response.headers:
+        validators[url]['If-None-Match'] = response.headers['ETag']
+    if 'Last-Modified' in response.headers:
+        validators[url]['If-Modified-Since'] = response.headers['Last-Modified']
+
+    return True
+
+
+def fn_update_from_eddb(archive=EDDB_ARCHIVE, jsondir='./jsondata'):
+    # downloads the populated systems and factions dumps if they changed since the last download
+    # dumps are saved as arrays of records as provided by EDDB, which allows to stream them when parsing
+    # returns True if any of the dumps changed
+    session = fn_http_session(1)
+    validators = fn_load_dump_validators(jsondir)
+    changed = False
+    with fn_stage('download') as record:
         try:
-            # method from https://stackoverflow.com/questions/32400867/pandas-read-csv-from-url
-            # to deal with SSL sites, mostly for MacOS
-            s = requests.get(url).content
-            frame = pd.read_json(io.StringIO(s.decode('utf-8')))
-        except:
-            # standard method
-            frame = pd.read_json(url)
-        return frame
-
-    systems_populated = fn_download_from_ssl('https://eddb.io/archive/v5/systems_populated.json')
-    systems_populated.to_json('./jsondata/systems_populated.json')
-    factions = fn_download_from_ssl('https://eddb.io/archive/v5/factions.json')
-    factions.to_json('./jsondata/factions.json')
+            for name in ['systems_populated.json', 'factions.json']:
+                if fn_download_dump(session, archive + name, os.path.join(jsondir, name), validators):
+                    changed = True
+                    record['rows'] += 1
+                    record['bytes_written'] += os.path.getsize(os.path.join(jsondir, name))
+                else:
+                    print (name + ' did not change since the last download')
+        finally:
+            fn_save_dump_validators(jsondir, validators)
+    return changed
+
 
 def fn_recreate_factionstat_csv_():
 
@@ -876,99 +2457,406 @@ def fn_recreate_factionstat_csv_():
             writer.writerow([entry])
 
 # ----------------------------------------------------------------------------------------------------------------------
+# Stage metrics
+#
+# Every stage of the update pipeline records its duration, the rows it processed and the bytes it read and wrote for
+# a target, stages not bound to a target have an empty target. One json line is appended to METRICS_PATH per stage
+# run, e.g.
+# {"stage": "snapshot_load", "target": "Canonn", "time": 1500000000.0, "duration": 1.2, "rows": 90,
+#  "bytes_read": 5000000, "bytes_written": 0, "status": "ok"}
+# The rows are stage specific: snapshots loaded or built, figures built or rendered, cells written etc.
+
+@contextlib.contextmanager
+def fn_stage(stage, target_name=''):
+    # context manager timing a stage, yields the record, in which the stage sets rows and bytes
+    # the record is written when the stage ends, a stage ending by an exception is recorded with status failed
+    record = collections.OrderedDict([('stage', stage), ('target', target_name), ('time', time.time()),
+                                      ('duration', None), ('rows', 0), ('bytes_read', 0), ('bytes_written', 0),
+                                      ('status', 'ok')])
+    profile = fn_profile_start(stage)
+    try:
+        yield record
+    except Exception:
+        record['status'] = 'failed'
+        raise
+    finally:
+        record['duration'] = round(time.time() - record['time'], 6)
+        if profile is not None:
+            profile.disable()
+            fn_profile_save(profile, stage, target_name, record['time'])
+        fn_write_metrics(record)
+
+
+def fn_profile_start(stage):
+    # returns an enabled profiler if the stage is to be profiled
+    # only one profiler can be active at a time in some interpreters, the stage then runs without one
+    if stage not in PROFILE_STAGES:
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None
+    return profile
+
+
+def fn_profile_save(profile, stage, target_name, start):
+    # the statistics can be viewed with pstats, e.g. pstats.Stats(path).sort_stats('cumulative').print_stats(20)
+    directory = os.path.dirname(METRICS_PATH or './metrics/')
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    name = '_'.join(part for part in ['profile', stage, target_name, str(int(start))] if part)
+    profile.dump_stats(os.path.join(directory, name + '.prof'))
+
+
+def fn_write_metrics(record):
+    # a metrics file that cannot be written does not stop the update
+    if METRICS_PATH is None:
+        return
+    try:
+        with METRICS_LOCK:
+            directory = os.path.dirname(METRICS_PATH)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(METRICS_PATH, 'a') as handle:
+                handle.write(json.dumps(record) + '\n')
+    except (IOError, OSError) as e:
+        print ('Failed to write metrics: ' + str(e))
 
-def fnInfLoop(targetlist, webpublishing):
+# ----------------------------------------------------------------------------------------------------------------------
+# Target execution
+#
+# The pipelines of the individual targets (load, update, save, plot, sheet upload) share nothing but the extracted
+# dump and the fetched pages, which are only read. They run concurrently in a pool of threads, most of their time is
+# spent in I/O, the plots are built in worker processes and published in the background. The worker processes of the
+# plots are divided between the targets running at the same time.
+
+def fn_run_targets(targetlist, task, workers=TARGET_WORKERS, label='Update'):
+    # runs task(target_name) for all targets, with workers > 1 concurrently
+    # a failure of one target does not affect the others, it is printed and the target is left out of the result
+    # returns a dictionary target_name -> return value of task
+
+    def run(target_name):
+        try:
+            return target_name, task(target_name), True
+        except Exception:
+            traceback.print_exc()
+            print (label + ' failed for ' + target_name)
+            return target_name, None, False
+
+    if workers > 1 and len(targetlist) > 1:
+        pool = ThreadPool(min(workers, len(targetlist)))
+        try:
+            results = pool.map(run, targetlist)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [run(target_name) for target_name in targetlist]
 
-    rundaily = False
-    while True:
+    return dict((target_name, result) for target_name, result, success in results if success)
 
-        if (datetime.datetime.now().hour <  2):
-            rundaily = False
-        elif not rundaily:
-            while not rundaily:
-                try:
-                    fnDailyUpdate(targetlist=targetlist, webpublishing=webpublishing)
-                    rundaily = True
-                except:
-                    pass
+
+def fn_plot_workers(targetlist, workers=TARGET_WORKERS):
+    # worker processes available for the plots of a target while the other targets run
+    return max(1, PLOT_WORKERS // max(1, min(workers, len(targetlist))))
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+class FactionStatsDaemon:
+    # Resident service mode
+    #
+    # The FactionStats objects of all targets are loaded once and kept in memory between cycles. Point updates from
+    # the EDDB webpage are scheduled in a fixed interval, the integration of the daily dump is scheduled at a fixed
+    # delay after the tick. Both only save the entries they modified.
+
+    def __init__(self, targetlist, webpublishing, interval=10*60, daily_delay=3*60*60, retry=10*60,
+                 workers=TARGET_WORKERS):
+        self.targetlist = targetlist
+        self.webpublishing = webpublishing
+        self.workers = workers
+        self.plot_workers = fn_plot_workers(targetlist, workers)
+        # all times in seconds
+        self.interval = interval
+        self.daily_delay = datetime.timedelta(seconds=daily_delay)
+        self.retry = retry
+        self.scheduler = sched.scheduler(time.time, time.sleep)
+        # signature of the dump files integrated last, see fn_daily_update
+        self.integrated = None
+
+        def load(target_name):
+            print ('load faction data for ' + target_name)
+            return FactionStats(target_name, mode='update')
+
+        # targets that fail to load are not served
+        self.factionstats = fn_run_targets(targetlist, load, workers, 'Loading')
+        self.targetlist = [target_name for target_name in targetlist if target_name in self.factionstats]
+
+    def fn_next_daily_run(self):
+        # first integration time of a dump after now, in UTC
+        now = datetime.datetime.utcnow()
+        return fn_next_tick(now - self.daily_delay) + self.daily_delay
+
+    def fn_daily_overdue(self):
+        # checks whether the dump of the last scheduled daily run is missing for any target
+        last_run = calendar.timegm((self.fn_next_daily_run() - datetime.timedelta(days=1)).timetuple())
+        for factionstats in self.factionstats.values():
+            date = factionstats.fn_last_dump_date()
+            if date is None or fn_asctime_to_epoch(date) < last_run:
+                return True
+        return False
+
+    def fn_schedule_daily(self, delay=None):
+        if delay is None:
+            delay = (self.fn_next_daily_run() - datetime.datetime.utcnow()).total_seconds()
+        print ('next dump integration in ' + str(int(delay)) + ' s')
+        self.scheduler.enter(delay, 0, self.fn_daily_update, ())
+
+    def fn_run(self):
+        # the publish queue starts with the backlog of earlier runs
+        if self.webpublishing:
+            fn_publish_queue()
+        if self.fn_daily_overdue():
+            self.fn_schedule_daily(0)
+        else:
+            self.fn_schedule_daily()
+        self.scheduler.enter(0, 1, self.fn_point_update, ())
+        self.scheduler.run()
+
+    def fn_daily_update(self):
+        # the next run is scheduled whatever happens, so that a failure does not stop the service
+        # failed downloads and dumps that did not change yet are retried after self.retry seconds
+
+        def integrate(target_name):
+            factionstats = self.factionstats[target_name]
+            factionstats.fn_discard_updates()
+            factionstats.fn_apply_retention()
+            factionstats.fn_pull_data_from_json(target_name, extracted=extracted)
+            factionstats.fn_save_factionstat(target_name)
+            fn_store_compact(target_name, 90*24*60*60+1)
+            factionstats.fn_plot_system_history(target_name, webpublishing=self.webpublishing,
+                                                updatelist=factionstats.changed_systems, workers=self.plot_workers)
+
+        delay = self.retry
+        try:
+            print ('Updating from EDDB')
+            print (datetime.datetime.now())
+            changed = fn_update_from_eddb()
+            signature = fn_dump_signature('./jsondata/systems_populated.json', './jsondata/factions.json')
+            # a dump that did not change since the last integration is not integrated again, EDDB publishes the
+            # new one later. Dumps downloaded but not integrated before a restart are integrated.
+            if not changed and signature == self.integrated:
+                print ('EDDB dump not updated yet, next attempt in ' + str(self.retry) + ' s')
+                return
+            extracted = fn_extract_targets_from_json(self.targetlist)
+            fn_run_targets(self.targetlist, integrate, self.workers, 'Dump integration')
+            self.integrated = signature
+            delay = None
+        except Exception:
+            traceback.print_exc()
+            print ('Dump integration failed, next attempt in ' + str(self.retry) + ' s')
+        finally:
+            self.fn_schedule_daily(delay)
+
+    def fn_point_update(self):
+        # the next run is scheduled whatever happens, so that a failure does not stop the service
+
+        def update(target_name):
+            factionstats = self.factionstats[target_name]
+            updatelist = factionstats.fn_update(target_name, pages=pages)
+            if updatelist:
+                factionstats.fn_save_factionstat(target_name, mode='update')
+                factionstats.fn_plot_system_history(target_name, webpublishing=self.webpublishing,
+                                                    updatelist=updatelist, workers=self.plot_workers)
+                factionstats.fn_update_google_sheet(target_name, reuse_history=True)
 
         try:
-            fnPointUpdate(targetlist=targetlist, webpublishing=webpublishing)
-        except:
-            pass
+            # the faction pages of all targets are fetched concurrently
+            urls = []
+            for target_name in self.targetlist:
+                self.factionstats[target_name].fn_begin_update()
+                urls.append(self.factionstats[target_name].fn_faction_url(target_name))
+            pages = fn_fetch_pages([url for url in urls if url is not None])
+
+            fn_run_targets(self.targetlist, update, self.workers, 'Point update')
+        except Exception:
+            traceback.print_exc()
+            print ('Point update failed, next attempt in ' + str(self.interval) + ' s')
+        finally:
+            self.scheduler.enter(self.interval, 1, self.fn_point_update, ())
+
 
-        time.sleep(10*60)
+def fnInfLoop(targetlist, webpublishing, workers=TARGET_WORKERS):
+    # runs the resident service until the process is stopped
+    FactionStatsDaemon(targetlist=targetlist, webpublishing=webpublishing, workers=workers).fn_run()
 
 
 
-def fnDailyUpdate(targetlist, webpublishing):
+def fnDailyUpdate(targetlist, webpublishing, workers=TARGET_WORKERS):
     # Download lates EDDB dump only once
     print ('Updating from EDDB')
     print (datetime.datetime.now())
 
     fn_update_from_eddb()
 
-    for target_name in targetlist:
+    # Extract the data of all targets with one pass over the dump
+    print ('parse eddb dump')
+    print (datetime.datetime.now())
+    extracted = fn_extract_targets_from_json(targetlist)
+    plot_workers = fn_plot_workers(targetlist, workers)
+
+    def integrate(target_name):
         # Create oject and load previous factionstat data if existent
-        print ('load faction data')
+        print ('load faction data for ' + target_name)
         print (datetime.datetime.now())
         factionstats = FactionStats(target_name)
         # Add recent and new faction data from current dump to factionstat
-        print ('parse eddb dump')
-        print (datetime.datetime.now())
-        factionstats.fn_pull_data_from_json(target_name)
+        factionstats.fn_pull_data_from_json(target_name, extracted=extracted)
         # Save factionstat
-        print ('save faction data')
+        print ('save faction data for ' + target_name)
         print (datetime.datetime.now())
         factionstats.fn_save_factionstat(target_name)
+        # Drop snapshots beyond the retention period from the store
+        fn_store_compact(target_name, 90*24*60*60+1)
         # Plot from factionstat
-        print ('make plots')
+        print ('make plots for ' + target_name)
         print (datetime.datetime.now())
-        factionstats.fn_plot_system_history(target_name, webpublishing=webpublishing)
+        factionstats.fn_plot_system_history(target_name, webpublishing=webpublishing,
+                                            updatelist=factionstats.changed_systems, workers=plot_workers)
 
+    # the targets are integrated concurrently, a failing target does not stop the others
+    fn_run_targets(targetlist, integrate, workers, 'Dump integration')
 
 
-def fnPointUpdate(targetlist, webpublishing):
-    currenttime = datetime.datetime.fromtimestamp(time.time() + time.timezone).replace(microsecond=0)
-    ticktime = currenttime.replace(hour=22, minute=50)
 
-    for target_name in targetlist:
+def fnPointUpdate(targetlist, webpublishing, workers=TARGET_WORKERS):
+    plot_workers = fn_plot_workers(targetlist, workers)
+
+    def load(target_name):
         # Create oject and load previous factionstat data if existent
-        print ('load factiondata for update')
+        print ('load factiondata for update of ' + target_name)
         print (datetime.datetime.now())
-        factionstats = FactionStats(target_name, mode='update')
+        return FactionStats(target_name, mode='update')
+
+    # targets that fail to load are skipped
+    resident = fn_run_targets(targetlist, load, workers, 'Loading')
+    targetlist = [target_name for target_name in targetlist if target_name in resident]
+    urls = [resident[target_name].fn_faction_url(target_name) for target_name in targetlist]
+
+    # Fetch the faction pages of all targets concurrently
+    print ('fetch faction pages')
+    print (datetime.datetime.now())
+    pages = fn_fetch_pages([url for url in urls if url is not None])
+
+    def update(target_name):
+        factionstats = resident[target_name]
         # only plot if there are updates
-        print ('create updatelist')
+        print ('create updatelist for ' + target_name)
         print (datetime.datetime.now())
-        updatelist = factionstats.fn_update(target_name)
+        updatelist = factionstats.fn_update(target_name, pages=pages)
         if updatelist:
-            print ('save faction data')
+            print ('save faction data for ' + target_name)
             print (datetime.datetime.now())
             factionstats.fn_save_factionstat(target_name, mode='update')
-            print ('make updated plots')
+            print ('make updated plots for ' + target_name)
             print (datetime.datetime.now())
-            factionstats.fn_plot_system_history(target_name, webpublishing=webpublishing, updatelist=updatelist)
-            print ('update google sheet')
+            factionstats.fn_plot_system_history(target_name, webpublishing=webpublishing, updatelist=updatelist,
+                                                workers=plot_workers)
+            print ('update google sheet for ' + target_name)
             print (datetime.datetime.now())
             factionstats.fn_update_google_sheet(target_name, reuse_history=True)
 
-# main program from command line
-if __name__ == '__main__':
+    # the targets are updated concurrently, a failing target does not stop the others
+    fn_run_targets(targetlist, update, workers, 'Point update')
 
-    webpublishing = True
-    targetlist = ['Canonn', 'Canonn Deep Space Research']
+def fnAnalyticsUpdate(targetlist, upload=True, workers=TARGET_WORKERS):
+    # influence tables of the stored data including the point updates, uploaded to the google sheet or printed
+
+    def analytics(target_name):
+        factionstats = FactionStats(target_name, mode='update')
+        if upload:
+            factionstats.fn_update_google_sheet(target_name)
+            return
+        results, results_single, results_single_pos, results_single_neg = \
+            factionstats.fn_influence_changes(target_name)
+        print (target_name)
+        print (results.to_string(index=False))
+        print (results_single.to_string(index=False))
+
+    # printing runs the targets one after another, so that their tables do not interleave
+    fn_run_targets(targetlist, analytics, workers if upload else 1, 'Analytics')
 
-    # emergency restoration of factioinstat.csv for Canonn in case it got deleted
-    # fn_recreate_factionstat_csv_()
 
-    if len(argv) == 1:
-        fnDailyUpdate(targetlist=targetlist, webpublishing=webpublishing)
-    # update from webpage can be run separately or is run immediately after EDDB dump integration
-    # short circuit operator or evaluates second expression only if first is false
-    if len(argv) == 1 or argv[1] == '-update':
-        fnPointUpdate(targetlist=targetlist, webpublishing=webpublishing)
-    elif argv[1] == '-infloop':
-        fnInfLoop(targetlist=targetlist, webpublishing=webpublishing)
+def fnPlotUpdate(targetlist, webpublishing, workers=TARGET_WORKERS):
+    # plots of the stored data including the point updates, only figures that changed are rendered and published
+    plot_workers = fn_plot_workers(targetlist, workers)
 
+    def plot(target_name):
+        factionstats = FactionStats(target_name, mode='update')
+        factionstats.fn_plot_system_history(target_name, webpublishing=webpublishing, workers=plot_workers)
+
+    fn_run_targets(targetlist, plot, workers, 'Plotting')
+
+
+def fn_arguments(arguments):
+    # command line with one subcommand per run mode, the flags of older versions are translated:
+    # no arguments runs the daily update followed by the point update, -update and -infloop are the subcommands
+    # update and infloop. The modules needed by a mode are only imported when it runs.
+    if not arguments:
+        arguments = ['daily', '--then-update']
+    elif arguments[0] in ['-update', '-infloop']:
+        arguments = [arguments[0][1:]] + arguments[1:]
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--targets', nargs='+', default=TARGETLIST, help='names of the target factions')
+    common.add_argument('--workers', type=int, default=TARGET_WORKERS, help='targets processed concurrently')
+    common.add_argument('--no-publish', dest='webpublishing', action='store_false',
+                        help='render the plots locally without publishing them to plotly')
+
+    parser = argparse.ArgumentParser(description='Influence statistics of factions from EDDB')
+    subparsers = parser.add_subparsers(dest='command')
+    daily = subparsers.add_parser('daily', parents=[common], help='integrate the latest EDDB dump')
+    daily.add_argument('--then-update', action='store_true', help='run the point update afterwards')
+    subparsers.add_parser('update', parents=[common], help='point update from the EDDB faction pages')
+    subparsers.add_parser('infloop', parents=[common], help='resident service running both updates on schedule')
+    analytics = subparsers.add_parser('analytics-only', parents=[common],
+                                      help='influence tables of the stored data, uploaded to the google sheet')
+    analytics.add_argument('--print', dest='upload', action='store_false',
+                           help='print the tables instead of uploading them')
+    subparsers.add_parser('plots-only', parents=[common], help='plots of the stored data')
+
+    args = parser.parse_args(arguments)
+    if args.command is None:
+        parser.error('a subcommand is required')
+    return args
+
+
+def fnMain(arguments):
+    args = fn_arguments(arguments)
+
+    # emergency restoration of factioinstat.csv for Canonn in case it got deleted
+    # fn_recreate_factionstat_csv_()
 
+    if args.command == 'daily':
+        fnDailyUpdate(targetlist=args.targets, webpublishing=args.webpublishing, workers=args.workers)
+        # update from webpage is run immediately after EDDB dump integration
+        if args.then_update:
+            fnPointUpdate(targetlist=args.targets, webpublishing=args.webpublishing, workers=args.workers)
+    elif args.command == 'update':
+        fnPointUpdate(targetlist=args.targets, webpublishing=args.webpublishing, workers=args.workers)
+    elif args.command == 'infloop':
+        fnInfLoop(targetlist=args.targets, webpublishing=args.webpublishing, workers=args.workers)
+    elif args.command == 'analytics-only':
+        fnAnalyticsUpdate(targetlist=args.targets, upload=args.upload, workers=args.workers)
+    elif args.command == 'plots-only':
+        fnPlotUpdate(targetlist=args.targets, webpublishing=args.webpublishing, workers=args.workers)
+
+    # the uploads run in the background during all steps of the run, the runs which plot wait for them at the end
+    if args.webpublishing and args.command in ['daily', 'update', 'plots-only']:
+        fn_drain_publish_queue()
 
+# main program from command line
+# usage: python factionstats.py [daily|update|infloop|analytics-only|plots-only] [--targets ...] [--workers N]
+#        [--no-publish], python factionstats.py <subcommand> --help lists the options of a subcommand
+if __name__ == '__main__':
+    fnMain(sys.argv[1:])
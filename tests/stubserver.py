@@ -0,0 +1,49 @@
+import threading
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+
+class StubServer:
+    # local http server standing in for EDDB
+    #
+    # routes maps a path to handler(headers), which returns (status, headers, body). The headers of every request are
+    # recorded in requests as (path, headers). A Content-Length returned by the handler is sent as it is, which allows
+    # to cut a response short.
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                headers = dict((key.lower(), value) for key, value in self.headers.items())
+                server.requests.append((self.path, headers))
+                if self.path not in server.routes:
+                    status, response_headers, body = 404, {}, b''
+                else:
+                    status, response_headers, body = server.routes[self.path](headers)
+                self.send_response(status)
+                for key, value in response_headers.items():
+                    self.send_header(key, value)
+                if status != 304 and 'Content-Length' not in response_headers:
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:' + str(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def fn_close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
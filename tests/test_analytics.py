@@ -0,0 +1,172 @@
+import os
+import sys
+import datetime
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+# the tick of the day before the analytics run
+CURRENTTIME = datetime.datetime(2017, 6, 20, 12, 0)
+
+
+def fn_snapshot(systems):
+    # history entry built like fn_get_system_history does, from {system: (updated, [(faction, influence, state)])}
+    names = ['T', 'A', 'B', 'C']
+    presences = [[{'minor_faction_id': names.index(faction), 'influence': influence, 'state': state}
+                  for faction, influence, state in factions] for updated, factions in systems.values()]
+    frame = pd.DataFrame({'minor_faction_presences': presences,
+                          'updated_at': [pd.Timestamp(updated) for updated, factions in systems.values()]},
+                         index=pd.Index(list(systems), name='name'))
+    return fs.FactionStats.fn_get_system_snapshots(None, frame, pd.DataFrame({'name': names}))
+
+
+def fn_history():
+    # daily snapshots of four systems over 12 days, updated before the tick
+    # Retreat: the target loses influence in retreat, Expansion: the target gains and expands into New,
+    # Leave: the target leaves and re-enters, Gap: the system is missing in one snapshot, influence missing in the
+    # dump (None) in a later one.
+    history = []
+    for day in range(12):
+        date = '2017-06-%02d 15:00:00' % (8 + day)
+        systems = {}
+        systems['Retreat'] = (date, [('T', 30.0 - 2.5 * day, 'Retreat' if day > 5 else 'None'),
+                                     ('A', 70.0 + 2.5 * day, 'Boom')])
+        systems['Expansion'] = (date, [('T', 50.0 + 1.5 * day + (3.0 if day == 7 else 0.0),
+                                        'Expansion' if day > 8 else 'Boom'),
+                                       ('B', 50.0 - 1.5 * day - (3.0 if day == 7 else 0.0), 'None')])
+        if day > 8:
+            systems['New'] = (date, [('T', 5.0 + day, 'None'), ('C', 95.0 - day, 'None')])
+        if day < 5 or day > 7:
+            systems['Leave'] = (date, [('T', 20.0 + day, 'None'), ('C', 80.0 - day, 'War')])
+        else:
+            systems['Leave'] = (date, [('C', 100.0, 'War')])
+        if day != 6:
+            systems['Gap'] = (date, [('T', None if day == 9 else 40.0 + (day % 3) * 4.0, 'None'),
+                                     ('A', 60.0 - (day % 3) * 4.0, 'None')])
+        history.append(fn_snapshot(systems))
+    return history, sorted(set(system for entry in history for system in entry))
+
+
+def fn_baseline_analytics(history, systemlist, target_name, currenttime):
+    # per-system loop of fn_update_google_sheet before the vectorized fn_influence_analytics, kept as reference
+    results = pd.DataFrame(columns=['System', 'Influence', 'Influence Change 1 Day', 'Influence Change 5 Days',
+                                    'Updated'])
+    single_ichange_ranges = [1, 3, 5, 7, 14, 28]
+    single_ichange_labels = ['1 Day', '3 Days', '5 Days', '7 Days', '14 Days', '28 Days']
+    results_single = pd.DataFrame(columns=single_ichange_labels)
+    results_single_pos = pd.DataFrame(columns=single_ichange_labels)
+    results_single_neg = pd.DataFrame(columns=single_ichange_labels)
+
+    for system in systemlist:
+        if system not in history[-1].keys():
+            continue
+        faction_row = history[-1][system].loc[(history[-1][system]['Faction'] == target_name)]
+        # the loop failed on a system the target had left, the analytics skip it
+        if faction_row.shape[0] != 1:
+            continue
+        historypos = 1
+        influencedelta1 = 0
+        influencedelta5 = 0
+        single_ichange_values = [0, 0, 0, 0, 0, 0]
+        single_ichange_values_pos = single_ichange_values[:]
+        single_ichange_values_neg = single_ichange_values[:]
+        previous_influence = faction_row['Influence'].iloc[0]
+        previous_timedelta = datetime.timedelta(hours=0)
+
+        while True:
+            historypos = historypos + 1
+            if len(history) < historypos:
+                break
+            if system in history[-1*historypos].keys():
+                faction_row_m = history[-1*historypos][system].loc[(history[-1*historypos][system]['Faction']
+                                                                    == target_name)]
+            else:
+                break
+            if faction_row_m.shape[0] != 1:
+                break
+
+            timedelta = fs.fn_tick_time(faction_row['Last Time Updated'].iloc[0]) - \
+                fs.fn_tick_time(faction_row_m['Last Time Updated'].iloc[0])
+            influence = faction_row_m['Influence'].iloc[0]
+            influencedelta = faction_row['Influence'].iloc[0] - influence
+            if previous_timedelta.total_seconds() < 24 * 60 * 60:
+                influencedelta1 = influencedelta
+                influencedelta5 = influencedelta
+            elif previous_timedelta.total_seconds() < 5 * 24 * 60 * 60:
+                influencedelta5 = influencedelta
+
+            for i, days in enumerate(single_ichange_ranges):
+                if (previous_timedelta).total_seconds() < days * 24 * 60 * 60:
+                    influencedelta_single = previous_influence - influence
+                    if abs(influencedelta_single) > abs(single_ichange_values[i]):
+                        single_ichange_values[i] = round(influencedelta_single, 1)
+                    if influencedelta_single > single_ichange_values_pos[i]:
+                        single_ichange_values_pos[i] = round(influencedelta_single, 1)
+                    if influencedelta_single < single_ichange_values_neg[i]:
+                        single_ichange_values_neg[i] = round(influencedelta_single, 1)
+
+            if (timedelta).total_seconds() > single_ichange_ranges[-1] * 24 * 60 * 60:
+                break
+
+            previous_influence = influence
+            previous_timedelta = timedelta
+
+        timedelta = currenttime - fs.fn_tick_time(faction_row['Last Time Updated'].iloc[0])
+        if timedelta.total_seconds() < 24 * 60 * 60:
+            tstring = 'current'
+        elif timedelta.total_seconds() < 2 * 24 * 60 * 60:
+            tstring = ' 1 tick ago'
+        else:
+            tstring = str(int(round(timedelta.total_seconds()/(24 * 60 * 60), 0))) + ' ticks ago'
+
+        results.loc[results.shape[0]] = [system, round(faction_row['Influence'].iloc[0], 1),
+                                         round(influencedelta1, 1), round(influencedelta5, 1), tstring]
+        results_single.loc[results_single.shape[0]] = single_ichange_values
+        results_single_pos.loc[results_single_pos.shape[0]] = single_ichange_values_pos
+        results_single_neg.loc[results_single_neg.shape[0]] = single_ichange_values_neg
+
+    return results, results_single, results_single_pos, results_single_neg
+
+
+class InfluenceAnalyticsTest(unittest.TestCase):
+    # the vectorized analytics give the results of the per-system loop they replaced
+
+    def setUp(self):
+        self.history, self.systemlist = fn_history()
+        self.results = fs.fn_influence_analytics(self.history, self.systemlist, 'T', currenttime=CURRENTTIME)
+
+    def test_results_of_the_baseline_loop(self):
+        results, results_single, results_single_pos, results_single_neg = self.results
+        self.assertEqual(results.to_dict('list'), {
+            'System': ['Expansion', 'Gap', 'Leave', 'New', 'Retreat'],
+            'Influence': [66.5, 48.0, 31.0, 16.0, 2.5],
+            'Influence Change 1 Day': [1.5, 4.0, 1.0, 1.0, -2.5],
+            'Influence Change 5 Days': [7.5, 4.0, 3.0, 2.0, -12.5],
+            'Updated': [' 1 tick ago'] * 5})
+        self.assertEqual(results_single.to_dict('list'), {
+            '1 Day': [1.5, 4.0, 1.0, 1.0, -2.5], '3 Days': [1.5, -48.0, 1.0, 1.0, -2.5],
+            '5 Days': [4.5, -48.0, 1.0, 1.0, -2.5], '7 Days': [4.5, -48.0, 1.0, 1.0, -2.5],
+            '14 Days': [4.5, -48.0, 1.0, 1.0, -2.5], '28 Days': [4.5, -48.0, 1.0, 1.0, -2.5]})
+        self.assertEqual(results_single_pos.to_dict('list'), {
+            '1 Day': [1.5, 4.0, 1.0, 1.0, 0.0], '3 Days': [1.5, 44.0, 1.0, 1.0, 0.0],
+            '5 Days': [4.5, 44.0, 1.0, 1.0, 0.0], '7 Days': [4.5, 44.0, 1.0, 1.0, 0.0],
+            '14 Days': [4.5, 44.0, 1.0, 1.0, 0.0], '28 Days': [4.5, 44.0, 1.0, 1.0, 0.0]})
+        self.assertEqual(results_single_neg.to_dict('list'), {
+            '1 Day': [0.0, 0.0, 0.0, 0.0, -2.5], '3 Days': [0.0, -48.0, 0.0, 0.0, -2.5],
+            '5 Days': [-1.5, -48.0, 0.0, 0.0, -2.5], '7 Days': [-1.5, -48.0, 0.0, 0.0, -2.5],
+            '14 Days': [-1.5, -48.0, 0.0, 0.0, -2.5], '28 Days': [-1.5, -48.0, 0.0, 0.0, -2.5]})
+
+    def test_equal_to_the_baseline_loop_for_every_history_length(self):
+        for length in range(1, len(self.history) + 1):
+            history = self.history[:length]
+            expected = fn_baseline_analytics(history, self.systemlist, 'T', CURRENTTIME)
+            for result, reference in zip(fs.fn_influence_analytics(history, self.systemlist, 'T', CURRENTTIME),
+                                         expected):
+                self.assertEqual(result.to_dict('list'), reference.to_dict('list'), length)
+
+
+if __name__ == '__main__':
+    unittest.main()
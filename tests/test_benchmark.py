@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_small_run_covers_all_stages(self):
+        results = benchmark.fnBenchmark(benchmark.fn_arguments(
+            ['--systems', '200', '--factions', '800', '--target-systems', '10', '--days', '5', '--repeat', '1']))
+        for label in ['dump_parse_stream', 'dump_cache_build', 'dump_parse_cache', 'load_factionstat',
+                      'pull_data_from_json', 'system_history', 'system_history_cached', 'plot_system_history',
+                      'influence_analytics', 'page_parse_tokenizer', 'page_parse_bs4']:
+            self.assertEqual(len(results[label]), 1)
+
+    def test_synthetic_faction_page_is_parsed_alike_by_both_backends(self):
+        html = benchmark.fn_synthetic_faction_page(benchmark.np.random.RandomState(1), 20, 5)
+        rows = benchmark.fs.fn_extract_faction_rows(html)
+        self.assertEqual(len(rows), 100)
+        self.assertEqual(rows, benchmark.fs.fn_extract_faction_rows(html, backend='bs4'))
+        self.assertEqual(rows[0].faction, 'Canonn')
+        self.assertTrue(rows[1].faction.startswith('Synthetic Faction & Partners'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+from test_store import fn_canonical, fn_evolving_entries
+
+MAX_AGE = 90*24*60*60+1
+
+
+class StoreCompactionTest(WorkdirTest):
+    # retention of the history store and recovery from interrupted writes
+
+    directories = ['statdata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        self.entries = fn_evolving_entries(120)
+        fs.fn_store_append('T', self.entries)
+        self.recent = [entry for entry in self.entries if time.time() - fs.fn_asctime_to_epoch(entry[0]) < MAX_AGE]
+
+    def fn_assert_entries_equal(self, loaded, entries):
+        self.assertEqual([entry[0] for entry in loaded], [entry[0] for entry in entries])
+        for entry, expected in zip(loaded, entries):
+            self.assertEqual(fn_canonical(entry[1], entry[2]), fn_canonical(expected[1], expected[2]), entry[0])
+
+    def test_compaction_drops_old_snapshots(self):
+        self.assertEqual(fs.fn_store_compact('T', MAX_AGE), len(self.entries) - len(self.recent))
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.recent)
+
+        # the oldest snapshot left is a keyframe, the data files of the old generation are gone
+        tables = fs.fn_store_load_tables('T')
+        self.assertNotIn(fs.fn_asctime_to_epoch(self.recent[0][0]), tables['deltas'])
+        self.assertTrue(tables['deltas'])
+        self.assertEqual(sorted(fs.fn_store_data_files('T')),
+                         sorted([fs.fn_store_paths('T', '', 1)[0], fs.fn_store_hash_path('T', '', 1)]))
+
+        self.assertEqual(fs.fn_store_compact('T', MAX_AGE), 0)
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.recent)
+
+    def test_compaction_keeps_the_last_snapshot(self):
+        self.assertEqual(fs.fn_store_compact('T', 24*60*60), len(self.entries) - 1)
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries[-1:])
+
+    def test_compaction_interrupted_before_the_manifest_keeps_the_previous_generation(self):
+        fn_atomic_write = fs.fn_atomic_write
+
+        def crash(path, data):
+            if path == fs.fn_store_paths('T')[1]:
+                raise IOError('crash before the manifest was replaced')
+            fn_atomic_write(path, data)
+
+        fs.fn_atomic_write = crash
+        try:
+            self.assertRaises(IOError, fs.fn_store_compact, 'T', MAX_AGE)
+        finally:
+            fs.fn_atomic_write = fn_atomic_write
+
+        self.assertEqual(fs.fn_store_load_tables('T')['generation'], 0)
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries)
+
+        # the files of the abandoned generation are replaced by the next write
+        fs.fn_store_compact('T', MAX_AGE)
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.recent)
+
+    def test_append_interrupted_before_the_manifest_is_not_visible(self):
+        fs.fn_store_write('T', self.entries[:-3])
+        fn_store_save_tables = fs.fn_store_save_tables
+
+        def crash(target_name, tables, modestr=''):
+            raise IOError('crash before the manifest was replaced')
+
+        fs.fn_store_save_tables = crash
+        try:
+            self.assertRaises(IOError, fs.fn_store_append, 'T', self.entries[-3:-1])
+        finally:
+            fs.fn_store_save_tables = fn_store_save_tables
+
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries[:-3])
+        fs.fn_store_append('T', self.entries[-3:])
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries)
+
+
+class LegacyUpdateCleanupTest(WorkdirTest):
+    # a run outside update mode removes the temporary update files of older versions of its target
+
+    directories = ['statdata']
+
+    def test_update_files_of_the_target_are_removed(self):
+        date = 'Sat Jun 10 19:14:01 2017'
+        removed = ['factionstat_T_update.csv', 'systems_T_' + date + '_update.json',
+                   'factions_T_' + date + '_update.json']
+        kept = ['systems_T_' + date + '.json', 'factions_T_' + date + '.json',
+                'factionstat_T Other_update.csv', 'systems_T Other_' + date + '_update.json']
+        for name in removed + kept:
+            with open(os.path.join('statdata', name), 'w') as handle:
+                handle.write('')
+
+        fs.FactionStats('T')
+        self.assertEqual(sorted(os.listdir('statdata')), sorted(kept))
+
+        # update mode leaves them alone
+        for name in removed:
+            with open(os.path.join('statdata', name), 'w') as handle:
+                handle.write('')
+        fs.FactionStats('T', mode='update')
+        self.assertEqual(sorted(os.listdir('statdata')), sorted(kept + removed))
+
+
+if __name__ == '__main__':
+    unittest.main()
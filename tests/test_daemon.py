@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+
+class DailyUpdateTest(unittest.TestCase):
+    # scheduling of the dump integration of the resident service, without network and stored data
+
+    def setUp(self):
+        self.saved = dict((name, getattr(fs, name)) for name in
+                          ['fn_update_from_eddb', 'fn_dump_signature', 'fn_extract_targets_from_json',
+                           'fn_fetch_pages'])
+        self.changed = True
+        self.extracted = []
+        fs.fn_update_from_eddb = lambda: self.changed
+        fs.fn_dump_signature = lambda systems_path, factions_path: [[1, 2], [3, 4]]
+        fs.fn_extract_targets_from_json = lambda targetlist: self.extracted.append(targetlist) or {}
+
+        self.daemon = fs.FactionStatsDaemon(targetlist=[], webpublishing=False, retry=60)
+        self.scheduled = []
+        self.daemon.fn_schedule_daily = lambda delay=None: self.scheduled.append(delay)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(fs, name, value)
+
+    def test_new_dump_is_integrated(self):
+        self.daemon.fn_daily_update()
+        self.assertEqual(len(self.extracted), 1)
+        self.assertEqual(self.scheduled, [None])
+
+    def test_unchanged_dump_is_retried_without_integration(self):
+        self.daemon.fn_daily_update()
+        self.changed = False
+        self.daemon.fn_daily_update()
+        self.assertEqual(len(self.extracted), 1)
+        self.assertEqual(self.scheduled, [None, 60])
+
+    def test_dump_downloaded_before_restart_is_integrated(self):
+        self.changed = False
+        self.daemon.fn_daily_update()
+        self.assertEqual(len(self.extracted), 1)
+        self.assertEqual(self.scheduled, [None])
+
+    def test_failed_download_is_retried(self):
+        def fail():
+            raise IOError('connection refused')
+        fs.fn_update_from_eddb = fail
+        self.daemon.fn_daily_update()
+        self.assertEqual(self.extracted, [])
+        self.assertEqual(self.scheduled, [60])
+
+    def test_failed_extraction_is_retried(self):
+        def fail(targetlist):
+            raise ValueError('truncated dump')
+        fs.fn_extract_targets_from_json = fail
+        self.daemon.fn_daily_update()
+        self.assertEqual(self.scheduled, [60])
+        self.daemon.fn_daily_update()
+        self.assertEqual(self.scheduled, [60, 60])
+
+
+class PointUpdateTest(unittest.TestCase):
+    # the point updates go on after a failure
+
+    def setUp(self):
+        self.fn_fetch_pages = fs.fn_fetch_pages
+        self.daemon = fs.FactionStatsDaemon(targetlist=[], webpublishing=False, interval=600)
+
+    def tearDown(self):
+        fs.fn_fetch_pages = self.fn_fetch_pages
+
+    def test_failed_fetch_schedules_the_next_point_update(self):
+        def fail(urls):
+            raise IOError('connection refused')
+        fs.fn_fetch_pages = fail
+        self.daemon.fn_point_update()
+        self.assertEqual([event.action for event in self.daemon.scheduler.queue], [self.daemon.fn_point_update])
+
+    def test_point_update_schedules_the_next_one(self):
+        fs.fn_fetch_pages = lambda urls: {}
+        self.daemon.fn_point_update()
+        self.assertEqual([event.action for event in self.daemon.scheduler.queue], [self.daemon.fn_point_update])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from stubserver import StubServer
+
+
+def fn_gzip(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as handle:
+        handle.write(data)
+    return buffer.getvalue()
+
+
+class DumpDownloadTest(unittest.TestCase):
+    # conditional download of the EDDB dumps against a local stand-in for the archive
+
+    def setUp(self):
+        self.jsondir = tempfile.mkdtemp()
+        self.metrics = fs.METRICS_PATH
+        fs.METRICS_PATH = None
+        fs.HTTP_SESSIONS.clear()
+
+        self.dumps = {'systems_populated.json': [{'id': 1, 'name': 'Sol'}],
+                      'factions.json': [{'id': 2, 'name': 'Canonn'}]}
+        self.etag = '"v1"'
+        self.truncate = False
+        self.server = StubServer(dict(('/' + name, self.fn_dump(name)) for name in self.dumps))
+        self.archive = self.server.url + '/'
+
+    def tearDown(self):
+        self.server.fn_close()
+        fs.METRICS_PATH = self.metrics
+        fs.HTTP_SESSIONS.clear()
+        shutil.rmtree(self.jsondir)
+
+    def fn_dump(self, name):
+        def handler(headers):
+            if headers.get('if-none-match') == self.etag:
+                return 304, {'ETag': self.etag}, b''
+            body = fn_gzip(json.dumps(self.dumps[name]).encode('utf-8'))
+            response_headers = {'ETag': self.etag, 'Content-Encoding': 'gzip', 'Content-Type': 'application/json'}
+            if self.truncate:
+                response_headers['Content-Length'] = str(len(body))
+                body = body[:len(body) // 2]
+            return 200, response_headers, body
+        return handler
+
+    def fn_read(self, name):
+        with open(os.path.join(self.jsondir, name), 'rb') as handle:
+            return json.loads(handle.read().decode('utf-8'))
+
+    def test_gzip_dump_is_saved_decoded(self):
+        self.assertTrue(fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir))
+        self.assertIn('gzip', self.server.requests[0][1].get('accept-encoding'))
+        for name, records in self.dumps.items():
+            self.assertEqual(self.fn_read(name), records)
+
+    def test_unchanged_dump_is_not_downloaded_again(self):
+        fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir)
+        mtimes = dict((name, os.path.getmtime(os.path.join(self.jsondir, name))) for name in self.dumps)
+
+        fs.HTTP_SESSIONS.clear()
+        self.assertFalse(fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir))
+        for path, headers in self.server.requests[-2:]:
+            self.assertEqual(headers.get('if-none-match'), '"v1"')
+        for name, records in self.dumps.items():
+            self.assertEqual(os.path.getmtime(os.path.join(self.jsondir, name)), mtimes[name])
+            self.assertEqual(self.fn_read(name), records)
+
+    def test_changed_dump_is_downloaded(self):
+        fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir)
+        self.etag = '"v2"'
+        self.dumps['factions.json'] = [{'id': 2, 'name': 'Canonn'}, {'id': 3, 'name': 'Sirius Corporation'}]
+
+        self.assertTrue(fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir))
+        self.assertEqual(self.fn_read('factions.json'), self.dumps['factions.json'])
+        self.assertEqual(fs.fn_load_dump_validators(self.jsondir)[self.archive + 'factions.json'],
+                         {'If-None-Match': '"v2"'})
+
+    def test_interrupted_download_keeps_the_existing_dump(self):
+        fs.fn_update_from_eddb(archive=self.archive, jsondir=self.jsondir)
+        previous = dict((name, self.fn_read(name)) for name in self.dumps)
+        self.etag = '"v2"'
+        self.truncate = True
+
+        self.assertRaises(Exception, fs.fn_update_from_eddb, archive=self.archive, jsondir=self.jsondir)
+        for name in self.dumps:
+            self.assertEqual(self.fn_read(name), previous[name])
+            self.assertFalse(os.path.exists(os.path.join(self.jsondir, name + '.part')))
+        # the validators still describe the dumps on disk, so the next run downloads them again
+        for validators in fs.fn_load_dump_validators(self.jsondir).values():
+            self.assertEqual(validators, {'If-None-Match': '"v1"'})
+
+
+if __name__ == '__main__':
+    unittest.main()
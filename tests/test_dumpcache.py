@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import benchmark
+import factionstats as fs
+from workdir import WorkdirTest
+
+TARGETS = ['Canonn', 'Canonn Deep Space Research']
+
+
+def fn_presences(systems):
+    # the cache only keeps the presence fields used for evaluation
+    return [[dict((key, faction[key]) for key in ['minor_faction_id', 'influence', 'state'])
+             for faction in factions_present] for factions_present in systems['minor_faction_presences']]
+
+
+class DumpCacheTest(WorkdirTest):
+    # extraction of the targets from the memory-mapped dump cache
+
+    directories = ['jsondata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        rng = np.random.RandomState(3)
+        self.galaxy = benchmark.fn_synthetic_galaxy(rng, 60, 150, 4, TARGETS, 10)
+        # a system with presence of a target, whose first influence gets changed
+        self.system = min(system for system, entry in enumerate(self.galaxy) if 1 in entry['factions'])
+        self.galaxy[self.system]['influence'][0] = 12.5
+        self.fn_write_dumps()
+
+    def fn_write_dumps(self):
+        benchmark.fn_write_json_array('./jsondata/systems_populated.json',
+                                      [benchmark.fn_system_record(self.galaxy, system) for system in range(60)])
+        benchmark.fn_write_json_array('./jsondata/factions.json', benchmark.fn_faction_records(150, TARGETS, 0))
+
+    def fn_assert_extracted_equal(self, extracted, expected):
+        self.assertEqual(sorted(extracted), sorted(expected))
+        for target_name in expected:
+            systems, factions = extracted[target_name]
+            systems_expected, factions_expected = expected[target_name]
+            self.assertEqual(systems.index.tolist(), systems_expected.index.tolist())
+            self.assertEqual(fn_presences(systems), fn_presences(systems_expected))
+            self.assertEqual(systems['updated_at'].tolist(), systems_expected['updated_at'].tolist())
+            self.assertEqual(factions['name'].to_dict(), factions_expected['name'].to_dict())
+
+    def test_cached_extraction_equals_uncached_extraction(self):
+        uncached = fs.fn_extract_targets_from_json(TARGETS, cache=False)
+        self.fn_assert_extracted_equal(fs.fn_extract_targets_from_json(TARGETS), uncached)
+        self.assertTrue(os.path.isfile('./jsondata/dumpcache/meta.json'))
+        self.fn_assert_extracted_equal(fs.fn_extract_targets_from_json(TARGETS), uncached)
+
+    def test_dump_rewritten_within_the_same_second_invalidates_the_cache(self):
+        path = './jsondata/systems_populated.json'
+        second = int(os.path.getmtime(path)) * 10**9
+        os.utime(path, ns=(second + 100, second + 100))
+        fs.fn_extract_targets_from_json(TARGETS)
+
+        # same size, same inode and same modification second, but a different influence
+        size = os.path.getsize(path)
+        self.galaxy[self.system]['influence'][0] = 13.5
+        self.fn_write_dumps()
+        os.utime(path, ns=(second + 900, second + 900))
+        self.assertEqual(os.path.getsize(path), size)
+
+        extracted = fs.fn_extract_targets_from_json(TARGETS)
+        self.fn_assert_extracted_equal(extracted, fs.fn_extract_targets_from_json(TARGETS, cache=False))
+        influences = [faction['influence'] for systems, factions in extracted.values()
+                      for factions_present in systems['minor_faction_presences'] for faction in factions_present]
+        self.assertIn(13.5, influences)
+        self.assertNotIn(12.5, influences)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import benchmark
+import factionstats as fs
+from workdir import WorkdirTest
+
+TARGETS = ['Canonn', 'Canonn Deep Space Research', 'Synthetic Target 2']
+
+
+class MultiTargetExtractionTest(WorkdirTest):
+    # a single pass over the dumps for all targets gives the same frames as one pass per target
+
+    directories = ['jsondata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        galaxy = benchmark.fn_synthetic_galaxy(np.random.RandomState(5), 80, 40, 4, TARGETS, 15)
+
+        # a system shared by all targets, with a faction which is present in systems of every target
+        shared = galaxy[0]
+        for id in [1, 2, 3, 40]:
+            if id not in shared['factions']:
+                shared['factions'].append(id)
+                shared['states'].append('None')
+        shared['influence'] = benchmark.fn_normalize(np.ones(len(shared['factions'])))
+
+        benchmark.fn_write_json_array('./jsondata/systems_populated.json',
+                                      [benchmark.fn_system_record(galaxy, system) for system in range(80)])
+        # the last target is missing in the factions dump
+        benchmark.fn_write_json_array('./jsondata/factions.json', benchmark.fn_faction_records(40, TARGETS[:2], 0))
+
+    def fn_extract(self, targetlist, backend):
+        if backend == 'frames':
+            return fs.fn_extract_targets_from_frames(targetlist, pd.read_json('./jsondata/systems_populated.json'),
+                                                     pd.read_json('./jsondata/factions.json'))
+        return fs.fn_extract_targets_from_json(targetlist, cache=backend == 'cache')
+
+    def test_single_pass_equals_one_pass_per_target(self):
+        for backend in ['frames', 'stream', 'cache']:
+            extracted = self.fn_extract(TARGETS, backend)
+            self.assertEqual(sorted(extracted), TARGETS[:2])
+            for target_name in TARGETS:
+                single = self.fn_extract([target_name], backend)
+                if target_name not in extracted:
+                    self.assertEqual(single, {})
+                    continue
+                systems, factions = extracted[target_name]
+                systems_single, factions_single = single[target_name]
+                self.assertTrue(systems.equals(systems_single), (backend, target_name))
+                self.assertTrue(factions.equals(factions_single), (backend, target_name))
+                self.assertIn('Synthetic System 0', systems.index)
+                self.assertIn(40, factions.index)
+
+    def test_target_faction_comes_first(self):
+        for backend in ['frames', 'stream', 'cache']:
+            extracted = self.fn_extract(TARGETS, backend)
+            for target_name, (systems, factions) in extracted.items():
+                self.assertEqual(factions['name'].iloc[0], target_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from stubserver import StubServer
+
+
+def fn_new_process():
+    # forgets everything a run keeps in memory about fetched pages
+    fs.PAGE_VALIDATORS.clear()
+    fs.PAGE_VALIDATORS_PENDING.clear()
+    del fs.PAGE_VALIDATORS_LOADED[:]
+    fs.HTTP_SESSIONS.clear()
+
+
+class ConditionalFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.saved = (fs.PAGE_VALIDATORS_PATH, fs.METRICS_PATH)
+        fs.PAGE_VALIDATORS_PATH = os.path.join(self.workdir, 'page_validators.json')
+        fs.METRICS_PATH = None
+        fn_new_process()
+
+        self.etag = '"v1"'
+        self.server = StubServer({'/faction/1': self.fn_page})
+        self.url = self.server.url + '/faction/1'
+
+    def tearDown(self):
+        self.server.fn_close()
+        fs.PAGE_VALIDATORS_PATH, fs.METRICS_PATH = self.saved
+        fn_new_process()
+        shutil.rmtree(self.workdir)
+
+    def fn_page(self, headers):
+        if headers.get('if-none-match') == self.etag:
+            return 304, {'ETag': self.etag}, b''
+        return 200, {'ETag': self.etag, 'Content-Type': 'text/html'}, ('page ' + self.etag).encode('utf-8')
+
+    def test_confirmed_page_is_not_downloaded_again_by_a_new_process(self):
+        self.assertEqual(fs.fn_fetch_pages([self.url]), {self.url: 'page "v1"'})
+        self.assertNotIn('if-none-match', self.server.requests[-1][1])
+        fs.fn_confirm_page(self.url)
+
+        fn_new_process()
+        self.assertEqual(fs.fn_fetch_pages([self.url]), {self.url: None})
+        self.assertEqual(self.server.requests[-1][1].get('if-none-match'), '"v1"')
+
+    def test_unconfirmed_page_is_downloaded_again(self):
+        fs.fn_fetch_pages([self.url])
+
+        fn_new_process()
+        self.assertEqual(fs.fn_fetch_pages([self.url]), {self.url: 'page "v1"'})
+        self.assertNotIn('if-none-match', self.server.requests[-1][1])
+
+    def test_changed_page_is_downloaded(self):
+        fs.fn_fetch_pages([self.url])
+        fs.fn_confirm_page(self.url)
+        self.etag = '"v2"'
+
+        fn_new_process()
+        self.assertEqual(fs.fn_fetch_pages([self.url]), {self.url: 'page "v2"'})
+        self.assertEqual(self.server.requests[-1][1].get('if-none-match'), '"v1"')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+ROW = """<tr class="systemFactionRow"><td>%.1f%%</td><td><a href="/faction/%d">%s</a></td><td>Independent</td>
+<td>Cooperative</td><td>%s</td><td>%s</td><td></td></tr>
+"""
+
+
+def fn_page(systems):
+    # faction page of {system: [(faction id, name, influence, state)]}, all systems updated days ago
+    html = ['<html><body><table>\n']
+    for system, factions in sorted(systems.items()):
+        html.append('<tr class="systemRow"><td>%s</td><td>Update: 3 days</td></tr>\n' % system)
+        for id, name, influence, state in factions:
+            html.append(ROW % (influence, id, name, state, system))
+    html.append('</table></body></html>\n')
+    return ''.join(html)
+
+
+class HistoryCacheTest(WorkdirTest):
+    # snapshots are cached between history builds, point updates only invalidate the systems they changed
+
+    directories = ['statdata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        fs.PAGE_VALIDATORS_PENDING.clear()
+        factions = pd.DataFrame({'name': ['T', 'Other']}, index=pd.Index([1, 2], name='id'))
+        self.factionstats = fs.FactionStats('T')
+        self.factionstats.factionstat = [self.fn_entry(days, factions) for days in [120, 2, 1]]
+        self.url = self.factionstats.fn_faction_url('T')
+
+        # the systems of which snapshots are built
+        self.built = []
+        fn_get_system_snapshots = self.factionstats.fn_get_system_snapshots
+
+        def record(systems, factions):
+            self.built.append(sorted(systems.index))
+            return fn_get_system_snapshots(systems, factions)
+
+        self.factionstats.fn_get_system_snapshots = record
+
+    def fn_entry(self, days, factions):
+        systems = pd.DataFrame({'minor_faction_presences': [[{'minor_faction_id': 1, 'influence': 60.0,
+                                                               'state': 'Boom'},
+                                                              {'minor_faction_id': 2, 'influence': 40.0,
+                                                               'state': 'None'}] for i in range(3)],
+                                'updated_at': [pd.Timestamp('2017-06-02 07:57:52')] * 3},
+                               index=pd.Index(['A', 'B', 'C'], name='name'))
+        return [time.asctime(time.localtime(time.time() - days * 24*60*60)), systems, factions.copy(), False]
+
+    def test_unchanged_entries_are_not_rebuilt(self):
+        history, systemlist = self.factionstats.fn_get_system_history()
+        self.assertEqual(len(history), 2)
+        self.assertEqual(self.built, [['A', 'B', 'C']] * 2)
+        self.factionstats.fn_get_system_history()
+        self.assertEqual(len(self.built), 2)
+
+    def test_point_update_invalidates_the_changed_systems_only(self):
+        self.factionstats.fn_begin_update()
+        history, systemlist = self.factionstats.fn_get_system_history()
+        del self.built[:]
+        date = self.factionstats.factionstat[-1][0]
+        cached = fs.HISTORY_CACHE['T'][date]['snapshot']
+        unchanged = cached['C']
+
+        page = fn_page({'A': [(1, 'T', 61.5, 'Boom'), (2, 'Other', 38.5, 'None')],
+                        'B': [(1, 'T', 60.0, 'War'), (2, 'Other', 40.0, 'None')],
+                        'C': [(1, 'T', 60.0, 'Boom'), (2, 'Other', 40.0, 'None')]})
+        self.assertEqual(self.factionstats.fn_update('T', pages={self.url: page}), ['A', 'B'])
+        self.assertEqual(fs.HISTORY_CACHE['T'][date]['stale'], set(['A', 'B']))
+
+        history, systemlist = self.factionstats.fn_get_system_history()
+        self.assertEqual(self.built, [['A', 'B']])
+        self.assertEqual(history[-1]['A']['Influence'].tolist(), [61.5, 38.5])
+        self.assertEqual(history[-1]['B']['Faction State'].tolist(), ['War', 'None'])
+        self.assertTrue(history[-1]['C'] is unchanged)
+        # the dump entry the update started from keeps its snapshot
+        self.assertEqual(history[-2]['A']['Influence'].tolist(), [60.0, 40.0])
+
+    def test_entries_leaving_the_retention_window_are_evicted(self):
+        cache_dates = [entry[0] for entry in self.factionstats.factionstat]
+        self.factionstats.fn_get_system_history()
+        self.assertEqual(sorted(fs.HISTORY_CACHE['T']), sorted(cache_dates[1:]))
+
+        # an entry dropped by the retention is evicted from the cache with the next build
+        self.factionstats.factionstat = self.factionstats.factionstat[2:]
+        self.factionstats.fn_get_system_history()
+        self.assertEqual(list(fs.HISTORY_CACHE['T']), cache_dates[2:])
+
+    def test_discarded_updates_are_dropped_from_the_cache(self):
+        self.factionstats.fn_begin_update()
+        date = self.factionstats.factionstat[-1][0]
+        self.factionstats.fn_get_system_history()
+        self.assertIn(date, fs.HISTORY_CACHE['T'])
+        self.factionstats.fn_discard_updates()
+        self.assertNotIn(date, fs.HISTORY_CACHE['T'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import factionstats as fs
+
+DRIVERS = ['fnDailyUpdate', 'fnPointUpdate', 'fnInfLoop', 'fnAnalyticsUpdate', 'fnPlotUpdate']
+
+
+class CommandLineTest(unittest.TestCase):
+    # each subcommand and the flags of older versions run the matching drivers
+
+    def setUp(self):
+        self.saved = dict((name, getattr(fs, name)) for name in DRIVERS + ['fn_drain_publish_queue'])
+        self.calls = []
+        for name in DRIVERS:
+            setattr(fs, name, self.fn_recorder(name))
+        fs.fn_drain_publish_queue = lambda: None
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(fs, name, value)
+
+    def fn_recorder(self, name):
+        def recorder(targetlist, **kwargs):
+            self.calls.append((name, targetlist, kwargs))
+        return recorder
+
+    def fn_run(self, arguments):
+        del self.calls[:]
+        fs.fnMain(arguments)
+        return self.calls
+
+    def test_subcommands(self):
+        targets = ['Canonn', 'Sirius Corporation']
+        for arguments, drivers in [
+                (['daily'], ['fnDailyUpdate']),
+                (['daily', '--then-update'], ['fnDailyUpdate', 'fnPointUpdate']),
+                (['update'], ['fnPointUpdate']),
+                (['infloop'], ['fnInfLoop']),
+                (['plots-only'], ['fnPlotUpdate'])]:
+            for publish in [True, False]:
+                options = ['--targets'] + targets + ['--workers', '3'] + ([] if publish else ['--no-publish'])
+                expected = [(name, targets, {'webpublishing': publish, 'workers': 3}) for name in drivers]
+                self.assertEqual(self.fn_run(arguments + options), expected, arguments + options)
+
+    def test_analytics_upload(self):
+        for arguments, upload in [(['analytics-only'], True), (['analytics-only', '--print'], False)]:
+            self.assertEqual(self.fn_run(arguments),
+                             [('fnAnalyticsUpdate', fs.TARGETLIST, {'upload': upload, 'workers': fs.TARGET_WORKERS})])
+
+    def test_old_flags(self):
+        defaults = {'webpublishing': True, 'workers': fs.TARGET_WORKERS}
+        self.assertEqual(self.fn_run([]), [('fnDailyUpdate', fs.TARGETLIST, defaults),
+                                           ('fnPointUpdate', fs.TARGETLIST, defaults)])
+        self.assertEqual(self.fn_run(['-update']), [('fnPointUpdate', fs.TARGETLIST, defaults)])
+        self.assertEqual(self.fn_run(['-infloop']), [('fnInfLoop', fs.TARGETLIST, defaults)])
+        self.assertEqual(self.fn_run(['-update', '--no-publish']),
+                         [('fnPointUpdate', fs.TARGETLIST, {'webpublishing': False, 'workers': fs.TARGET_WORKERS})])
+
+
+class ImportTest(unittest.TestCase):
+    # the web and google modules are only loaded by the runs using them
+
+    def test_import_loads_no_web_modules(self):
+        script = ('import sys, json, factionstats; '
+                  'print(json.dumps(sorted(name for name in sys.modules '
+                  'if name.split(".")[0] in ["plotly", "requests", "gspread", "oauth2client"])))')
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT)
+        self.assertEqual(json.loads(output.decode('utf-8').strip().splitlines()[-1]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
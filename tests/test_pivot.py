@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+D1, D2, D3, D4 = [pd.Timestamp('2017-06-%02d 15:00:00' % day) for day in [1, 2, 3, 4]]
+
+
+def fn_system(date, factions):
+    # snapshot frame of a system as built by fn_get_system_snapshots from [(faction, influence, state)]
+    return pd.DataFrame([(faction, influence, state, date) for faction, influence, state in factions],
+                        columns=['Faction', 'Influence', 'Faction State', 'Last Time Updated'])
+
+
+def fn_history():
+    # S is updated on D1 (seen twice), D2 and D3, A leaves it on D3. M is missing in the second and fourth snapshot
+    # and not updated after D4, C enters it on D4.
+    return [{'S': fn_system(D1, [('T', 60.0, 'Boom'), ('A', 40.0, 'None')]),
+             'M': fn_system(D1, [('T', 100.0, 'None')])},
+            {'S': fn_system(D1, [('T', 60.0, 'Boom'), ('A', 40.0, 'None')])},
+            {'S': fn_system(D2, [('T', 55.0, 'Boom'), ('A', 35.0, 'War'), ('B', 10.0, 'None')]),
+             'M': fn_system(D2, [('T', 100.0, 'None')])},
+            {'S': fn_system(D3, [('T', 70.0, 'None'), ('B', 30.0, 'Election')])},
+            {'M': fn_system(D4, [('T', 90.0, 'Expansion'), ('C', 10.0, 'None')])},
+            {'M': fn_system(D4, [('T', 90.0, 'Expansion'), ('C', 10.0, 'None')])}]
+
+
+def fn_table(dates, columns):
+    table = pd.DataFrame(columns)
+    table.insert(0, 'Date', dates)
+    return table
+
+
+class PivotHistoryTest(unittest.TestCase):
+    # influence and marker tables of all systems from one pivot, compared with hand-built tables
+
+    def setUp(self):
+        self.pivots = fs.fn_pivot_history(fn_history())
+
+    def test_systems(self):
+        self.assertEqual(sorted(self.pivots), ['M', 'S'])
+
+    def test_duplicate_dates_are_dropped_and_leaving_factions_get_zero(self):
+        data, markers = self.pivots['S']
+        pd.testing.assert_frame_equal(data, fn_table([D1, D2, D3], {'A': [40.0, 35.0, 0.0], 'B': [0.0, 10.0, 30.0],
+                                                                    'T': [60.0, 55.0, 70.0]}))
+        pd.testing.assert_frame_equal(markers, fn_table([D1, D2, D3], {'A': ['', 'War', ''], 'B': ['', '', 'Election'],
+                                                                       'T': ['Boom', 'Boom', '']}))
+
+    def test_system_missing_in_some_snapshots(self):
+        data, markers = self.pivots['M']
+        pd.testing.assert_frame_equal(data, fn_table([D1, D2, D4], {'C': [0.0, 0.0, 10.0], 'T': [100.0, 100.0, 90.0]}))
+        pd.testing.assert_frame_equal(markers, fn_table([D1, D2, D4], {'C': ['', '', ''], 'T': ['', '', 'Expansion']}))
+
+    def test_empty_history(self):
+        self.assertEqual(fs.fn_pivot_history([]), {})
+        self.assertEqual(fs.fn_pivot_history([{}, {}]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
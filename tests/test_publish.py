@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+
+class FakePublisher:
+    # stands in for plotly, fails the first failures[filename] uploads of a figure
+
+    def __init__(self, failures=None, gate=None):
+        self.failures = dict(failures or {})
+        self.gate = gate
+        self.calls = []
+
+    def __call__(self, figure, filename):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append((filename, figure))
+        if self.failures.get(filename, 0) > 0:
+            self.failures[filename] -= 1
+            raise IOError('upload failed')
+        return 'https://plot.ly/' + filename
+
+
+class PublishQueueTest(WorkdirTest):
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        self.backlog = os.path.join(self.workdir, 'plots', 'publish_backlog.json')
+
+    def test_failed_upload_is_retried(self):
+        publisher = FakePublisher(failures={'T/a': 2})
+        queue = fs.PublishQueue(publisher=publisher, backlog=self.backlog, base_delay=0.01)
+        queue.fn_enqueue('T', [('a', {'v': 1}, 'f1')])
+        self.assertEqual(queue.fn_drain(10), 0)
+
+        self.assertEqual([filename for filename, figure in publisher.calls], ['T/a'] * 3)
+        self.assertEqual(fs.fn_load_plot_manifest('T')['a'], {'published': 'f1', 'url': 'https://plot.ly/T/a'})
+        with open(self.backlog) as handle:
+            self.assertEqual(json.load(handle), [])
+
+    def test_upload_is_given_up_after_max_attempts(self):
+        publisher = FakePublisher(failures={'T/a': 10})
+        queue = fs.PublishQueue(publisher=publisher, backlog=self.backlog, base_delay=0.01, max_attempts=3)
+        queue.fn_enqueue('T', [('a', {'v': 1}, 'f1')])
+        self.assertEqual(queue.fn_drain(10), 0)
+        self.assertEqual(len(publisher.calls), 3)
+        self.assertNotIn('a', fs.fn_load_plot_manifest('T'))
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        queue = fs.PublishQueue(publisher=FakePublisher(), workers=0, backlog=self.backlog, base_delay=30,
+                                max_delay=3600)
+        for attempts, delay in [(1, 30), (2, 60), (3, 120), (10, 3600)]:
+            for i in range(20):
+                self.assertTrue(0.5 * delay <= queue.fn_backoff(attempts) <= delay)
+
+    def test_newer_version_replaces_pending_figure(self):
+        gate = threading.Event()
+        publisher = FakePublisher(gate=gate)
+        queue = fs.PublishQueue(publisher=publisher, workers=1, backlog=self.backlog)
+        queue.fn_enqueue('T', [('block', {'v': 0}, 'f0')])
+        time.sleep(0.1)
+        queue.fn_enqueue('T', [('a', {'v': 1}, 'f1')])
+        queue.fn_enqueue('T', [('a', {'v': 2}, 'f2')])
+        gate.set()
+        self.assertEqual(queue.fn_drain(10), 0)
+
+        self.assertEqual(publisher.calls, [('T/block', {'v': 0}), ('T/a', {'v': 2})])
+        self.assertEqual(fs.fn_load_plot_manifest('T')['a']['published'], 'f2')
+
+    def test_backlog_is_replayed_after_restart(self):
+        queue = fs.PublishQueue(publisher=FakePublisher(), workers=0, backlog=self.backlog)
+        queue.fn_enqueue('T', [('a', {'v': 1}, 'f1'), ('b', {'v': 2}, 'f2')])
+        self.assertEqual(queue.fn_drain(0), 2)
+
+        publisher = FakePublisher()
+        queue = fs.PublishQueue(publisher=publisher, backlog=self.backlog)
+        self.assertEqual(queue.fn_drain(10), 0)
+        self.assertEqual(sorted(filename for filename, figure in publisher.calls), ['T/a', 'T/b'])
+        self.assertEqual(sorted(fs.fn_load_plot_manifest('T')), ['a', 'b'])
+
+    def test_backlog_keeps_figures_of_overlapping_runs(self):
+        first = fs.PublishQueue(publisher=FakePublisher(), workers=0, backlog=self.backlog)
+        second = fs.PublishQueue(publisher=FakePublisher(), workers=0, backlog=self.backlog)
+        first.fn_enqueue('T', [('a', {'v': 1}, 'f1')])
+        second.fn_enqueue('T', [('b', {'v': 2}, 'f2')])
+        first.fn_enqueue('T', [('c', {'v': 3}, 'f3')])
+        with open(self.backlog) as handle:
+            self.assertEqual(sorted(item['name'] for item in json.load(handle)), ['a', 'b', 'c'])
+
+        # figures published by one run are removed, the pending ones of the other run stay
+        publisher = FakePublisher()
+        third = fs.PublishQueue(publisher=publisher, backlog=self.backlog)
+        self.assertEqual(third.fn_drain(10), 0)
+        second.fn_enqueue('T', [('d', {'v': 4}, 'f4')])
+        with open(self.backlog) as handle:
+            self.assertEqual(sorted(item['name'] for item in json.load(handle)), ['b', 'd'])
+
+
+class DrainTest(unittest.TestCase):
+    # only the runs which plot wait for the publish queue
+
+    def setUp(self):
+        self.saved = dict((name, getattr(fs, name)) for name in
+                          ['fnDailyUpdate', 'fnPointUpdate', 'fnAnalyticsUpdate', 'fnPlotUpdate', 'fnInfLoop',
+                           'fn_drain_publish_queue'])
+        for name in self.saved:
+            setattr(fs, name, lambda *args, **kwargs: None)
+        self.drained = []
+        fs.fn_drain_publish_queue = lambda: self.drained.append(True)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(fs, name, value)
+
+    def test_drain_after_runs_which_plot(self):
+        for arguments, drained in [(['daily'], True), (['update'], True), (['plots-only'], True),
+                                   (['analytics-only'], False), (['infloop'], False),
+                                   (['update', '--no-publish'], False)]:
+            del self.drained[:]
+            fs.fnMain(arguments)
+            self.assertEqual(bool(self.drained), drained, arguments)
+
+
+if __name__ == '__main__':
+    unittest.main()
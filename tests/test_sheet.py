@@ -0,0 +1,104 @@
+import os
+import sys
+import types
+import unittest
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+# the cells are built with gspread.Cell, a minimal stand-in is used where gspread is not installed
+try:
+    import gspread
+except ImportError:
+    gspread = types.ModuleType('gspread')
+    gspread.Cell = collections.namedtuple('Cell', ['row', 'col', 'value'])
+    sys.modules['gspread'] = gspread
+
+
+class FakeWorksheet:
+    # records the cells of every update_cells request, fails the next request when fail is set
+
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+
+    def update_cells(self, cells):
+        if self.fail:
+            self.fail = False
+            raise IOError('request failed')
+        self.requests.append(dict(((cell.row, cell.col), cell.value) for cell in cells))
+
+
+class FakeAuth:
+    access_token_expired = False
+
+
+class FakeClient:
+    # authorized client whose spreadsheet holds only the given worksheet
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.auth = FakeAuth()
+
+    def open(self, sheet):
+        return self
+
+    def worksheet(self, name):
+        return self.ws
+
+
+class SheetSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = FakeWorksheet()
+        fs.SHEET_CLIENTS['fake.json'] = FakeClient(self.ws)
+        fs.SHEET_WORKSHEETS.clear()
+        fs.SHEET_CELLS.clear()
+        self.grid = {(1, 1): 'System', (1, 2): 'Influence', (2, 1): 'A', (2, 2): 40.0, (3, 1): 'B', (3, 2): 60.0}
+
+    def tearDown(self):
+        fs.SHEET_CLIENTS.pop('fake.json', None)
+        fs.SHEET_WORKSHEETS.clear()
+        fs.SHEET_CELLS.clear()
+
+    def fn_sync(self, grid):
+        return fs.fn_sheet_sync('Sheet', 'Influence T', grid, keyfile='fake.json')
+
+    def test_first_sync_writes_all_cells(self):
+        self.assertEqual(self.fn_sync(self.grid), len(self.grid))
+        self.assertEqual(self.ws.requests, [self.grid])
+
+    def test_unchanged_sheet_gets_no_writes(self):
+        self.fn_sync(self.grid)
+        self.assertEqual(self.fn_sync(dict(self.grid)), 0)
+        self.assertEqual(len(self.ws.requests), 1)
+
+    def test_only_changed_cells_are_written(self):
+        self.fn_sync(self.grid)
+        grid = dict(self.grid)
+        grid[(2, 2)] = 41.5
+        self.assertEqual(self.fn_sync(grid), 1)
+        self.assertEqual(self.ws.requests[-1], {(2, 2): 41.5})
+
+    def test_removed_cells_are_cleared(self):
+        self.fn_sync(self.grid)
+        grid = dict(self.grid)
+        del grid[(3, 1)]
+        del grid[(3, 2)]
+        self.assertEqual(self.fn_sync(grid), 2)
+        self.assertEqual(self.ws.requests[-1], {(3, 1): '', (3, 2): ''})
+        self.assertEqual(self.fn_sync(grid), 0)
+
+    def test_failed_request_is_followed_by_full_write(self):
+        self.fn_sync(self.grid)
+        grid = dict(self.grid)
+        grid[(2, 2)] = 41.5
+        self.ws.fail = True
+        self.assertRaises(IOError, self.fn_sync, grid)
+        self.assertEqual(self.fn_sync(grid), len(grid))
+        self.assertEqual(self.ws.requests[-1], grid)
+
+
+if __name__ == '__main__':
+    unittest.main()
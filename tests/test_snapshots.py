@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+
+class SystemSnapshotTest(WorkdirTest):
+
+    directories = ['statdata', 'plotdata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        self.factionstats = fs.FactionStats('T')
+
+    def fn_snapshot(self, influence):
+        presences = [{'minor_faction_id': 1, 'influence': 60.0, 'state': 'Boom'},
+                     {'minor_faction_id': 2, 'influence': influence, 'state': 'None'}]
+        systems = pd.DataFrame({'minor_faction_presences': [presences],
+                                'updated_at': [pd.Timestamp('2017-06-02 07:57:52')]},
+                               index=pd.Index(['Eol Prou PX-T d3-1609'], name='name'))
+        factions = pd.DataFrame({'name': ['T', 'Other']}, index=pd.Index([1, 2], name='id'))
+        return self.factionstats.fn_get_system_snapshots(systems, factions)
+
+    def test_missing_influence_is_zero(self):
+        for influence in [None, float('nan')]:
+            snapshot = self.fn_snapshot(influence)['Eol Prou PX-T d3-1609']
+            self.assertEqual(snapshot['Influence'].tolist(), [60.0, 0.0])
+
+    def test_figures_of_missing_influence_are_valid_json(self):
+        history = [self.fn_snapshot(None)]
+        pivots = fs.fn_pivot_history(history)
+        system = 'Eol Prou PX-T d3-1609'
+        snapshotfig, historyfig, overview_traces, intervals = fs.fn_build_system_plots(
+            (system, pivots[system][0], pivots[system][1], history[0][system], 'T'))
+        for figure in [snapshotfig, historyfig]:
+            json.dumps(figure, allow_nan=False, default=str)
+
+
+if __name__ == '__main__':
+    unittest.main()
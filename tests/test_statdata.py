@@ -0,0 +1,42 @@
+import os
+import sys
+import shutil
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+STATDATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'statdata')
+
+
+class StatdataMigrationTest(WorkdirTest):
+    # the stat files of older versions shipped in statdata/ are loaded and migrated into the history store
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        shutil.copytree(STATDATA, 'statdata')
+
+    def test_load_statdata_reads_the_csv_index(self):
+        entries = fs.fn_load_statdata('Canonn')
+        self.assertTrue(entries)
+        dates = [fs.fn_asctime_to_epoch(entry[0]) for entry in entries]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_parallel_load_equals_serial_load(self):
+        serial = fs.fn_load_statdata('Canonn')
+        parallel = fs.fn_load_statdata('Canonn', workers=2)
+        self.assertEqual([entry[0] for entry in serial], [entry[0] for entry in parallel])
+        for a, b in zip(serial, parallel):
+            self.assertTrue(a[1].equals(b[1]))
+
+    def test_migration_into_store(self):
+        entries = fs.fn_load_statdata('Canonn')
+        self.assertEqual(fs.fn_migrate_statdata_to_store('Canonn'), len(entries))
+        self.assertTrue(fs.fn_store_exists('Canonn'))
+        self.assertEqual([entry[0] for entry in fs.fn_store_load('Canonn')], [entry[0] for entry in entries])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+DATES = [pd.Timestamp('2017-06-%02d 15:00:00' % day) for day in range(1, 7)]
+
+
+def fn_markers():
+    # X has back-to-back states, a single snapshot state and a state lasting at the last snapshot, Y enters a state
+    # at the last snapshot, Z keeps one state throughout
+    markers = pd.DataFrame({'X': ['Boom', 'Boom', 'War', '', 'Election', 'Election'],
+                            'Y': ['', '', '', '', '', 'Lockdown'],
+                            'Z': ['Expansion'] * 6})
+    markers.insert(0, 'Date', DATES)
+    return markers
+
+
+class StateIntervalTest(unittest.TestCase):
+    # run-length state periods and the start/end labels derived from them
+
+    def setUp(self):
+        self.markers = fn_markers()
+        self.intervals = fs.fn_state_intervals(self.markers)
+
+    def test_intervals(self):
+        self.assertEqual(self.intervals.values.tolist(), [
+            ['X', 'Boom', DATES[0], DATES[1], 0, 1],
+            ['X', 'War', DATES[2], DATES[2], 2, 2],
+            ['X', 'Election', DATES[4], DATES[5], 4, 5],
+            ['Y', 'Lockdown', DATES[5], DATES[5], 5, 5],
+            ['Z', 'Expansion', DATES[0], DATES[5], 0, 5]])
+
+    def test_labels(self):
+        labels, sizes = fs.fn_state_labels(self.markers, self.intervals)
+        # back-to-back states end and start, a single snapshot state is labeled start + end
+        self.assertEqual(labels['X'], ['Boom start', 'Boom end', 'War start + end', '', 'Election start', 'Election'])
+        self.assertEqual(sizes['X'], [9, 9, 9, 5, 9, 5])
+        # a state starting at the last snapshot is not ended yet
+        self.assertEqual(labels['Y'], ['', '', '', '', '', 'Lockdown start'])
+        self.assertEqual(sizes['Y'], [5, 5, 5, 5, 5, 9])
+        # a state still lasting at the last snapshot keeps its plain name there
+        self.assertEqual(labels['Z'], ['Expansion start', '', '', '', '', 'Expansion'])
+        self.assertEqual(sizes['Z'], [9, 5, 5, 5, 5, 5])
+
+    def test_no_states(self):
+        markers = pd.DataFrame({'X': [''] * 3})
+        markers.insert(0, 'Date', DATES[:3])
+        intervals = fs.fn_state_intervals(markers)
+        self.assertTrue(intervals.empty)
+        self.assertEqual(fs.fn_state_labels(markers, intervals), ({'X': [''] * 3}, {'X': [5] * 3}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import random
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+
+def fn_snapshot(influence):
+    # systems and factions frames of a single system 'A' as extracted from an EDDB dump
+    presences = [{'minor_faction_id': 1, 'influence': influence, 'state': 'Boom'},
+                 {'minor_faction_id': 2, 'influence': 100.0 - influence, 'state': 'None'}]
+    systems = pd.DataFrame({'minor_faction_presences': [presences],
+                            'updated_at': [pd.Timestamp('2017-06-02 07:57:52')]},
+                           index=pd.Index(['A'], name='name'))
+    factions = pd.DataFrame({'name': ['T', 'Other']}, index=pd.Index([1, 2], name='id'))
+    return systems, factions
+
+
+def fn_snapshot_with_zero_digest():
+    # a snapshot whose system hash ends in a zero byte
+    for i in range(100000):
+        systems, factions = fn_snapshot(10.0 + i / 10000.0)
+        if fn_last_byte(fs.fn_system_hashes(systems, factions)['A']) == 0:
+            return systems, factions
+    raise AssertionError('no digest ending in a zero byte found')
+
+
+def fn_last_byte(digest):
+    return bytearray(digest)[-1]
+
+
+class StoreHashTest(WorkdirTest):
+
+    directories = ['statdata']
+
+    def test_digest_ending_in_zero_byte_round_trips(self):
+        systems, factions = fn_snapshot_with_zero_digest()
+        hashes = fs.fn_system_hashes(systems, factions)
+        fs.fn_store_append('T', [[fs.fn_epoch_to_asctime(1500000000), systems, factions, True]])
+
+        stored = fs.fn_store_system_hashes('T', 1500000000)
+        self.assertEqual(stored['A'], hashes['A'])
+        self.assertEqual(fs.fn_changed_systems(stored, hashes), [])
+
+    def test_unchanged_dump_reports_no_changed_systems(self):
+        systems, factions = fn_snapshot_with_zero_digest()
+
+        factionstats = fs.FactionStats('T')
+        factionstats.fn_pull_data_from_json('T', extracted={'T': [systems, factions]})
+        self.assertEqual(factionstats.changed_systems, ['A'])
+        factionstats.fn_save_factionstat('T')
+
+        factionstats = fs.FactionStats('T')
+        factionstats.fn_pull_data_from_json('T', extracted={'T': [systems, factions]})
+        self.assertEqual(factionstats.changed_systems, [])
+        self.assertEqual(len(factionstats.factionstat), 1)
+
+
+def fn_canonical(systems, factions):
+    # content of a snapshot as kept by the history store: system -> (updated_at, presences) with the faction names,
+    # NaN influence as None and systems without any presence left out
+    names = factions['name'].to_dict()
+    result = {}
+    for system, factions_present, updated in zip(systems.index, systems['minor_faction_presences'],
+                                                 systems['updated_at']):
+        presences = []
+        for faction in factions_present:
+            influence = faction['influence']
+            if influence is not None and influence != influence:
+                influence = None
+            presences.append((faction['minor_faction_id'], names.get(faction['minor_faction_id']), influence,
+                              faction['state']))
+        if presences:
+            result[system] = (fs.fn_timestamp_to_epoch(updated), presences)
+    return result
+
+
+def fn_evolving_entries(count, seed=1):
+    # factionstat entries of count days ending yesterday, with systems and factions appearing and disappearing,
+    # NaN influence, state changes and days without any change
+    rng = random.Random(seed)
+    names = dict((id, 'Faction ' + str(id)) for id in range(1, 30))
+    galaxy = dict(('System ' + str(i), [1, 2 + i, 10 + i]) for i in range(6))
+    influence = {}
+    states = {}
+    now = int(time.time()) // (24*60*60) * (24*60*60)
+    updated = dict((system, now - (count + 1) * 24*60*60) for system in galaxy)
+    entries = []
+    for day in range(count):
+        timestamp = now - (count - day) * 24*60*60
+        if day % 5 != 4:
+            if rng.random() < 0.5:
+                galaxy['System ' + str(6 + day)] = [1, 20 + day % 9]
+                updated['System ' + str(6 + day)] = timestamp - 3600
+            if rng.random() < 0.4 and len(galaxy) > 3:
+                del galaxy[rng.choice(sorted(galaxy))]
+            for system, ids in sorted(galaxy.items()):
+                if rng.random() < 0.5:
+                    continue
+                updated[system] = timestamp - rng.randint(1, 20) * 3600
+                if rng.random() < 0.2 and len(ids) > 2:
+                    ids.pop()
+                elif rng.random() < 0.2:
+                    ids.append(rng.choice([id for id in range(1, 30) if id not in ids]))
+                for id in ids:
+                    if rng.random() < 0.5:
+                        influence[(system, id)] = None if rng.random() < 0.1 else round(rng.uniform(1, 60), 1)
+                    if rng.random() < 0.3:
+                        states[(system, id)] = rng.choice(['None', 'Boom', 'War', 'Expansion', 'Retreat'])
+        systems = sorted(galaxy)
+        presences = [[{'minor_faction_id': id, 'influence': influence.get((system, id), 10.0),
+                       'state': states.get((system, id), 'None')} for id in galaxy[system]] for system in systems]
+        frame = pd.DataFrame({'minor_faction_presences': presences,
+                              'updated_at': [pd.Timestamp(updated[system], unit='s') for system in systems]},
+                             index=pd.Index(systems, name='name'))
+        ids = sorted(set(id for system in systems for id in galaxy[system]))
+        factions = pd.DataFrame({'name': [names[id] for id in ids]}, index=pd.Index(ids, name='id'))
+        entries.append([fs.fn_epoch_to_asctime(timestamp), frame, factions, True])
+    return entries
+
+
+class StoreRoundTripTest(WorkdirTest):
+    # snapshots read back from the delta encoded store equal the written ones
+
+    directories = ['statdata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        self.entries = fn_evolving_entries(2 * fs.STORE_KEYFRAME_INTERVAL + 5)
+
+    def fn_assert_entries_equal(self, loaded, entries):
+        self.assertEqual([entry[0] for entry in loaded], [entry[0] for entry in entries])
+        for entry, expected in zip(loaded, entries):
+            self.assertEqual(fn_canonical(entry[1], entry[2]), fn_canonical(expected[1], expected[2]), entry[0])
+
+    def test_round_trip_across_keyframes(self):
+        self.assertEqual(fs.fn_store_append('T', self.entries), len(self.entries))
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries)
+
+        # deltas between the keyframes, a new keyframe every STORE_KEYFRAME_INTERVAL snapshots
+        tables = fs.fn_store_load_tables('T')
+        keyframes = [entry[0] for entry in self.entries
+                     if fs.fn_asctime_to_epoch(entry[0]) not in set(tables['deltas'])]
+        self.assertEqual(keyframes, [entry[0] for entry in self.entries[::fs.STORE_KEYFRAME_INTERVAL]])
+
+    def test_round_trip_of_several_appends(self):
+        for start in range(0, len(self.entries), 4):
+            fs.fn_store_append('T', self.entries[start:start + 4])
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries)
+
+    def test_random_access_to_every_snapshot(self):
+        fs.fn_store_append('T', self.entries)
+        for expected in self.entries:
+            self.fn_assert_entries_equal([fs.fn_store_snapshot('T', expected[0])], [expected])
+
+    def test_load_of_recent_snapshots_starts_within_a_delta_chain(self):
+        fs.fn_store_append('T', self.entries)
+        for days in [3, fs.STORE_KEYFRAME_INTERVAL + 2]:
+            max_age = time.time() - fs.fn_asctime_to_epoch(self.entries[-days][0]) + 60
+            loaded = fs.fn_store_load('T', max_age=max_age)
+            self.fn_assert_entries_equal(loaded, self.entries[-days:])
+
+    def test_rewrite_round_trips(self):
+        fs.fn_store_append('T', self.entries[:10])
+        self.assertEqual(fs.fn_store_write('T', self.entries), len(self.entries))
+        self.fn_assert_entries_equal(fs.fn_store_load('T'), self.entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+RECORDS = [{'id': i, 'name': u'System é ' + str(i), 'population': 1000 * i,
+            'minor_faction_presences': [{'minor_faction_id': i + 1, 'influence': 12.5 * i, 'state': 'Boom'}]}
+           for i in range(20)]
+
+
+class JsonArrayStreamTest(WorkdirTest):
+    # records streamed from a json array compared with pandas reading the whole file
+
+    def fn_write(self, text):
+        with open('dump.json', 'wb') as handle:
+            handle.write(text.encode('utf-8'))
+        return 'dump.json'
+
+    def fn_assert_streamed_like_pandas(self, path, chunk_size):
+        streamed = pd.DataFrame(list(fs.fn_iter_json_array(path, chunk_size=chunk_size)))
+        expected = pd.read_json(path)
+        self.assertEqual(streamed.to_dict('records'), expected[streamed.columns].to_dict('records'))
+
+    def test_small_chunks_split_records(self):
+        path = self.fn_write('[\n' + ',\n'.join(json.dumps(record) for record in RECORDS) + '\n]\n')
+        for chunk_size in [1, 2, 3, 7, 64, 1024*1024]:
+            self.fn_assert_streamed_like_pandas(path, chunk_size)
+            self.assertEqual(list(fs.fn_iter_json_array(path, chunk_size=chunk_size)), RECORDS)
+
+    def test_leading_whitespace_longer_than_a_chunk(self):
+        path = self.fn_write(' \n\t' * 50 + '[' + ', '.join(json.dumps(record) for record in RECORDS) + ']')
+        for chunk_size in [1, 2, 16, 150, 151]:
+            self.fn_assert_streamed_like_pandas(path, chunk_size)
+
+    def test_empty_array(self):
+        path = self.fn_write('   \n[ \n ]\n')
+        for chunk_size in [1, 2, 1024]:
+            self.assertEqual(list(fs.fn_iter_json_array(path, chunk_size=chunk_size)), [])
+
+    def test_no_array_is_rejected(self):
+        for text in ['', '   \n  ', '  {"id": 1}']:
+            path = self.fn_write(text)
+            self.assertRaises(ValueError, list, fs.fn_iter_json_array(path, chunk_size=1))
+
+    def test_truncated_array_is_rejected(self):
+        path = self.fn_write('[' + json.dumps(RECORDS[0]) + ', {"id": 1')
+        self.assertRaises(ValueError, list, fs.fn_iter_json_array(path, chunk_size=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
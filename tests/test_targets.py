@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+
+class RunTargetsTest(unittest.TestCase):
+    # the pipelines of the targets run side by side, a failing target must not take the others down
+
+    def fn_task(self, target_name):
+        if target_name == 'B':
+            raise ValueError('broken target')
+        return target_name.lower()
+
+    def test_failing_target_is_left_out_concurrently(self):
+        self.assertEqual(fs.fn_run_targets(['A', 'B', 'C'], self.fn_task, workers=3), {'A': 'a', 'C': 'c'})
+
+    def test_failing_target_is_left_out_serially(self):
+        self.assertEqual(fs.fn_run_targets(['A', 'B', 'C'], self.fn_task, workers=1), {'A': 'a', 'C': 'c'})
+
+    def test_targets_run_concurrently(self):
+        # every target waits for all others, which only finishes if they run at the same time
+        barrier = threading.Barrier(3, timeout=10)
+        results = fs.fn_run_targets(['A', 'B', 'C'], lambda target_name: barrier.wait() is not None, workers=3)
+        self.assertEqual(results, {'A': True, 'B': True, 'C': True})
+
+    def test_process_pool_spawns_workers(self):
+        pool = fs.fn_process_pool(2)
+        try:
+            self.assertEqual(pool.map(abs, [-1, -2, 3]), [1, 2, 3])
+            self.assertEqual(pool._ctx.get_start_method(), 'spawn')
+        finally:
+            pool.close()
+            pool.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
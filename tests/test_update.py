@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import factionstats as fs
+from workdir import WorkdirTest
+
+PAGE = """<html><body><table>
+<tr class="systemRow"><td><a href="/system/1">A</a></td><td><strong>Security:</strong> <span>Medium</span></td>
+<td>Update: %s</td></tr>
+<tr class="systemFactionRow"><td>%s%%</td><td><a href="/faction/1">T</a></td><td>Independent</td>
+<td>Cooperative</td><td>Boom</td><td>A</td><td>Controlling</td></tr>
+<tr class="systemFactionRow"><td>40.0%%</td><td><a href="/faction/2">Other</a></td><td>Federation</td>
+<td>Democracy</td><td>None</td><td>A</td><td></td></tr>
+</table></body></html>
+"""
+
+
+class PointUpdateTest(WorkdirTest):
+    # point updates from the faction page applied to the copy of the last dump entry
+
+    directories = ['statdata']
+
+    def setUp(self):
+        WorkdirTest.setUp(self)
+        fs.PAGE_VALIDATORS_PENDING.clear()
+        self.updated_at = pd.Timestamp('2017-06-02 07:57:52')
+        presences = [{'minor_faction_id': 1, 'influence': 60.0, 'state': 'Boom'},
+                     {'minor_faction_id': 2, 'influence': 40.0, 'state': 'None'}]
+        systems = pd.DataFrame({'minor_faction_presences': [presences], 'updated_at': [self.updated_at]},
+                               index=pd.Index(['A'], name='name'))
+        factions = pd.DataFrame({'name': ['T', 'Other']}, index=pd.Index([1, 2], name='id'))
+
+        self.factionstats = fs.FactionStats('T')
+        self.factionstats.factionstat = [[time.asctime(time.localtime(time.time() - 24*60*60)), systems, factions,
+                                          False]]
+        self.factionstats.fn_begin_update()
+        self.url = self.factionstats.fn_faction_url('T')
+
+    def test_recent_page_update_moves_updated_at(self):
+        self.assertEqual(self.factionstats.fn_update('T', pages={self.url: PAGE % ('5 mins', '60.0')}), ['A'])
+
+        updated_at = self.factionstats.factionstat[-1][1].loc['A', 'updated_at']
+        self.assertTrue(updated_at > self.updated_at + pd.Timedelta(days=365))
+        self.assertEqual(self.factionstats.factionstat[0][1].loc['A', 'updated_at'], self.updated_at)
+        self.assertTrue(self.factionstats.factionstat[-1][3])
+
+        history, systemlist = self.factionstats.fn_get_system_history()
+        data, markers = fs.fn_pivot_history(history)['A']
+        self.assertEqual(data['Date'].tolist(), [self.updated_at, updated_at])
+
+    def test_influence_change_is_applied_to_the_update_entry(self):
+        self.assertEqual(self.factionstats.fn_update('T', pages={self.url: PAGE % ('3 days', '61.5')}), ['A'])
+        self.assertEqual(self.factionstats.factionstat[-1][1].loc['A', 'minor_faction_presences'][0]['influence'],
+                         61.5)
+        self.assertEqual(self.factionstats.factionstat[0][1].loc['A', 'minor_faction_presences'][0]['influence'],
+                         60.0)
+        self.assertEqual(self.factionstats.factionstat[-1][1].loc['A', 'updated_at'], self.updated_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import factionstats as fs
+
+
+class WorkdirTest(unittest.TestCase):
+    # runs every test in a temporary working directory with the given subdirectories, as the pipeline works relative
+    # to the current directory, no stage metrics are written and the history cache starts empty
+
+    directories = []
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        for directory in self.directories:
+            os.makedirs(directory)
+        self.metrics = fs.METRICS_PATH
+        fs.METRICS_PATH = None
+        fs.HISTORY_CACHE.clear()
+
+    def tearDown(self):
+        fs.METRICS_PATH = self.metrics
+        fs.HISTORY_CACHE.clear()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)